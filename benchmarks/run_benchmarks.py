@@ -0,0 +1,211 @@
+# This is a part of MSU VQMT Python Interface
+# https://github.com/msu-video-group/vqmt_python
+#
+# Benchmarks of the wrapper overhead. By default they run against the stub
+# library from benchmarks/stub, so VQMT metric cost is excluded and no
+# VQMT installation is needed. Results are saved as JSON for regression
+# tracking.
+#
+# Usage: python benchmarks/run_benchmarks.py [--lib path/to/libvqmt.so] [--output results.json]
+#
+# Copyright MSU Video Group, compression.ru TEAM
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+this_directory = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(this_directory))
+
+import numpy as np
+import msu_vqmt
+
+def build_stub():
+    src = os.path.join(this_directory, 'stub', 'vqmt_stub.c')
+    lib = os.path.join(this_directory, 'stub', 'libvqmt.so')
+    if not os.path.exists(lib) or os.path.getmtime(lib) < os.path.getmtime(src):
+        subprocess.check_call([os.environ.get('CC', 'cc'), '-O2', '-shared', '-fPIC',
+                               '-o', lib, src, '-lpthread', '-lm'])
+    return lib
+
+def make_config(metrics, frames=None, files=('orig', 'dist')):
+    config = msu_vqmt.Config()
+    for i in range(metrics):
+        config.addMetric(['psnr', 'ssim', 'msssim', 'vmaf'][i % 4], component='YUV'[i % 3])
+    for f in files:
+        if frames is None: config.addFile(f)
+        else: config.addFile(f, endFrame=frames)
+    return config
+
+def timeit(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def bench_invoke_setup(vqmt, args):
+    config = make_config(20)
+    n = 200
+
+    def run():
+        for _ in range(n):
+            vqmt.invoke(config)
+
+    t = timeit(run, args.repeat)
+    return {'seconds': t, 'invokes_per_sec': n / t}
+
+def bench_value_callbacks(vqmt, args):
+    frames, metrics = args.frames, 20
+    config = make_config(metrics, frames)
+    res = {}
+
+    def run(**kwargs):
+        def go():
+            invoke = vqmt.invoke(config, **kwargs)
+            invoke.start()
+        return go
+
+    counter = []
+    variants = [
+        ('no_callback', {}),
+        ('noop_value_cb', {'value_cb': lambda *a: None}),
+        ('list_value_cb', {'value_cb': lambda *a: counter.append(a)}),
+    ]
+    for name, kwargs in variants:
+        t = timeit(run(**kwargs), args.repeat)
+        del counter[:]
+        res[name] = {'seconds': t, 'values_per_sec': frames * metrics / t}
+
+    def stream():
+        s = msu_vqmt.ValueStream(batch_size=1024, use_queue=False)
+        invoke = vqmt.invoke(config, value_stream=s)
+        invoke.start()
+    t = timeit(stream, args.repeat)
+    res['value_stream'] = {'seconds': t, 'values_per_sec': frames * metrics / t}
+    return res
+
+def bench_input_callback(vqmt, args):
+    w, h, frames = 1920, 1080, min(args.frames, 200)
+    props = {'frames': frames, 'fmt': 'yuv420p', 'w': w, 'h': h}
+    data = np.zeros([frames, w * h * 3 // 2], dtype=np.ubyte)
+
+    config = msu_vqmt.Config()
+    config.addMetric('psnr', component='Y')
+    config.addFile('orig', mode='callback', props=props)
+    config.addFile('dist', mode='callback', props=props)
+
+    def callback_copy():
+        def cb(invoke_id, file, frame, ptr, chan_mask):
+            if frame >= frames: return False
+            vqmt.copyImage(data[frame], ptr, chan_mask)
+            return True
+        invoke = vqmt.invoke(config)
+        invoke.setInputCallback(cb)
+        invoke.start()
+
+    def array_source():
+        invoke = vqmt.invoke(config)
+        invoke.setInputSources({'orig': msu_vqmt.ArraySource(data, props),
+                                'dist': msu_vqmt.ArraySource(data, props)})
+        invoke.start()
+
+    def batch_source():
+        producer = lambda first, count: data[first:first + count]
+        invoke = vqmt.invoke(config)
+        invoke.setInputSources({'orig': msu_vqmt.BatchSource(producer, props, batch_size=32),
+                                'dist': msu_vqmt.BatchSource(producer, props, batch_size=32)})
+        invoke.start()
+
+    res = {}
+    for name, func in (('set_input_callback', callback_copy), ('array_source', array_source),
+                       ('batch_source', batch_source)):
+        t = timeit(func, args.repeat)
+        res[name] = {'seconds': t, 'frames_per_sec': 2 * frames / t}
+    return res
+
+def bench_fetch_values(vqmt, args):
+    config = make_config(20, args.frames)
+    invoke = vqmt.invoke(config)
+    invoke.start()
+    n = 20
+
+    res = {}
+    for name, func in (('values_as_array', invoke.getValuesAsArray),
+                       ('values_as_list', invoke.getValuesAsList),
+                       ('frame_numbers_as_array', invoke.getFrameNumbersAsArray),
+                       ('columns', invoke.getColumns),
+                       ('accumulators', invoke.getAccumulators)):
+        def run():
+            for _ in range(n):
+                func()
+        t = timeit(run, args.repeat)
+        res[name] = {'seconds': t, 'calls_per_sec': n / t}
+    return res
+
+def bench_concurrent(vqmt, args):
+    config = make_config(4, 100)
+    res = {}
+    os.environ['VQMT_STUB_LATENCY_US'] = '1000'
+    try:
+        for count in (1, 4, 16):
+            def run():
+                invokes = [vqmt.invoke(config) for _ in range(count)]
+                for invoke in invokes: invoke.startAsynch()
+                for invoke in invokes: invoke.wait()
+            t = timeit(run, 1)
+            res['invokes_%d' % count] = {'seconds': t, 'invokes_per_sec': count / t}
+    finally:
+        os.environ['VQMT_STUB_LATENCY_US'] = '0'
+    return res
+
+BENCHMARKS = [
+    ('invoke_setup', bench_invoke_setup),
+    ('value_callbacks', bench_value_callbacks),
+    ('input_callback', bench_input_callback),
+    ('fetch_values', bench_fetch_values),
+    ('concurrent_invokes', bench_concurrent),
+]
+
+def main():
+    parser = argparse.ArgumentParser(description='MSU VQMT Python wrapper benchmarks')
+    parser.add_argument('--lib', help='libvqmt.so to use instead of the stub')
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--frames', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--only', nargs='*', help='names of benchmarks to run')
+    args = parser.parse_args()
+
+    lib = args.lib if args.lib else build_stub()
+    os.environ.setdefault('VQMT_STUB_FRAMES', str(args.frames))
+    vqmt = msu_vqmt.SharedInterface(lib)
+
+    results = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'library': lib,
+        'vqmt': vqmt.getVersion()['version']['full'],
+        'frames': args.frames,
+        'results': {},
+    }
+
+    for name, func in BENCHMARKS:
+        if args.only and name not in args.only: continue
+        print('Running %s...' % name)
+        results['results'][name] = func(vqmt, args)
+        print(json.dumps(results['results'][name], indent=2))
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print('Results saved to %s' % args.output)
+
+if __name__ == '__main__':
+    main()
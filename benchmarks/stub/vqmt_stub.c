@@ -0,0 +1,790 @@
+/*
+ * This is a part of MSU VQMT Python Interface
+ * https://github.com/msu-video-group/vqmt_python
+ *
+ * Stub implementation of libvqmt shared library. It binds all vqmt_* symbols
+ * used by msu_vqmt.SharedInterface and produces synthetic values, so the
+ * wrapper can be tested and benchmarked without installed MSU VQMT.
+ *
+ * Build:  cc -O2 -shared -fPIC -o libvqmt.so vqmt_stub.c -lpthread -lm
+ *         (or let benchmarks/run_benchmarks.py build it)
+ *
+ * Environment:
+ *   VQMT_STUB_FRAMES      frames in each file without "frames" prop (100)
+ *   VQMT_STUB_LATENCY_US  sleep per measured frame, microseconds (0)
+ *   VQMT_STUB_FAIL_FIRST  number of first invokes in process that fail (0)
+ *   VQMT_STUB_DEVICES     comma separated list of extra GPU devices having
+ *                         vmaf implementation ("")
+ *   VQMT_STUB_PREPARE_US  sleep while preparing, can't be cancelled (0)
+ *
+ * A file with "__fail__" in its path makes the invoke fail. Missing index
+ * files specified with "index_file" are created on start.
+ *
+ * Copyright MSU Video Group, compression.ru TEAM
+ */
+
+#include <math.h>
+#include <pthread.h>
+#include <stdarg.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <unistd.h>
+
+#if defined(_WIN32)
+#define EXPORT __declspec(dllexport)
+#else
+#define EXPORT __attribute__((visibility("default")))
+#endif
+
+#define STATUS_NOT_FINISHED 50
+#define STATUS_ALL_OK 100
+#define STATUS_FAILED 200
+#define STATUS_INTERRUPTED 300
+
+#define INPUT_CB_OK 0
+#define INPUT_CB_EOF 1
+
+typedef struct {
+    int maj, min, rev;
+    const char* extra;
+    const char* edition;
+    const char* full;
+    const char* build_date;
+} vqmt_version_t;
+
+typedef void (*event_cb_t)(const char*, void*);
+typedef void (*value_cb_t)(int, int, int, double, void*);
+typedef int (*input_cb_t)(int, const char*, int, void*, int, void*);
+
+/* ---------------- minimal JSON reader ---------------- */
+
+enum { J_NULL, J_BOOL, J_NUM, J_STR, J_ARR, J_OBJ };
+
+typedef struct jv {
+    int type;
+    double num;
+    char* str;
+    int n;
+    struct jv** items;
+    char** keys;
+} jv;
+
+static void skip_ws(const char** p) {
+    while (**p == ' ' || **p == '\n' || **p == '\r' || **p == '\t') ++*p;
+}
+
+static jv* jv_new(int type) {
+    jv* v = (jv*)calloc(1, sizeof(jv));
+    v->type = type;
+    return v;
+}
+
+static void jv_free(jv* v) {
+    int i;
+    if (!v) return;
+    for (i = 0; i < v->n; ++i) {
+        jv_free(v->items[i]);
+        if (v->keys) free(v->keys[i]);
+    }
+    free(v->items);
+    free(v->keys);
+    free(v->str);
+    free(v);
+}
+
+static char* parse_str(const char** p) {
+    size_t cap = 16, len = 0;
+    char* s = (char*)malloc(cap);
+    ++*p;
+    while (**p && **p != '"') {
+        char c = **p;
+        if (c == '\\') {
+            ++*p;
+            c = **p;
+            if (c == 'n') c = '\n';
+            else if (c == 't') c = '\t';
+            else if (c == 'u') { c = '?'; *p += 4; }
+        }
+        if (len + 2 > cap) { cap *= 2; s = (char*)realloc(s, cap); }
+        s[len++] = c;
+        ++*p;
+    }
+    if (**p == '"') ++*p;
+    s[len] = 0;
+    return s;
+}
+
+static void jv_push(jv* v, char* key, jv* item) {
+    v->items = (jv**)realloc(v->items, sizeof(jv*) * (v->n + 1));
+    v->items[v->n] = item;
+    if (v->type == J_OBJ) {
+        v->keys = (char**)realloc(v->keys, sizeof(char*) * (v->n + 1));
+        v->keys[v->n] = key;
+    }
+    ++v->n;
+}
+
+static jv* parse_value(const char** p) {
+    jv* v;
+    skip_ws(p);
+    if (**p == '{' || **p == '[') {
+        int obj = **p == '{';
+        v = jv_new(obj ? J_OBJ : J_ARR);
+        ++*p;
+        for (;;) {
+            char* key = NULL;
+            jv* item;
+            skip_ws(p);
+            if (**p == '}' || **p == ']') { ++*p; break; }
+            if (!**p) break;
+            if (obj) {
+                key = parse_str(p);
+                skip_ws(p);
+                if (**p == ':') ++*p;
+            }
+            item = parse_value(p);
+            jv_push(v, key, item);
+            skip_ws(p);
+            if (**p == ',') ++*p;
+        }
+    } else if (**p == '"') {
+        v = jv_new(J_STR);
+        v->str = parse_str(p);
+    } else if (!strncmp(*p, "true", 4) || !strncmp(*p, "false", 5)) {
+        v = jv_new(J_BOOL);
+        v->num = **p == 't';
+        *p += **p == 't' ? 4 : 5;
+    } else if (!strncmp(*p, "null", 4)) {
+        v = jv_new(J_NULL);
+        *p += 4;
+    } else {
+        char* end;
+        v = jv_new(J_NUM);
+        v->num = strtod(*p, &end);
+        if (end == *p) ++end;
+        *p = end;
+    }
+    return v;
+}
+
+static jv* jv_get(jv* v, const char* key) {
+    int i;
+    if (!v || v->type != J_OBJ) return NULL;
+    for (i = 0; i < v->n; ++i)
+        if (!strcmp(v->keys[i], key)) return v->items[i];
+    return NULL;
+}
+
+static int jv_int(jv* v, int def) {
+    return v && v->type == J_NUM ? (int)v->num : def;
+}
+
+static const char* jv_str(jv* v, const char* def) {
+    return v && v->type == J_STR ? v->str : def;
+}
+
+/* ---------------- string builder ---------------- */
+
+typedef struct {
+    char* s;
+    size_t len, cap;
+} sbuf;
+
+static void sb_printf(sbuf* b, const char* fmt, ...) {
+    va_list ap;
+    int need;
+    va_start(ap, fmt);
+    need = vsnprintf(NULL, 0, fmt, ap);
+    va_end(ap);
+    if (b->len + need + 1 > b->cap) {
+        b->cap = (b->len + need + 1) * 2;
+        b->s = (char*)realloc(b->s, b->cap);
+    }
+    va_start(ap, fmt);
+    vsnprintf(b->s + b->len, need + 1, fmt, ap);
+    va_end(ap);
+    b->len += need;
+}
+
+static char* sb_take(sbuf* b) {
+    if (!b->s) { b->s = (char*)malloc(1); b->s[0] = 0; }
+    return b->s;
+}
+
+/* ---------------- invokes ---------------- */
+
+typedef struct {
+    char* path;
+    char* index_file;
+    int start, end, callback, w, h;
+} stub_file;
+
+typedef struct {
+    char* metric;
+    char* variation;
+    char* device;
+    char* color;
+} stub_column;
+
+typedef struct {
+    int used;
+    int nfiles, ncols, rows;
+    stub_file* files;
+    stub_column* cols;
+    float* values;
+    int* frames;
+    event_cb_t event_cb;
+    value_cb_t value_cb;
+    void* user;
+    input_cb_t input_cb;
+    void* input_user;
+    volatile int cancelled, paused;
+    int prepared, measured;
+    int status;
+    int fail;
+    char* columns_json;
+    char* files_json;
+    char* values_json;
+    char* acc_json;
+    char* info_json;
+} stub_invoke;
+
+static pthread_mutex_t g_lock = PTHREAD_MUTEX_INITIALIZER;
+static stub_invoke** g_invokes = NULL;
+static int g_ninvokes = 0;
+static int g_created = 0;
+static char g_error[1024] = "";
+static int g_activated = 1;
+
+static int env_int(const char* name, int def) {
+    const char* v = getenv(name);
+    return v && *v ? atoi(v) : def;
+}
+
+static stub_invoke* get_invoke(int id) {
+    stub_invoke* inv = NULL;
+    pthread_mutex_lock(&g_lock);
+    if (id >= 0 && id < g_ninvokes && g_invokes[id]->used) inv = g_invokes[id];
+    pthread_mutex_unlock(&g_lock);
+    return inv;
+}
+
+static void col_name(int col, char* out) {
+    char tmp[16];
+    int n = 0, i;
+    col += 1;
+    while (col > 0) {
+        int r = (col - 1) % 26;
+        tmp[n++] = (char)('A' + r);
+        col = (col - 1) / 26;
+    }
+    for (i = 0; i < n; ++i) out[i] = tmp[n - 1 - i];
+    out[n] = 0;
+}
+
+/* value depends only on metric, color and frame, not on column position */
+static double synth_value(const stub_column* c, int frame) {
+    double base = !strcmp(c->metric, "ssim") || !strcmp(c->metric, "msssim") ? 0.9 : 35.0;
+    double amp = base < 1.0 ? 0.05 : 5.0;
+    unsigned seed = 0;
+    const char* p;
+    for (p = c->metric; *p; ++p) seed = seed * 31 + (unsigned char)*p;
+    for (p = c->color; *p; ++p) seed = seed * 31 + (unsigned char)*p;
+    return base + amp * sin(frame * 0.1 + (seed % 628) / 100.0);
+}
+
+static void emit_event(stub_invoke* inv, const char* name) {
+    char buf[128];
+    if (!inv->event_cb) return;
+    snprintf(buf, sizeof(buf), "{\"event\": \"%s\"}", name);
+    inv->event_cb(buf, inv->user);
+}
+
+static void free_invoke(stub_invoke* inv) {
+    int i;
+    for (i = 0; i < inv->nfiles; ++i) {
+        free(inv->files[i].path);
+        free(inv->files[i].index_file);
+    }
+    for (i = 0; i < inv->ncols; ++i) {
+        free(inv->cols[i].metric);
+        free(inv->cols[i].variation);
+        free(inv->cols[i].device);
+        free(inv->cols[i].color);
+    }
+    free(inv->files);
+    free(inv->cols);
+    free(inv->values);
+    free(inv->frames);
+    free(inv->columns_json);
+    free(inv->files_json);
+    free(inv->values_json);
+    free(inv->acc_json);
+    free(inv->info_json);
+    memset(inv, 0, sizeof(*inv));
+}
+
+static int setup_invoke(stub_invoke* inv, jv* conf) {
+    jv* files = jv_get(conf, "files");
+    jv* metrics = jv_get(conf, "metrics");
+    int default_frames = env_int("VQMT_STUB_FRAMES", 100);
+    int i;
+
+    if (!files || files->type != J_ARR || files->n < 1) {
+        snprintf(g_error, sizeof(g_error), "No input files specified");
+        return 0;
+    }
+    if (!metrics || metrics->type != J_ARR || metrics->n < 1) {
+        snprintf(g_error, sizeof(g_error), "No metrics specified");
+        return 0;
+    }
+
+    inv->nfiles = files->n;
+    inv->files = (stub_file*)calloc(files->n, sizeof(stub_file));
+    for (i = 0; i < files->n; ++i) {
+        jv* f = files->items[i];
+        jv* opts = NULL;
+        jv* props;
+        jv* range;
+        stub_file* sf = &inv->files[i];
+        if (f->type == J_ARR && f->n > 0) {
+            sf->path = strdup(jv_str(f->items[0], ""));
+            if (f->n > 1) opts = f->items[1];
+        } else {
+            sf->path = strdup(jv_str(f, ""));
+        }
+        props = jv_get(opts, "props");
+        range = jv_get(opts, "range");
+        sf->callback = !strcmp(jv_str(jv_get(opts, "mode"), ""), "callback");
+        if (jv_get(opts, "index_file")) sf->index_file = strdup(jv_str(jv_get(opts, "index_file"), ""));
+        sf->w = jv_int(jv_get(props, "w"), 1920);
+        sf->h = jv_int(jv_get(props, "h"), 1080);
+        sf->start = range && range->n > 0 ? jv_int(range->items[0], 0) : 0;
+        sf->end = jv_int(jv_get(props, "frames"), default_frames);
+        if (range && range->n > 1 && jv_int(range->items[1], sf->end) < sf->end)
+            sf->end = jv_int(range->items[1], sf->end);
+        if (strstr(sf->path, "__fail__")) inv->fail = 1;
+    }
+
+    inv->ncols = metrics->n;
+    inv->cols = (stub_column*)calloc(metrics->n, sizeof(stub_column));
+    for (i = 0; i < metrics->n; ++i) {
+        jv* m = metrics->items[i];
+        jv* metric = jv_get(m, "metric");
+        stub_column* c = &inv->cols[i];
+        if (metric && metric->type == J_OBJ) {
+            c->metric = strdup(jv_str(jv_get(metric, "name"), "psnr"));
+            c->variation = strdup(jv_str(jv_get(metric, "variation"), ""));
+            c->device = strdup(jv_str(jv_get(metric, "device"), "CPU"));
+        } else {
+            c->metric = strdup(jv_str(metric, "psnr"));
+            c->variation = strdup("");
+            c->device = strdup("CPU");
+        }
+        c->color = strdup(jv_str(jv_get(m, "color"), "Y"));
+    }
+
+    inv->rows = -1;
+    for (i = 0; i < inv->nfiles; ++i) {
+        int n = inv->files[i].end - inv->files[i].start;
+        if (n < 0) n = 0;
+        if (inv->rows < 0 || n < inv->rows) inv->rows = n;
+    }
+    inv->status = STATUS_NOT_FINISHED;
+    return 1;
+}
+
+static void build_static_json(stub_invoke* inv) {
+    sbuf b = {0};
+    int i;
+    char name[16];
+
+    sb_printf(&b, "[");
+    for (i = 0; i < inv->ncols; ++i) {
+        stub_column* c = &inv->cols[i];
+        col_name(i, name);
+        sb_printf(&b, "%s{\"metric_name\": \"%s\", \"metric_variation\": \"%s\", "
+                      "\"metric_aliases\": [], \"device\": \"%s\", \"color_component\": \"%s\", "
+                      "\"compaired_files\": [0, 1], \"config_summary\": \"\", \"value_id\": \"\", "
+                      "\"col\": \"%s\"}",
+                  i ? ", " : "", c->metric, c->variation, c->device, c->color, name);
+    }
+    sb_printf(&b, "]");
+    inv->columns_json = sb_take(&b);
+
+    memset(&b, 0, sizeof(b));
+    sb_printf(&b, "[");
+    for (i = 0; i < inv->nfiles; ++i) {
+        stub_file* f = &inv->files[i];
+        sb_printf(&b, "%s{\"path\": \"%s\", \"frames\": %d, \"w\": %d, \"h\": %d, \"mode\": \"%s\"}",
+                  i ? ", " : "", f->path, f->end - f->start, f->w, f->h,
+                  f->callback ? "callback" : "file");
+    }
+    sb_printf(&b, "]");
+    inv->files_json = sb_take(&b);
+}
+
+static void build_result_json(stub_invoke* inv) {
+    sbuf b = {0};
+    int r, c;
+    char name[16];
+    static const char* acc_names[] = {"mean", "harmonic mean", "min. val", "max. val",
+                                      "min. frame", "max. frame", "std dev", "variance"};
+    int a;
+
+    sb_printf(&b, "[");
+    for (r = 0; r < inv->rows; ++r) {
+        sb_printf(&b, "%s{\"frame\": %d, \"values\": {", r ? ", " : "", inv->frames[r]);
+        for (c = 0; c < inv->ncols; ++c) {
+            col_name(c, name);
+            sb_printf(&b, "%s\"%s\": %.9g", c ? ", " : "", name, inv->values[r * inv->ncols + c]);
+        }
+        sb_printf(&b, "}}");
+    }
+    sb_printf(&b, "]");
+    inv->values_json = sb_take(&b);
+
+    memset(&b, 0, sizeof(b));
+    sb_printf(&b, "{");
+    for (a = 0; a < 8; ++a) {
+        sb_printf(&b, "%s\"%s\": {", a ? ", " : "", acc_names[a]);
+        for (c = 0; c < inv->ncols; ++c) {
+            double sum = 0, hsum = 0, sq = 0, mn = INFINITY, mx = -INFINITY, v = 0;
+            int mnf = 0, mxf = 0;
+            for (r = 0; r < inv->rows; ++r) {
+                double x = inv->values[r * inv->ncols + c];
+                sum += x;
+                sq += x * x;
+                hsum += 1.0 / x;
+                if (x < mn) { mn = x; mnf = inv->frames[r]; }
+                if (x > mx) { mx = x; mxf = inv->frames[r]; }
+            }
+            if (inv->rows > 0) {
+                double mean = sum / inv->rows;
+                double var = sq / inv->rows - mean * mean;
+                if (var < 0) var = 0;
+                switch (a) {
+                case 0: v = mean; break;
+                case 1: v = inv->rows / hsum; break;
+                case 2: v = mn; break;
+                case 3: v = mx; break;
+                case 4: v = mnf; break;
+                case 5: v = mxf; break;
+                case 6: v = sqrt(var); break;
+                case 7: v = var; break;
+                }
+            }
+            col_name(c, name);
+            sb_printf(&b, "%s\"%s\": %.17g", c ? ", " : "", name, v);
+        }
+        sb_printf(&b, "}");
+    }
+    sb_printf(&b, "}");
+    inv->acc_json = sb_take(&b);
+}
+
+/* ---------------- exported API ---------------- */
+
+EXPORT vqmt_version_t vqmt_get_version(void) {
+    vqmt_version_t v = {14, 1, 0, "stub", "Pro/Premium", "14.1 r0 stub", __DATE__};
+    return v;
+}
+
+EXPORT const char* vqmt_get_version_json(void) {
+    return "{\"program_fullname\": \"MSU Video Quality Measurement Tool\", "
+           "\"program_shortname\": \"MSU VQMT\", "
+           "\"version\": {\"full\": \"14.1 r0 stub\", \"maj\": 14, \"min\": 1, \"rev\": 0, \"extra\": \"stub\"}, "
+           "\"edition\": \"Pro/Premium\", \"system\": \"stub\", \"build_date\": \"" __DATE__ "\", "
+           "\"activation\": {\"type\": \"Premium\", \"activated\": true, \"status\": \"stub\"}}";
+}
+
+EXPORT void vqmt_init(void) {}
+
+EXPORT const char* vqmt_get_picture_types_json(void) {
+    return "[{\"key\": \"gray\", \"name\": \"GRAY\", \"bps\": 8, \"sample_type\": \"8-bit int\", "
+           "\"color_model\": \"Y\", \"subsampling\": \"Gray\", \"order\": \"Y\", \"description\": \"gray 8bps\"}, "
+           "{\"key\": \"yuv420p\", \"name\": \"I420\", \"bps\": 8, \"sample_type\": \"8-bit int\", "
+           "\"color_model\": \"YUV\", \"subsampling\": \"420\", \"order\": \"YUV\", \"description\": \"planar YUV 420 8bps\"}, "
+           "{\"key\": \"rgb24\", \"name\": \"RGB24\", \"bps\": 8, \"sample_type\": \"8-bit int\", "
+           "\"color_model\": \"RGB\", \"subsampling\": \"Packed_444\", \"order\": \"RGB\", \"description\": \"packed RGB 444 8bps\"}]";
+}
+
+EXPORT const char* vqmt_get_colorspaces_json(void) {
+    return "[{\"full_name\": \"YUV BT.709 Quantized\", \"base_name\": \"YUV\", \"model\": \"YUV\", "
+           "\"components\": [{\"short_name\": \"Y\", \"full_name\": \"Y\", \"min\": 16.0, \"max\": 235.0}], "
+           "\"standards\": [\"BT.709\"], \"is_basic\": true, \"is_linear\": false, \"is_quantized\": true}]";
+}
+
+EXPORT const char* vqmt_get_devices_json(void) {
+    static char buf[4096];
+    const char* extra = getenv("VQMT_STUB_DEVICES");
+    sbuf b = {0};
+    sb_printf(&b, "[{\"id\": \"CPU\", \"fullname\": \"CPU\", \"variation\": \"[CPU] CPU\", "
+                  "\"is_available\": true, \"is_recommended\": true, \"is_not_recommended\": false, "
+                  "\"comment\": \"\", \"technology\": \"general\", \"type\": \"CPU\"}");
+    if (extra && *extra) {
+        char* copy = strdup(extra);
+        char* tok = strtok(copy, ",");
+        while (tok) {
+            sb_printf(&b, ", {\"id\": \"%s\", \"fullname\": \"%s\", \"variation\": \"[GPU] %s\", "
+                          "\"is_available\": true, \"is_recommended\": true, \"is_not_recommended\": false, "
+                          "\"comment\": \"\", \"technology\": \"OpenCL\", \"type\": \"GPU\"}",
+                      tok, tok, tok);
+            tok = strtok(NULL, ",");
+        }
+        free(copy);
+    }
+    sb_printf(&b, "]");
+    snprintf(buf, sizeof(buf), "%s", b.s);
+    free(b.s);
+    return buf;
+}
+
+EXPORT const char* vqmt_get_metrics_json(void) {
+    static char buf[8192];
+    const char* extra = getenv("VQMT_STUB_DEVICES");
+    sbuf b = {0};
+    sb_printf(&b, "[{\"usage\": \"psnr\", \"info\": {\"name\": \"psnr\", \"variation\": \"\", \"device\": \"CPU\", \"inputs\": 2}, "
+                  "\"possible_colors\": [\"Y\", \"U\", \"V\", \"R\", \"G\", \"B\", \"LUV-L\", \"RGB\", \"YUV\"], \"parameters\": {}}, "
+                  "{\"usage\": \"ssim\", \"info\": {\"name\": \"ssim\", \"variation\": \"superfast\", \"device\": \"CPU\", \"inputs\": 2}, "
+                  "\"possible_colors\": [\"Y\", \"U\", \"V\", \"R\", \"G\", \"B\"], \"parameters\": {}}, "
+                  "{\"usage\": \"msssim\", \"info\": {\"name\": \"msssim\", \"variation\": \"\", \"device\": \"CPU\", \"inputs\": 2}, "
+                  "\"possible_colors\": [\"Y\", \"U\", \"V\", \"R\", \"G\", \"B\"], \"parameters\": {}}, "
+                  "{\"usage\": \"vmaf\", \"info\": {\"name\": \"vmaf\", \"variation\": \"\", \"device\": \"CPU\", \"inputs\": 2}, "
+                  "\"possible_colors\": [\"Y\"], \"parameters\": {}}");
+    if (extra && *extra) {
+        char* copy = strdup(extra);
+        char* tok = strtok(copy, ",");
+        while (tok) {
+            sb_printf(&b, ", {\"usage\": \"vmaf\", \"info\": {\"name\": \"vmaf\", \"variation\": \"\", "
+                          "\"device\": \"%s\", \"inputs\": 2}, \"possible_colors\": [\"Y\"], \"parameters\": {}}",
+                      tok);
+            tok = strtok(NULL, ",");
+        }
+        free(copy);
+    }
+    sb_printf(&b, "]");
+    snprintf(buf, sizeof(buf), "%s", b.s);
+    free(b.s);
+    return buf;
+}
+
+EXPORT const char* vqmt_get_error(void) {
+    return g_error;
+}
+
+EXPORT int vqmt_invoke_init_with_config_json(const char* config, event_cb_t event_cb,
+                                             value_cb_t value_cb, void* user) {
+    const char* p = config;
+    jv* conf = parse_value(&p);
+    stub_invoke* inv = (stub_invoke*)calloc(1, sizeof(stub_invoke));
+    int id;
+
+    if (!conf || conf->type != J_OBJ || !setup_invoke(inv, conf)) {
+        if (!g_error[0]) snprintf(g_error, sizeof(g_error), "Invalid configuration");
+        jv_free(conf);
+        free_invoke(inv);
+        free(inv);
+        return -1;
+    }
+    jv_free(conf);
+
+    inv->used = 1;
+    inv->event_cb = event_cb;
+    inv->value_cb = value_cb;
+    inv->user = user;
+
+    pthread_mutex_lock(&g_lock);
+    if (g_created++ < env_int("VQMT_STUB_FAIL_FIRST", 0)) inv->fail = 1;
+    g_invokes = (stub_invoke**)realloc(g_invokes, sizeof(stub_invoke*) * (g_ninvokes + 1));
+    g_invokes[g_ninvokes] = inv;
+    id = g_ninvokes++;
+    pthread_mutex_unlock(&g_lock);
+
+    build_static_json(inv);
+    g_error[0] = 0;
+    return id;
+}
+
+EXPORT int vqmt_set_invoke_input_callback(int id, input_cb_t cb, void* user) {
+    stub_invoke* inv = get_invoke(id);
+    if (!inv) return 0;
+    inv->input_cb = cb;
+    inv->input_user = user;
+    return 1;
+}
+
+EXPORT int vqmt_start_process(int id) {
+    stub_invoke* inv = get_invoke(id);
+    int latency = env_int("VQMT_STUB_LATENCY_US", 0);
+    unsigned char* buf = NULL;
+    size_t buf_size = 0;
+    int r, c, i, rows = 0;
+
+    if (!inv) return STATUS_FAILED;
+
+    emit_event(inv, "PrepareStart");
+    /* "build" missing index files */
+    for (i = 0; i < inv->nfiles; ++i) {
+        FILE* f;
+        if (!inv->files[i].index_file || !inv->files[i].index_file[0]) continue;
+        f = fopen(inv->files[i].index_file, "rb");
+        if (f) { fclose(f); continue; }
+        f = fopen(inv->files[i].index_file, "wb");
+        if (f) { fprintf(f, "stub index of %s\n", inv->files[i].path); fclose(f); }
+    }
+    inv->values = (float*)malloc(sizeof(float) * (size_t)(inv->rows > 0 ? inv->rows : 1) * inv->ncols);
+    inv->frames = (int*)malloc(sizeof(int) * (size_t)(inv->rows > 0 ? inv->rows : 1));
+    for (i = 0; i < inv->nfiles; ++i) {
+        size_t need = (size_t)inv->files[i].w * inv->files[i].h * 8;
+        if (inv->files[i].callback && need > buf_size) buf_size = need;
+    }
+    if (buf_size) buf = (unsigned char*)malloc(buf_size);
+    if (env_int("VQMT_STUB_PREPARE_US", 0) > 0) usleep(env_int("VQMT_STUB_PREPARE_US", 0));
+    inv->prepared = 1;
+    emit_event(inv, "PrepareComplete");
+
+    inv->status = STATUS_ALL_OK;
+    if (inv->fail) {
+        snprintf(g_error, sizeof(g_error), "Stub failure requested");
+        inv->status = STATUS_FAILED;
+    }
+
+    for (r = 0; r < inv->rows && inv->status == STATUS_ALL_OK; ++r) {
+        int eof = 0;
+        while (inv->paused && !inv->cancelled) usleep(1000);
+        if (inv->cancelled) { inv->status = STATUS_INTERRUPTED; break; }
+
+        for (i = 0; i < inv->nfiles; ++i) {
+            stub_file* f = &inv->files[i];
+            int res;
+            if (!f->callback) continue;
+            if (!inv->input_cb) { inv->status = STATUS_FAILED; break; }
+            res = inv->input_cb(id, f->path, f->start + r, buf, 7, inv->input_user);
+            if (res == INPUT_CB_EOF) { eof = 1; break; }
+            if (res != INPUT_CB_OK) { inv->status = STATUS_FAILED; break; }
+        }
+        if (eof || inv->status != STATUS_ALL_OK) break;
+
+        if (latency > 0) usleep(latency);
+
+        inv->frames[r] = r;
+        for (c = 0; c < inv->ncols; ++c) {
+            double v = synth_value(&inv->cols[c], inv->files[0].start + r);
+            inv->values[r * inv->ncols + c] = (float)v;
+            if (inv->value_cb) inv->value_cb(id, r, c, v, inv->user);
+        }
+        ++rows;
+    }
+    inv->rows = rows;
+    free(buf);
+
+    build_result_json(inv);
+    inv->measured = 1;
+    emit_event(inv, "MeasureComplete");
+
+    {
+        sbuf b = {0};
+        sb_printf(&b, "{\"exit_status\": %d, \"frames\": %d, \"columns\": %d}", inv->status, inv->rows, inv->ncols);
+        inv->info_json = sb_take(&b);
+    }
+    return inv->status;
+}
+
+EXPORT void vqmt_cancel_invoke(int id) {
+    stub_invoke* inv = get_invoke(id);
+    if (inv) inv->cancelled = 1;
+}
+
+EXPORT void vqmt_pause_invoke(int id) {
+    stub_invoke* inv = get_invoke(id);
+    if (inv) inv->paused = 1;
+}
+
+EXPORT void vqmt_resume_invoke(int id) {
+    stub_invoke* inv = get_invoke(id);
+    if (inv) inv->paused = 0;
+}
+
+EXPORT void vqmt_detach_invoke(int id) {
+    stub_invoke* inv = get_invoke(id);
+    if (!inv) return;
+    pthread_mutex_lock(&g_lock);
+    free_invoke(inv);
+    pthread_mutex_unlock(&g_lock);
+}
+
+EXPORT const char* vqmt_get_invoke_columns_information_json(int id) {
+    stub_invoke* inv = get_invoke(id);
+    return inv && inv->columns_json ? inv->columns_json : "[]";
+}
+
+EXPORT const char* vqmt_get_invoke_files_information_json(int id) {
+    stub_invoke* inv = get_invoke(id);
+    return inv && inv->files_json ? inv->files_json : "[]";
+}
+
+EXPORT const char* vqmt_get_invoke_values_json(int id) {
+    stub_invoke* inv = get_invoke(id);
+    return inv && inv->values_json ? inv->values_json : "[]";
+}
+
+EXPORT const char* vqmt_get_invoke_accumulators_json(int id) {
+    stub_invoke* inv = get_invoke(id);
+    return inv && inv->acc_json ? inv->acc_json : "{}";
+}
+
+EXPORT const char* vqmt_get_invoke_generalized_info_json(int id) {
+    stub_invoke* inv = get_invoke(id);
+    return inv && inv->info_json ? inv->info_json : "{}";
+}
+
+EXPORT int vqmt_get_invoke_rowcount(int id) {
+    stub_invoke* inv = get_invoke(id);
+    return inv && inv->measured ? inv->rows : -1;
+}
+
+EXPORT int vqmt_get_invoke_values_array(int id, float* dst) {
+    stub_invoke* inv = get_invoke(id);
+    if (!inv || !inv->measured) return 0;
+    memcpy(dst, inv->values, sizeof(float) * (size_t)inv->rows * inv->ncols);
+    return 1;
+}
+
+EXPORT int vqmt_get_invoke_frames_array(int id, int* dst) {
+    stub_invoke* inv = get_invoke(id);
+    if (!inv || !inv->measured) return 0;
+    memcpy(dst, inv->frames, sizeof(int) * (size_t)inv->rows);
+    return 1;
+}
+
+EXPORT int vqmt_get_exit_status(int id) {
+    stub_invoke* inv = get_invoke(id);
+    return inv ? inv->status : -1;
+}
+
+EXPORT int vqmt_check_activation(void) {
+    return g_activated;
+}
+
+EXPORT int vqmt_activate_pro(const char* code) {
+    return g_activated = code && *code;
+}
+
+EXPORT int vqmt_activate_pro_advanced(const char* code, const char* email, const char* old_pass, const char* new_pass) {
+    (void)email; (void)old_pass; (void)new_pass;
+    return g_activated = code && *code;
+}
+
+EXPORT int vqmt_activate_premium(const char* code) {
+    return g_activated = code && *code;
+}
+
+EXPORT void vqmt_utility_copy_image(const void* src, void* dst, int chan_mask) {
+    (void)src; (void)dst; (void)chan_mask;
+}
+
+EXPORT void vqmt_utility_copy_plane(const void* src, int stride, void* dst, int plane) {
+    (void)src; (void)stride; (void)dst; (void)plane;
+}
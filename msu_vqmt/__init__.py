@@ -6,4 +6,51 @@
 #
 # Copyright MSU Video Group, compression.ru TEAM
 
-from .vqmt_shared_lib import SharedInterface, VQMT_Version, Config, Invoke, loadByDir, find
\ No newline at end of file
+import importlib
+import sys
+
+# public name: module, modules are imported on first use of their names
+_EXPORTS = {}
+for _module, _names in (
+    ('vqmt_shared_lib', ['SharedInterface', 'VQMT_Version', 'Config', 'Invoke', 'loadByDir', 'find']),
+    ('vqmt_profile', ['StatsHook']),
+    ('vqmt_batch', ['BatchRunner', 'BatchResult']),
+    ('vqmt_sources', ['ArraySource', 'BatchSource', 'RawFileSource', 'PictureLayout', 'SharedReference', 'runWithSharedReference']),
+    ('vqmt_cache', ['ResultCache', 'ColumnCache', 'CachedInvoke', 'IncrementalInvoke']),
+    ('vqmt_stream', ['ValueStream', 'PartialResults']),
+    ('vqmt_async', ['AsyncInvoke', 'invokeAsync', 'gatherInvokes']),
+    ('vqmt_segments', ['measureSegmented', 'splitConfig', 'rangeConfig', 'computeAccumulators']),
+    ('vqmt_index', ['IndexManager']),
+    ('vqmt_transport', ['SharedArray']),
+    ('vqmt_export', ['exportNpy', 'loadNpy', 'exportParquet', 'exportArrow', 'columnLabels']),
+    ('vqmt_meta', ['Column', 'ColumnList', 'FrozenDict']),
+    ('vqmt_stats', ['FrameStats']),
+    ('vqmt_resources', ['ResourceScheduler', 'ScheduledJob', 'JobEstimate', 'estimateJob', 'placeMetrics']),
+    ('vqmt_throttle', ['ThrottleController', 'systemLoad']),
+    ('vqmt_gate', ['Rule', 'QualityGate', 'GateResult', 'runGated']),
+    ('vqmt_sampling', ['measureSampled', 'sampleRanges', 'SampledInvoke']),
+    ('vqmt_template', ['ConfigTemplate', 'CompiledConfig', 'FileEntry', 'sweepConfigs']),
+    ('vqmt_server', ['MeasureServer', 'MeasureClient', 'RemoteInvoke']),
+):
+    for _name in _names:
+        _EXPORTS[_name] = _module
+
+__all__ = list(_EXPORTS)
+
+def _load(name):
+    value = getattr(importlib.import_module('.' + _EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+if sys.version_info >= (3, 7):
+    def __getattr__(name):
+        if name not in _EXPORTS:
+            raise AttributeError("module '%s' has no attribute '%s'" % (__name__, name))
+        return _load(name)
+
+    def __dir__():
+        return sorted(set(globals()) | set(_EXPORTS))
+else:
+    # module __getattr__ is not supported, import everything
+    for _name in _EXPORTS:
+        _load(_name)
@@ -0,0 +1,13 @@
+# This is a part of MSU VQMT Python Interface
+# https://github.com/msu-video-group/vqmt_python
+#
+# This code can be used only with installed
+# MSU VQMT Pro, Premium, Trial, DEMO v14.1+
+#
+# Copyright MSU Video Group, compression.ru TEAM
+
+# python -m msu_vqmt starts the measurement server
+
+from .vqmt_server import main
+
+main()
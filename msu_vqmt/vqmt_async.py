@@ -0,0 +1,157 @@
+# This is a part of MSU VQMT Python Interface
+# https://github.com/msu-video-group/vqmt_python
+#
+# This code can be used only with installed
+# MSU VQMT Pro, Premium, Trial, DEMO v14.1+
+#
+# Copyright MSU Video Group, compression.ru TEAM
+
+import asyncio
+
+from .vqmt_stream import ValueStream
+
+_EVENTS = ('PrepareStart', 'PrepareComplete', 'MeasureComplete', 'TotalComplete')
+
+def _runningLoop():
+    # get_running_loop() appeared in Python 3.7
+    get = getattr(asyncio, 'get_running_loop', None)
+    if get is None:
+        loop = asyncio._get_running_loop()
+        if loop is None:
+            raise RuntimeError("no running event loop")
+        return loop
+    return get()
+
+class _BatchIterator:
+    def __init__(self, batches):
+        self.batches = batches
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        batch = await self.batches.get()
+        if batch is None:
+            raise StopAsyncIteration
+        return batch
+
+class AsyncInvoke:
+    # Awaitable wrapper over Invoke. VQMT events, completion and value
+    # batches are passed to the event loop with call_soon_threadsafe.
+    # Result getters are forwarded to the wrapped Invoke. It has to be
+    # created in a coroutine running on the loop it's bound to.
+    def __init__(self, invoke):
+        self.invoke = invoke
+        try:
+            self.loop = _runningLoop()
+        except RuntimeError:
+            raise RuntimeError("AsyncInvoke must be created in a coroutine")
+        self.completed = False
+        self.futures = dict((name, self.loop.create_future()) for name in _EVENTS)
+        self.batches = asyncio.Queue()
+
+        if invoke.value_stream is not None:
+            invoke.value_stream.addListener(self._onBatch)
+        invoke.addEventCallback(self._onEvent)
+        invoke.addCompleteCallback(self._onComplete)
+
+        # events could be fired before the wrapper was created
+        for name, evt in (('PrepareStart', invoke.evtPrepareStart),
+                          ('PrepareComplete', invoke.evtPrepareComplete),
+                          ('MeasureComplete', invoke.evtMeasureComplete)):
+            if evt.is_set(): self._setEvent(name, True)
+        if invoke.evtTotalComplete.is_set():
+            self._complete(invoke.exit_status)
+
+    def _threadsafe(self, func, *args):
+        try:
+            self.loop.call_soon_threadsafe(func, *args)
+        except RuntimeError:
+            # event loop is already closed
+            pass
+
+    def _onEvent(self, event_data):
+        self._threadsafe(self._setEvent, event_data['event'], True)
+
+    def _onBatch(self, frames, values):
+        self._threadsafe(self.batches.put_nowait, (frames, values))
+
+    def _onComplete(self, invoke):
+        self._threadsafe(self._complete, invoke.exit_status)
+
+    def _setEvent(self, name, result):
+        fut = self.futures.get(name)
+        if fut is not None and not fut.done():
+            fut.set_result(result)
+
+    def _complete(self, exit_status):
+        # called from __init__ and from the complete callback when invoke
+        # finishes while the wrapper is created
+        if self.completed:
+            return
+        self.completed = True
+        # events that never happened (e.g. failed prepare) resolve to False
+        for name in ('PrepareStart', 'PrepareComplete', 'MeasureComplete'):
+            self._setEvent(name, False)
+        self._setEvent('TotalComplete', exit_status)
+        self.batches.put_nowait(None)
+
+    async def waitPrepareStart(self):
+        return await asyncio.shield(self.futures['PrepareStart'])
+
+    async def waitPrepareComplete(self):
+        return await asyncio.shield(self.futures['PrepareComplete'])
+
+    async def waitMeasureComplete(self):
+        return await asyncio.shield(self.futures['MeasureComplete'])
+
+    async def wait(self):
+        return await asyncio.shield(self.futures['TotalComplete'])
+
+    async def start(self):
+        self.invoke.startAsynch()
+        return await self.wait()
+
+    async def cancel(self):
+        if await self.waitPrepareComplete():
+            self.invoke.cancel()
+
+    async def pause(self):
+        if await self.waitPrepareComplete():
+            self.invoke.pause()
+
+    async def resume(self):
+        if await self.waitPrepareComplete():
+            self.invoke.resume()
+
+    def values(self):
+        # async iterator over (frames, values) batches streamed while measuring
+        if self.invoke.value_stream is None:
+            raise ValueError("Invoke was created without value stream, use invokeAsync()")
+        return _BatchIterator(self.batches)
+
+    def __getattr__(self, name):
+        return getattr(self.invoke, name)
+
+    def __bool__(self):
+        return bool(self.invoke)
+    __nonzero__ = __bool__
+
+def invokeAsync(vqmt, config, event_cb=None, value_cb=None, batch_size=256):
+    # must be called in a coroutine
+    stream = ValueStream(batch_size=batch_size, use_queue=False)
+    return AsyncInvoke(vqmt.invoke(config, event_cb, value_cb, value_stream=stream))
+
+async def gatherInvokes(vqmt, configs, limit=4, event_cb=None):
+    # runs all configs with at most `limit` measuring simultaneously,
+    # returns finished AsyncInvoke objects in order of configs
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(config):
+        async with semaphore:
+            invoke = AsyncInvoke(vqmt.invoke(config, event_cb))
+            if invoke:
+                await invoke.start()
+            return invoke
+
+    return await asyncio.gather(*[run(config) for config in configs])
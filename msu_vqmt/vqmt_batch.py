@@ -0,0 +1,277 @@
+# This is a part of MSU VQMT Python Interface
+# https://github.com/msu-video-group/vqmt_python
+#
+# This code can be used only with installed
+# MSU VQMT Pro, Premium, Trial, DEMO v14.1+
+#
+# Copyright MSU Video Group, compression.ru TEAM
+
+import binascii
+import multiprocessing
+import os
+import sys
+import threading
+import weakref
+
+from .vqmt_shared_lib import SharedInterface, Invoke, loadByDir, find, _configToDict
+from .vqmt_profile import _clock
+from . import vqmt_export
+from .vqmt_transport import exportResults, importResults, unlinkShared, blockNames
+
+def _loadInterface(vqmt_path=None, vqmt_dir=None, version=None):
+    if vqmt_path is not None:
+        return SharedInterface(vqmt_path)
+    if vqmt_dir is not None:
+        return loadByDir(vqmt_dir)
+    return find(version)
+
+class BatchResult:
+    def __init__(self, index, config):
+        self.index = index
+        self.config = config
+        self.exit_status = None
+        self.attempts = 0
+        self.timed_out = False
+        self.error = None
+        self.columns = None
+        self.files = None
+        self.frames = None
+        self.values = None
+        self.accumulators = None
+        self.index_hits = 0
+        self.index_misses = 0
+        self.values_shared = None
+        self.frames_shared = None
+        self._finalizer = None
+
+    def isOk(self):
+        return self.exit_status in (Invoke.EXIT_STATUS_ALL_OK, Invoke.EXIT_STATUS_ERRORS)
+
+    def release(self):
+        # frees shared memory of results received with shared_memory transport,
+        # also done on exit from `with result:` or when the result is collected
+        self.values = None
+        self.frames = None
+        if self._finalizer is not None:
+            self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_finalizer'] = None
+        return state
+
+    def exportNpy(self, path):
+        return vqmt_export.exportNpy(self, path)
+
+    def exportParquet(self, path, row_group_size=65536, compression='zstd'):
+        return vqmt_export.exportParquet(self, path, row_group_size, compression)
+
+    def exportArrow(self, path, row_group_size=65536):
+        return vqmt_export.exportArrow(self, path, row_group_size)
+
+    def __repr__(self):
+        return 'BatchResult(index=%d, exit_status=%s, attempts=%d)' % (self.index, self.exit_status, self.attempts)
+
+# every worker process loads VQMT once and reuses it for all its jobs
+_worker_vqmt = None
+_worker_index = None
+_worker_error = None
+_worker_stop = None
+_worker_abandoned = False
+
+# how often waiting workers check that the run is stopped, seconds
+_STOP_POLL = 0.05
+
+def _initWorker(vqmt_path, vqmt_dir, version, index_manager=None, stop=None):
+    # errors are reported by jobs, an initializer raising an exception
+    # makes the pool restart workers forever
+    global _worker_vqmt, _worker_index, _worker_error, _worker_stop
+    try:
+        _worker_vqmt = _loadInterface(vqmt_path, vqmt_dir, version)
+    except Exception as e:
+        _worker_error = "Can't load VQMT: %s" % e
+    _worker_index = index_manager
+    _worker_stop = stop
+
+def _exitWorker():
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os._exit(0)
+
+def _isStopped():
+    return _worker_stop is not None and _worker_stop.is_set()
+
+def _waitInvoke(invoke, timeout):
+    # exit status, or None if timeout expired or the run was stopped first
+    deadline = _clock() + timeout if timeout is not None else None
+    while True:
+        left = deadline - _clock() if deadline is not None else _STOP_POLL
+        status = invoke.wait(max(0, min(left, _STOP_POLL)))
+        if status is not None or left <= 0 or _isStopped():
+            return status
+
+def _abandon(result, error):
+    # invoke keeps running in its daemon thread, the worker is recycled
+    global _worker_abandoned
+    _worker_abandoned = True
+    result.error = error
+    return None
+
+def _runInvoke(vqmt, conf, timeout, result):
+    if _worker_index is not None:
+        hits, misses = _worker_index.hits, _worker_index.misses
+        invoke = _worker_index.invoke(vqmt, conf)
+    else:
+        invoke = vqmt.invoke(conf)
+    if not invoke:
+        result.error = invoke.getInitError()
+        return None
+
+    # daemon thread doesn't keep the worker alive if VQMT hangs
+    thread = threading.Thread(target=invoke.start)
+    thread.daemon = True
+    thread.start()
+    if _waitInvoke(invoke, timeout) is None:
+        # cancel is only possible after preparing, which gets one more
+        # timeout, a stopped run doesn't wait for it
+        if _isStopped():
+            result.error = "Batch run was stopped"
+            if not invoke.waitPrepareComplete(0):
+                return _abandon(result, result.error)
+        else:
+            result.timed_out = True
+            if not invoke.waitPrepareComplete(timeout):
+                return _abandon(result, "Preparing didn't complete in time")
+        invoke.cancel()
+        invoke.wait()
+
+    result.exit_status = invoke.wait()
+    if _worker_index is not None:
+        # indexes are looked up when the invoke starts
+        result.index_hits += _worker_index.hits - hits
+        result.index_misses += _worker_index.misses - misses
+    return invoke
+
+def _collectResults(invoke, result, transport, prefix):
+    if not invoke.evtMeasureComplete.is_set():
+        return
+
+    result.columns = invoke.getColumns()
+    result.files = invoke.getFiles()
+    result.accumulators = invoke.getAccumulators()
+    if transport != 'shared_memory' or not exportResults(invoke, result, prefix):
+        result.frames = invoke.getFrameNumbersAsArray()
+        result.values = invoke.getValuesAsArray()
+
+def _runJob(job):
+    index, conf, timeout, retries, transport, prefix = job
+    result = BatchResult(index, conf)
+    if _worker_vqmt is None:
+        result.error = _worker_error
+        return result
+
+    try:
+        while True:
+            if _isStopped():
+                # results of a stopped run are not received, blocks aren't exported
+                result.error = "Batch run was stopped"
+                break
+            result.attempts += 1
+            result.timed_out = False
+            invoke = _runInvoke(_worker_vqmt, conf, timeout, result)
+            if invoke is None:
+                break
+
+            if result.exit_status == Invoke.EXIT_STATUS_FAILED and result.attempts <= retries:
+                continue
+
+            if result.exit_status == Invoke.EXIT_STATUS_FAILED:
+                result.error = _worker_vqmt.getError()
+            else:
+                _collectResults(invoke, result, transport, prefix)
+            break
+    except Exception as e:
+        result.error = str(e)
+
+    if _worker_abandoned:
+        # the abandoned invoke would compete with next jobs. The pool drops
+        # the result right after sending it and before taking the next
+        # job, the worker exits there and the pool starts a fresh one.
+        weakref.finalize(result, _exitWorker)
+    return result
+
+class BatchRunner:
+    def __init__(self, vqmt_path=None, vqmt_dir=None, version=None, processes=None,
+                 timeout=None, retries=0, maxtasksperchild=None, start_method=None, index_manager=None,
+                 transport='pickle'):
+        self.vqmt_path = vqmt_path
+        self.vqmt_dir = vqmt_dir
+        self.version = version
+        self.processes = processes if processes is not None else os.cpu_count() or 1
+        self.timeout = timeout
+        self.retries = retries
+        self.maxtasksperchild = maxtasksperchild
+        self.start_method = start_method
+        self.index_manager = index_manager
+        self.transport = transport
+
+        if self.processes < 1:
+            raise ValueError("Specify at least one process")
+        if self.retries < 0:
+            raise ValueError("Number of retries can't be negative")
+        if self.transport not in ('pickle', 'shared_memory'):
+            raise ValueError("transport should be 'pickle' or 'shared_memory'")
+
+    def _makePool(self, jobs_count):
+        # returns the pool and event stopping its workers
+        ctx = multiprocessing.get_context(self.start_method)
+        stop = ctx.Event()
+        pool = ctx.Pool(max(1, min(self.processes, jobs_count)),
+                        initializer=_initWorker,
+                        initargs=(self.vqmt_path, self.vqmt_dir, self.version, self.index_manager, stop),
+                        maxtasksperchild=self.maxtasksperchild)
+        return pool, stop
+
+    def run(self, configs):
+        # yields BatchResult objects in order of completion
+        # compiled configs are sent to workers encoded
+        # shared blocks of jobs are named by prefix of the run and job index
+        prefix = 'vqmt%s_' % binascii.hexlify(os.urandom(4)).decode('ascii')
+        jobs = [(i, conf if hasattr(conf, 'getEncoded') else _configToDict(conf), self.timeout, self.retries,
+                 self.transport, prefix) for i, conf in enumerate(configs)]
+        if len(jobs) == 0:
+            return
+
+        pool, stop = self._makePool(len(jobs))
+        completed = False
+        received = set()
+        try:
+            for result in pool.imap_unordered(_runJob, jobs, chunksize=1):
+                received.add(result.index)
+                importResults(result)
+                yield result
+            completed = True
+        finally:
+            # workers of a run stopped early cancel their invokes and skip
+            # the other jobs. Pool isn't terminated: a worker killed while
+            # sending its result keeps the result queue locked.
+            if not completed: stop.set()
+            pool.close()
+            pool.join()
+            if self.transport == 'shared_memory' and not completed:
+                # results dropped with terminated workers leave their blocks behind
+                for i in range(len(jobs)):
+                    if i in received: continue
+                    for name in blockNames(prefix, i):
+                        unlinkShared(name)
+
+    def runAll(self, configs):
+        results = list(self.run(configs))
+        results.sort(key=lambda r: r.index)
+        return results
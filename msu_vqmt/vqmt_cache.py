@@ -0,0 +1,465 @@
+# This is a part of MSU VQMT Python Interface
+# https://github.com/msu-video-group/vqmt_python
+#
+# This code can be used only with installed
+# MSU VQMT Pro, Premium, Trial, DEMO v14.1+
+#
+# Copyright MSU Video Group, compression.ru TEAM
+
+import hashlib
+import json
+import os
+import threading
+import numpy as np
+
+from .vqmt_shared_lib import Invoke, _configToDict
+from .vqmt_meta import columnName
+
+_SAMPLE_SIZE = 1 << 16
+_ENTRY_EXT = '.npz'
+
+def _canonicalJson(obj):
+    return json.dumps(obj, sort_keys=True, separators=(',', ':'))
+
+def _metricNames(metric):
+    m = metric.get('metric')
+    name = m.get('name') if isinstance(m, dict) else m
+    return str(name).lower()
+
+def _fileEntries(conf):
+    # (path, options) for every file of configuration
+    for f in conf.get('files', []):
+        if isinstance(f, (list, tuple)):
+            yield f[0], f[1] if len(f) > 1 else {}
+        else:
+            yield f, {}
+
+def fileFingerprint(path, mode='stat'):
+    # 'stat' uses size and mtime, 'sample' hashes size and three sampled blocks
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+
+    if mode == 'stat':
+        return [st.st_size, st.st_mtime_ns]
+    elif mode == 'sample':
+        h = hashlib.sha256(str(st.st_size).encode('utf-8'))
+        with open(path, 'rb') as f:
+            for pos in (0, max(0, st.st_size // 2 - _SAMPLE_SIZE // 2), max(0, st.st_size - _SAMPLE_SIZE)):
+                f.seek(pos)
+                h.update(f.read(_SAMPLE_SIZE))
+        return [st.st_size, h.hexdigest()]
+
+    raise ValueError("Unknown fingerprint mode '%s'" % mode)
+
+def _isCacheable(conf):
+    # content of callback and stdin inputs is unknown to the cache
+    for path, opts in _fileEntries(conf):
+        if opts.get('mode') == 'callback' or opts.get('stdin'):
+            return False
+    return True
+
+class CachedInvoke:
+    # Invoke-like object returning stored results without touching VQMT
+    def __init__(self, data, event_cb=None, value_cb=None):
+        self.values = data['values']
+        self.frames = data['frames']
+        self.columns = data['columns']
+        self.files = data['files']
+        self.accumulators = data['accumulators']
+        self.exit_status = data['exit_status']
+        self.invoke_id = -1
+        self.err = None
+        self.event_cb = event_cb
+        self.value_cb = value_cb
+        self.evtTotalComplete = threading.Event()
+        self.thread = None
+
+    def getInitError(self):
+        return self.err
+
+    def waitPrepareStart(self, timeout=None):
+        return True
+
+    def waitPrepareComplete(self, timeout=None):
+        return True
+
+    def waitMeasureComplete(self, timeout=None):
+        return self.evtTotalComplete.wait(timeout)
+
+    def wait(self, timeout=None):
+        self.evtTotalComplete.wait(timeout)
+        return self.exit_status if self.evtTotalComplete.is_set() else None
+
+    def start(self):
+        # replay events and values for callers relying on callbacks
+        for name in ('PrepareStart', 'PrepareComplete'):
+            if self.event_cb is not None: self.event_cb({'event': name})
+        if self.value_cb is not None:
+            for row, frame in enumerate(self.frames):
+                for col in range(self.values.shape[1]):
+                    self.value_cb(self.invoke_id, int(frame), col, float(self.values[row, col]))
+        if self.event_cb is not None: self.event_cb({'event': 'MeasureComplete'})
+        self.evtTotalComplete.set()
+        return self.exit_status
+
+    def startAsynch(self):
+        self.thread = threading.Thread(target=self.start)
+        self.thread.start()
+
+    def getExitStatus(self):
+        return self.exit_status
+
+    def computeIsFailed(self):
+        return self.exit_status == Invoke.EXIT_STATUS_FAILED
+
+    def cancel(self):
+        pass
+
+    def pause(self):
+        pass
+
+    def resume(self):
+        pass
+
+    def getColumns(self):
+        return self.columns
+
+    def getFiles(self):
+        return self.files
+
+    def getValuesAsArray(self):
+        return self.values.copy() if self.values is not None else None
+
+    def getFrameNumbersAsArray(self):
+        return self.frames.copy() if self.frames is not None else None
+
+    def getAccumulators(self):
+        return self.accumulators
+
+    def __bool__(self):
+        return True
+    __nonzero__ = __bool__
+
+class ResultCache:
+    def __init__(self, directory, max_size=1 << 30, fingerprint='stat'):
+        self.directory = directory
+        self.max_size = max_size
+        self.fingerprint = fingerprint
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        # key -> [size, last access], ordered by access on eviction
+        self.entries = {}
+        for name in os.listdir(directory):
+            if not name.endswith(_ENTRY_EXT): continue
+            st = os.stat(os.path.join(directory, name))
+            self.entries[name[:-len(_ENTRY_EXT)]] = [st.st_size, st.st_mtime]
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + _ENTRY_EXT)
+
+    def makeKey(self, config):
+        conf = _configToDict(config)
+        fingerprints = [fileFingerprint(path, self.fingerprint) for path, _ in _fileEntries(conf)]
+        data = _canonicalJson({'config': conf, 'fingerprints': fingerprints})
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as npz:
+                meta = json.loads(npz['meta'].tobytes().decode('utf-8'))
+                meta['values'] = npz['values']
+                meta['frames'] = npz['frames']
+            os.utime(path, None)
+        except (OSError, ValueError, KeyError):
+            with self.lock:
+                self.entries.pop(key, None)
+            return None
+
+        with self.lock:
+            if key in self.entries:
+                self.entries[key][1] = os.stat(path).st_mtime
+        return meta
+
+    def put(self, key, invoke):
+        meta = {
+            'columns': invoke.getColumns(),
+            'files': invoke.getFiles(),
+            'accumulators': invoke.getAccumulators(),
+            'exit_status': invoke.getExitStatus(),
+        }
+        values = invoke.getValuesAsArray()
+        frames = invoke.getFrameNumbersAsArray()
+        if values is None or frames is None:
+            return
+
+        self.putData(key, values, frames, meta)
+
+    def putData(self, key, values, frames, meta):
+        path = self._path(key)
+        tmp_path = '%s.%d.%d.tmp' % (path, os.getpid(), threading.get_ident())
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, values=values, frames=frames,
+                     meta=np.frombuffer(json.dumps(meta).encode('utf-8'), dtype=np.uint8))
+        os.replace(tmp_path, path)
+
+        st = os.stat(path)
+        with self.lock:
+            self.entries[key] = [st.st_size, st.st_mtime]
+        self._evict()
+
+    def _evict(self):
+        with self.lock:
+            total = sum(size for size, _ in self.entries.values())
+            if total <= self.max_size:
+                return
+            victims = []
+            for key, (size, _) in sorted(self.entries.items(), key=lambda kv: kv[1][1]):
+                if total <= self.max_size: break
+                total -= size
+                victims.append(key)
+            for key in victims:
+                del self.entries[key]
+
+        for key in victims:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def invalidate(self, config):
+        self.remove(self.makeKey(config))
+
+    def remove(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        with self.lock:
+            keys = list(self.entries.keys())
+        for key in keys:
+            self.remove(key)
+
+    def size(self):
+        with self.lock:
+            return sum(size for size, _ in self.entries.values())
+
+    def invoke(self, vqmt, config, event_cb=None, value_cb=None):
+        # returns CachedInvoke on hit, regular Invoke storing its results on miss
+        conf = _configToDict(config)
+        if not _isCacheable(conf):
+            return vqmt.invoke(conf, event_cb, value_cb)
+
+        key = self.makeKey(conf)
+        data = self.get(key)
+        if data is not None:
+            with self.lock:
+                self.hits += 1
+            return CachedInvoke(data, event_cb, value_cb)
+
+        with self.lock:
+            self.misses += 1
+        invoke = vqmt.invoke(conf, event_cb, value_cb)
+        if invoke:
+            def store(inv):
+                if inv.exit_status != Invoke.EXIT_STATUS_ALL_OK: return
+                try:
+                    self.put(key, inv)
+                except OSError:
+                    pass
+            invoke.addCompleteCallback(store)
+        return invoke
+
+class IncrementalInvoke(CachedInvoke):
+    # Measures only metrics missing in ColumnCache, merges cached and fresh
+    # columns in the original order when started
+    def __init__(self, cache, vqmt, conf, event_cb=None, value_cb=None):
+        CachedInvoke.__init__(self, {'values': None, 'frames': None, 'columns': None, 'files': None,
+                                     'accumulators': None, 'exit_status': None}, event_cb, value_cb)
+        self.cache = cache
+        self.vqmt = vqmt
+        self.conf = conf
+        self.computed_metrics = []
+
+    def _measure(self, indices, col_map, forwarded=()):
+        # events of inner invokes are not forwarded, start() emits one
+        # sequence for all of them. Values of columns in `forwarded` were
+        # already passed to value callback by the previous measuring.
+        sub = dict(self.conf)
+        sub['metrics'] = [self.conf['metrics'][i] for i in indices]
+
+        def forward(invoke_id, frame, col, value):
+            col = col_map[col] if col < len(col_map) else col
+            if col not in forwarded:
+                self.value_cb(invoke_id, frame, col, value)
+        value_cb = forward if self.value_cb is not None else None
+
+        invoke = self.vqmt.invoke(sub, None, value_cb)
+        if not invoke:
+            self.err = invoke.getInitError()
+            return None, Invoke.EXIT_STATUS_FAILED
+
+        status = invoke.start()
+        if status not in (Invoke.EXIT_STATUS_ALL_OK, Invoke.EXIT_STATUS_ERRORS):
+            self.err = self.vqmt.getError()
+            return None, status
+        return invoke, status
+
+    def _splitUnits(self, indices, invoke, status):
+        # one column per metric is expected, otherwise columns can't be mapped
+        columns = invoke.getColumns()
+        if len(columns) != len(indices):
+            return None
+        for i, col in zip(indices, columns):
+            name = _metricNames(self.conf['metrics'][i])
+            aliases = [str(a).lower() for a in col.get('metric_aliases', [])]
+            if name != str(col.get('metric_name', '')).lower() and name not in aliases:
+                return None
+
+        values = invoke.getValuesAsArray()
+        frames = invoke.getFrameNumbersAsArray()
+        accumulators = invoke.getAccumulators()
+        files = invoke.getFiles()
+
+        units = []
+        for j, col in enumerate(columns):
+            letter = columnName(j)
+            acc = dict((name, [vals[letter]]) for name, vals in accumulators.items() if letter in vals)
+            units.append({
+                'values': values[:, j:j + 1].copy(),
+                'frames': frames,
+                'columns': [col],
+                'files': files,
+                'accumulators': acc,
+                'exit_status': status,
+            })
+        return units
+
+    def _run(self):
+        metrics = self.conf.get('metrics', [])
+        keys = [self.cache.makeMetricKey(self.conf, m) for m in metrics]
+        units = [self.cache.get(k) for k in keys]
+
+        cached = [u for u in units if u is not None]
+        if any(not np.array_equal(u['frames'], cached[0]['frames']) for u in cached):
+            units = [None] * len(units)
+
+        missing = [i for i, u in enumerate(units) if u is None]
+        with self.cache.lock:
+            self.cache.hits += len(metrics) - len(missing)
+            self.cache.misses += len(missing)
+        self.computed_metrics = missing
+
+        if missing:
+            invoke, status = self._measure(missing, missing)
+            if invoke is None:
+                return status
+
+            fresh = self._splitUnits(missing, invoke, status)
+            frames = invoke.getFrameNumbersAsArray()
+            consistent = all(np.array_equal(u['frames'], frames) for u in units if u is not None)
+
+            if fresh is None or not consistent:
+                if len(missing) < len(metrics):
+                    # fall back to measuring everything at once
+                    self.computed_metrics = list(range(len(metrics)))
+                    invoke, status = self._measure(self.computed_metrics, self.computed_metrics, set(missing))
+                    if invoke is None:
+                        return status
+                    fresh = self._splitUnits(self.computed_metrics, invoke, status)
+                    missing = self.computed_metrics
+                if fresh is None:
+                    self._setFromInvoke(invoke, status)
+                    return status
+
+            for i, unit in zip(missing, fresh):
+                units[i] = unit
+                if status == Invoke.EXIT_STATUS_ALL_OK:
+                    meta = dict((k, unit[k]) for k in ('columns', 'files', 'accumulators', 'exit_status'))
+                    self.cache.putData(keys[i], unit['values'], unit['frames'], meta)
+
+        self._merge(units, missing)
+        return self.exit_status
+
+    def _setFromInvoke(self, invoke, status):
+        self.values = invoke.getValuesAsArray()
+        self.frames = invoke.getFrameNumbersAsArray()
+        self.columns = invoke.getColumns()
+        self.files = invoke.getFiles()
+        self.accumulators = invoke.getAccumulators()
+        self.exit_status = status
+
+    def _merge(self, units, fresh_indices):
+        self.frames = units[0]['frames']
+        self.values = np.concatenate([u['values'] for u in units], axis=1)
+        self.files = units[0]['files']
+        self.columns = []
+        self.accumulators = {}
+        col = 0
+        for u in units:
+            for k, info in enumerate(u['columns']):
+                letter = columnName(col)
+                info = dict(info)
+                info['col'] = letter
+                self.columns.append(info)
+                for name, vals in u['accumulators'].items():
+                    if k < len(vals) and vals[k] is not None:
+                        self.accumulators.setdefault(name, {})[letter] = vals[k]
+                col += 1
+
+        statuses = [u['exit_status'] for u in units]
+        self.exit_status = Invoke.EXIT_STATUS_ERRORS if Invoke.EXIT_STATUS_ERRORS in statuses else Invoke.EXIT_STATUS_ALL_OK
+
+        # replay cached columns for value callback, fresh ones were forwarded live
+        if self.value_cb is not None:
+            fresh = set(fresh_indices)
+            for i, u in enumerate(units):
+                if i in fresh: continue
+                for row, frame in enumerate(u['frames']):
+                    self.value_cb(self.invoke_id, int(frame), i, float(u['values'][row, 0]))
+
+    def start(self):
+        # one sequence of events whether columns are cached, measured or both
+        for name in ('PrepareStart', 'PrepareComplete'):
+            if self.event_cb is not None: self.event_cb({'event': name})
+        try:
+            self.exit_status = self._run()
+        finally:
+            if self.event_cb is not None: self.event_cb({'event': 'MeasureComplete'})
+            self.evtTotalComplete.set()
+        return self.exit_status
+
+class ColumnCache(ResultCache):
+    # Caches every metric of configuration separately, so adding a metric to
+    # configuration only measures the new one
+    def makeMetricKey(self, config, metric):
+        conf = _configToDict(config)
+        common = dict((k, v) for k, v in conf.items() if k not in ('metrics', 'performance'))
+        fingerprints = [fileFingerprint(path, self.fingerprint) for path, _ in _fileEntries(conf)]
+        data = _canonicalJson({'metric': metric, 'common': common, 'fingerprints': fingerprints})
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    def invalidateMetric(self, config, metric):
+        self.remove(self.makeMetricKey(config, metric))
+
+    def invalidate(self, config):
+        conf = _configToDict(config)
+        for metric in conf.get('metrics', []):
+            self.invalidateMetric(conf, metric)
+
+    def invoke(self, vqmt, config, event_cb=None, value_cb=None):
+        conf = _configToDict(config)
+        if not _isCacheable(conf) or not conf.get('metrics'):
+            return vqmt.invoke(conf, event_cb, value_cb)
+        return IncrementalInvoke(self, vqmt, conf, event_cb, value_cb)
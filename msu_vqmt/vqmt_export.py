@@ -0,0 +1,153 @@
+# This is a part of MSU VQMT Python Interface
+# https://github.com/msu-video-group/vqmt_python
+#
+# This code can be used only with installed
+# MSU VQMT Pro, Premium, Trial, DEMO v14.1+
+#
+# Copyright MSU Video Group, compression.ru TEAM
+
+import json
+import os
+
+from .vqmt_lazy import LazyModule
+from .vqmt_meta import Column
+
+np = LazyModule('numpy')
+
+_NPY_FORMAT = 1
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise Exception("Arrow and Parquet export requires pyarrow package")
+    return pyarrow
+
+def columnLabels(columns):
+    # unique readable names of columns, e.g. 'psnr_Y' or 'vmaf_v061_Y'
+    labels = []
+    used = set()
+    for i, col in enumerate(columns):
+        label = (col if isinstance(col, Column) else Column(col, i)).label
+        if label in used or label == 'frame':
+            label = '%s_%s' % (label, col.get('col', i))
+        used.add(label)
+        labels.append(label)
+    return labels
+
+def _resultParts(result):
+    # works for Invoke, CachedInvoke and BatchResult
+    if hasattr(result, 'getColumns'):
+        return (result.getColumns(), result.getFiles(), result.getAccumulators(),
+                result.getExitStatus())
+    return result.columns, result.files, result.accumulators, result.exit_status
+
+def _resultArrays(result):
+    if hasattr(result, 'getColumns'):
+        return result.getFrameNumbersAsArray(), result.getValuesAsArray()
+    return result.frames, result.values
+
+def _metadata(result, rows):
+    columns, files, accumulators, exit_status = _resultParts(result)
+    return {
+        'format': _NPY_FORMAT,
+        'rows': rows,
+        'columns': columns,
+        'labels': columnLabels(columns or []),
+        'files': files,
+        'accumulators': accumulators,
+        'exit_status': exit_status,
+    }
+
+def exportNpy(result, path):
+    # Writes <path>.values.npy, <path>.frames.npy and <path>.json sidecar.
+    # Values of Invoke are written by VQMT directly into the mapped file.
+    values_path, frames_path = path + '.values.npy', path + '.frames.npy'
+    if hasattr(result, 'getRowCount'):
+        rows = result.getRowCount()
+        if rows is None:
+            raise ValueError("Invoke has no results")
+        cols = len(result.getColumns())
+        values = np.lib.format.open_memmap(values_path, mode='w+', dtype=np.single, shape=(rows, cols))
+        frames = np.lib.format.open_memmap(frames_path, mode='w+', dtype=np.intc, shape=(rows,))
+        try:
+            ok = result.getValuesAsArray(out=values) is not None and \
+                result.getFrameNumbersAsArray(out=frames) is not None
+            values.flush()
+            frames.flush()
+        finally:
+            del values, frames
+        if not ok:
+            raise Exception("Can't get values of invoke")
+    else:
+        frames, values = _resultArrays(result)
+        if values is None or frames is None:
+            raise ValueError("Result has no values")
+        np.save(values_path, np.ascontiguousarray(values, dtype=np.single))
+        np.save(frames_path, np.ascontiguousarray(frames, dtype=np.intc))
+        rows = len(frames)
+
+    meta = _metadata(result, rows)
+    meta['values'] = os.path.basename(values_path)
+    meta['frames'] = os.path.basename(frames_path)
+    with open(path + '.json', 'w') as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+def loadNpy(path, mmap_mode='r'):
+    # returns (frames, values, metadata) written by exportNpy
+    with open(path + '.json') as f:
+        meta = json.load(f)
+    directory = os.path.dirname(path)
+    frames = np.load(os.path.join(directory, meta['frames']), mmap_mode=mmap_mode)
+    values = np.load(os.path.join(directory, meta['values']), mmap_mode=mmap_mode)
+    return frames, values, meta
+
+def _arrowSchema(pa, meta):
+    fields = [pa.field('frame', pa.int32())]
+    fields += [pa.field(label, pa.float32()) for label in meta['labels']]
+    info = dict((k, v) for k, v in meta.items() if k not in ('format', 'rows', 'labels'))
+    return pa.schema(fields, metadata={b'vqmt': json.dumps(info).encode('utf-8')})
+
+def _recordBatches(pa, schema, frames, values, row_group_size):
+    # slices are converted one at a time, NaN values become nulls
+    for start in range(0, len(frames), row_group_size):
+        end = min(start + row_group_size, len(frames))
+        arrays = [pa.array(np.asarray(frames[start:end], dtype=np.int32))]
+        for j in range(values.shape[1]):
+            column = np.asarray(values[start:end, j], dtype=np.float32)
+            arrays.append(pa.array(column, mask=np.isnan(column)))
+        yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+def _exportArrowFormat(result, path, row_group_size, parquet, compression='zstd'):
+    if row_group_size <= 0:
+        raise ValueError("row_group_size should be positive")
+    pa = _pyarrow()
+    frames, values = _resultArrays(result)
+    if values is None or frames is None:
+        raise ValueError("Result has no values")
+
+    meta = _metadata(result, len(frames))
+    schema = _arrowSchema(pa, meta)
+    if parquet:
+        writer = pa.parquet.ParquetWriter(path, schema, compression=compression)
+    else:
+        writer = pa.ipc.new_file(path, schema)
+    try:
+        for batch in _recordBatches(pa, schema, frames, values, row_group_size):
+            if parquet:
+                writer.write_table(pa.Table.from_batches([batch]), row_group_size=row_group_size)
+            else:
+                writer.write_batch(batch)
+    finally:
+        writer.close()
+    return meta
+
+def exportParquet(result, path, row_group_size=65536, compression='zstd'):
+    # one 'frame' column plus a float column per metric, metadata in schema
+    return _exportArrowFormat(result, path, row_group_size, True, compression)
+
+def exportArrow(result, path, row_group_size=65536):
+    # Arrow IPC file, can be memory-mapped with pyarrow.ipc.open_file
+    return _exportArrowFormat(result, path, row_group_size, False)
@@ -0,0 +1,167 @@
+# This is a part of MSU VQMT Python Interface
+# https://github.com/msu-video-group/vqmt_python
+#
+# This code can be used only with installed
+# MSU VQMT Pro, Premium, Trial, DEMO v14.1+
+#
+# Copyright MSU Video Group, compression.ru TEAM
+
+import copy
+import operator
+import threading
+import numpy as np
+
+from .vqmt_stream import ValueStream
+
+_OPS = {'<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge}
+
+class Rule:
+    # Fires when mean of `column` over last `window` frames compares with
+    # threshold by `op`, e.g. Rule('psnr_CPU_Y', '<', 35, window=50).
+    # Column is an index, letter, label or metric name (see ColumnList).
+    # window=1 checks every single frame. NaN values are skipped.
+    def __init__(self, column, op, threshold, window=1, name=None):
+        if op not in _OPS:
+            raise ValueError("op should be one of %s" % ', '.join(sorted(_OPS)))
+        if window < 1:
+            raise ValueError("window should be positive")
+
+        self.column = column
+        self.op = op
+        self.threshold = threshold
+        self.window = window
+        self.name = name if name is not None else \
+            '%s %s %g' % (column if window == 1 else 'mean(%s, %d)' % (column, window), op, threshold)
+        self.reset()
+
+    def reset(self):
+        self.index = None
+        self.tail = np.ndarray([0], dtype=np.float64)
+        self.tail_frames = np.ndarray([0], dtype=np.intc)
+
+    def _resolve(self, columns):
+        if isinstance(self.column, int):
+            index = self.column if self.column < len(columns) else None
+        else:
+            index = columns.indexOf(self.column)
+        if index is None:
+            raise ValueError("Rule '%s': unknown column %s" % (self.name, self.column))
+        self.index = index
+
+    def evaluate(self, frames, values):
+        # returns (frame, value) of the first window triggering the rule or None
+        w = self.window
+        vals = np.concatenate([self.tail, values[:, self.index]])
+        fr = np.concatenate([self.tail_frames, frames])
+        keep = max(0, len(vals) - w + 1)
+        self.tail, self.tail_frames = vals[keep:], fr[keep:]
+        if len(vals) < w:
+            return None
+
+        valid = ~np.isnan(vals)
+        sums = np.concatenate([[0.0], np.cumsum(np.where(valid, vals, 0.0))])
+        counts = np.concatenate([[0], np.cumsum(valid)])
+        window_counts = counts[w:] - counts[:-w]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = (sums[w:] - sums[:-w]) / window_counts
+        hits = _OPS[self.op](means, self.threshold) & (window_counts > 0)
+        if not hits.any():
+            return None
+        first = int(np.argmax(hits))
+        return int(fr[first + w - 1]), float(means[first])
+
+    def __repr__(self):
+        return 'Rule(%s)' % self.name
+
+class GateResult:
+    # passed is False if a rule fired or rules couldn't be checked (error),
+    # frames and values are rows measured until the invoke was cancelled
+    def __init__(self, invoke, gate):
+        self.invoke = invoke
+        self.rule = gate.rule
+        self.frame = gate.frame
+        self.value = gate.value
+        self.error = gate.error
+        self.passed = gate.rule is None and gate.error is None
+        self.exit_status = invoke.exit_status
+        self.frames, self.values = invoke.getPartialResults().snapshot()
+
+    def __repr__(self):
+        if self.passed:
+            return 'GateResult(passed)'
+        if self.error is not None:
+            return 'GateResult(failed: %s)' % self.error
+        return 'GateResult(failed by %s at frame %d, value %g)' % (self.rule.name, self.frame, self.value)
+
+class QualityGate:
+    # Checks rules on batches of a value stream and cancels the invoke as
+    # soon as any of them fires. Every gate keeps its own copies of rules,
+    # so one list of rules can be used by several gates.
+    # Columns of rules are resolved when preparing is complete, an unknown
+    # column cancels the invoke and is reported in `error`.
+    def __init__(self, rules):
+        self.rules = [copy.copy(rule) for rule in rules]
+        if not self.rules:
+            raise ValueError("Specify at least one rule")
+        self.lock = threading.Lock()
+        self.invoke = None
+        self.rule = self.frame = self.value = self.error = None
+
+    def attach(self, invoke):
+        if invoke.value_stream is None:
+            raise ValueError("Invoke should be created with value_stream or partial_results=True")
+        for rule in self.rules: rule.reset()
+        self.invoke = invoke
+        self.rule = self.frame = self.value = self.error = None
+        if invoke.evtPrepareComplete.is_set():
+            self._resolve()
+        else:
+            invoke.addEventCallback(self._onEvent)
+        invoke.value_stream.addListener(self._check)
+
+    def _resolve(self):
+        columns = self.invoke.getColumns()
+        for rule in self.rules: rule._resolve(columns)
+
+    def _onEvent(self, event):
+        if event['event'] != 'PrepareComplete':
+            return
+        try:
+            self._resolve()
+        except ValueError as e:
+            with self.lock:
+                self.error = str(e)
+            self.invoke.cancel()
+
+    def _check(self, frames, values):
+        with self.lock:
+            if self.rule is not None or self.error is not None:
+                return
+            fired = []
+            for rule in self.rules:
+                res = rule.evaluate(frames, values)
+                if res is not None: fired.append((res[0], rule, res[1]))
+            if not fired:
+                return
+            # the earliest frame wins, rules order breaks ties
+            self.frame, self.rule, self.value = min(fired, key=lambda f: f[0])
+        self.invoke.cancel()
+
+    def isFired(self):
+        return self.rule is not None
+
+    def getError(self):
+        return self.error
+
+def runGated(vqmt, config, rules, batch_size=16, event_cb=None, value_cb=None):
+    # Measures config until a rule fires. Smaller batch_size reacts faster,
+    # the invoke is cancelled at most batch_size frames after the verdict.
+    stream = ValueStream(batch_size=batch_size, use_queue=False)
+    invoke = vqmt.invoke(config, event_cb=event_cb, value_cb=value_cb, value_stream=stream, partial_results=True)
+    if not invoke:
+        raise Exception("Can't create invoke: %s" % invoke.getInitError())
+
+    gate = QualityGate(rules)
+    gate.attach(invoke)
+    invoke.start()
+    return GateResult(invoke, gate)
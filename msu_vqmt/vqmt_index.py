@@ -0,0 +1,279 @@
+# This is a part of MSU VQMT Python Interface
+# https://github.com/msu-video-group/vqmt_python
+#
+# This code can be used only with installed
+# MSU VQMT Pro, Premium, Trial, DEMO v14.1+
+#
+# Copyright MSU Video Group, compression.ru TEAM
+
+import copy
+import hashlib
+import os
+import threading
+import time
+
+from .vqmt_shared_lib import _configToDict
+
+if os.name == 'nt':
+    import msvcrt
+
+    def _lock(f, blocking=True):
+        # LK_LOCK gives up after 10 attempts, so waiting is done here
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                return True
+            except OSError:
+                if not blocking:
+                    return False
+            time.sleep(0.1)
+
+    def _unlock(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _lock(f, blocking=True):
+        if blocking:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            return True
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return False
+        return True
+
+    def _unlock(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+_INDEX_EXT = '.vqmtidx'
+_LOCK_EXT = '.lock'
+
+def _removeFile(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+class IndexManager:
+    # Assigns stable index files to inputs of configurations (keyed by path,
+    # size and mtime), so VQMT builds index of every file only once. Index
+    # being built is locked by a lock file until the invoke building it is
+    # prepared, other invokes and processes wait for it on start instead of
+    # building it again.
+    def __init__(self, directory, index_type=None, max_size=None, max_age=None):
+        self.directory = directory
+        self.index_type = index_type
+        self.max_size = max_size
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.stats_lock = threading.Lock()
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['stats_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.stats_lock = threading.Lock()
+
+    def indexPath(self, path):
+        # None for files which don't exist (e.g. URLs or devices)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        key = '%s|%d|%d' % (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+        name = hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+        return os.path.join(self.directory, name + _INDEX_EXT)
+
+    def _lockFile(self, index_path, blocking=True):
+        # Returns locked lock file of the index, or None if it's locked by
+        # another invoke and blocking is False. Lock files are removed with
+        # their indexes, a file removed while waiting for it is opened again.
+        lock_path = index_path + _LOCK_EXT
+        while True:
+            lock_file = open(lock_path, 'a+')
+            try:
+                locked = _lock(lock_file, blocking)
+            except Exception:
+                lock_file.close()
+                raise
+            if not locked:
+                lock_file.close()
+                return None
+            try:
+                if os.path.samestat(os.fstat(lock_file.fileno()), os.stat(lock_path)):
+                    return lock_file
+            except OSError:
+                pass
+            _unlock(lock_file)
+            lock_file.close()
+
+    def _count(self, hit):
+        with self.stats_lock:
+            if hit: self.hits += 1
+            else: self.misses += 1
+
+    def _prepare(self, config):
+        # returns configuration with assigned index files and their paths
+        conf = copy.deepcopy(_configToDict(config))
+        index_paths = []
+        files = []
+        for f in conf.get('files', []):
+            path, opts = (f[0], f[1] if len(f) > 1 else {}) if isinstance(f, (list, tuple)) else (f, {})
+            index_path = None
+            if opts.get('mode') != 'callback' and not opts.get('stdin') and 'index_file' not in opts:
+                index_path = self.indexPath(path)
+            if index_path is None:
+                files.append(f)
+                continue
+
+            if index_path not in index_paths:
+                index_paths.append(index_path)
+            opts = dict(opts)
+            opts['index_file'] = index_path
+            if self.index_type is not None and 'index' not in opts:
+                opts['index'] = self.index_type
+            files.append([path, opts])
+
+        if 'files' in conf:
+            conf['files'] = files
+        return conf, index_paths
+
+    def _acquire(self, index_paths):
+        # Waits while other invokes build these indexes, returns lock files
+        # of indexes this invoke is going to build. Locks are taken in the
+        # same order everywhere, so invokes sharing files can't deadlock.
+        held = {}
+        try:
+            for index_path in sorted(index_paths):
+                lock_file = self._lockFile(index_path)
+                hit = os.path.exists(index_path)
+                if hit:
+                    _unlock(lock_file)
+                    lock_file.close()
+                    os.utime(index_path, None)
+                else:
+                    held[index_path] = lock_file
+                self._count(hit)
+        except Exception:
+            self._release(held)
+            raise
+        return held
+
+    def _release(self, held):
+        while held:
+            _, lock_file = held.popitem()
+            try:
+                _unlock(lock_file)
+            finally:
+                lock_file.close()
+
+    def apply(self, config):
+        # returns configuration dict with assigned index files, without locking
+        return self._prepare(config)[0]
+
+    def invoke(self, vqmt, config, *args, **kwargs):
+        # Indexes are locked when the invoke starts, missing ones stay
+        # locked until VQMT has built them (PrepareComplete), so invokes
+        # can be created in any order and started concurrently
+        conf, index_paths = self._prepare(config)
+        invoke = vqmt.invoke(conf, *args, **kwargs)
+        if not invoke or not index_paths:
+            return invoke
+
+        held = {}
+        lock = threading.Lock()
+
+        def acquire(inv):
+            with lock:
+                held.update(self._acquire(index_paths))
+
+        def release(*args):
+            with lock:
+                built = bool(held)
+                self._release(held)
+            if built and (self.max_size is not None or self.max_age is not None):
+                self.evict()
+
+        invoke.addStartCallback(acquire)
+        invoke.addEventCallback(lambda event: release() if event['event'] == 'PrepareComplete' else None)
+        # preparing may fail without PrepareComplete
+        invoke.addCompleteCallback(release)
+        return invoke
+
+    def _entries(self):
+        res = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(_INDEX_EXT): continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            res.append((st.st_mtime, st.st_size, path))
+        res.sort()
+        return res
+
+    def _remove(self, path):
+        # Removes index with its lock file, indexes locked by running
+        # invokes are skipped. Returns True if the index was removed.
+        lock_file = self._lockFile(path, blocking=False)
+        if lock_file is None:
+            return False
+        try:
+            existed = os.path.exists(path)
+            _removeFile(path)
+            gone = not os.path.exists(path)
+            if gone and os.name != 'nt':
+                # removed while locked, waiting invokes open a new lock file
+                _removeFile(path + _LOCK_EXT)
+        finally:
+            _unlock(lock_file)
+            lock_file.close()
+        if gone and os.name == 'nt':
+            # open files can't be removed on Windows, the lock file stays
+            # if another invoke has opened it meanwhile
+            _removeFile(path + _LOCK_EXT)
+        return existed and gone
+
+    def evict(self):
+        # removes indexes older than max_age seconds, then least recently
+        # used ones while total size exceeds max_size bytes. Lock files of
+        # indexes which were never built are removed as well.
+        for name in os.listdir(self.directory):
+            if name.endswith(_INDEX_EXT + _LOCK_EXT):
+                index_path = os.path.join(self.directory, name[:-len(_LOCK_EXT)])
+                if not os.path.exists(index_path): self._remove(index_path)
+
+        entries = self._entries()
+        removed = 0
+        if self.max_age is not None:
+            deadline = time.time() - self.max_age
+            for mtime, size, path in list(entries):
+                if mtime < deadline and self._remove(path):
+                    entries.remove((mtime, size, path))
+                    removed += 1
+
+        if self.max_size is not None:
+            total = sum(size for _, size, _ in entries)
+            for mtime, size, path in entries:
+                if total <= self.max_size: break
+                if self._remove(path):
+                    total -= size
+                    removed += 1
+        return removed
+
+    def getStats(self):
+        entries = self._entries()
+        with self.stats_lock:
+            return {'hits': self.hits, 'misses': self.misses, 'indexes': len(entries),
+                    'size': sum(size for _, size, _ in entries)}
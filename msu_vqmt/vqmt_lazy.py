@@ -0,0 +1,21 @@
+# This is a part of MSU VQMT Python Interface
+# https://github.com/msu-video-group/vqmt_python
+#
+# This code can be used only with installed
+# MSU VQMT Pro, Premium, Trial, DEMO v14.1+
+#
+# Copyright MSU Video Group, compression.ru TEAM
+
+import importlib
+
+class LazyModule:
+    # Stands for a module imported on first attribute access. The module
+    # namespace is copied into the object then, so later accesses are
+    # plain attribute lookups.
+    def __init__(self, name):
+        self.__dict__['_lazy_name'] = name
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self.__dict__['_lazy_name'])
+        self.__dict__.update(vars(module))
+        return getattr(module, attr)
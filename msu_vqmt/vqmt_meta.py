@@ -0,0 +1,120 @@
+# This is a part of MSU VQMT Python Interface
+# https://github.com/msu-video-group/vqmt_python
+#
+# This code can be used only with installed
+# MSU VQMT Pro, Premium, Trial, DEMO v14.1+
+#
+# Copyright MSU Video Group, compression.ru TEAM
+
+import json
+
+def columnName(index):
+    # spreadsheet-like column names used by VQMT: A, B, ..., Z, AA, AB, ...
+    name = ''
+    index += 1
+    while index > 0:
+        index, r = divmod(index - 1, 26)
+        name = chr(ord('A') + r) + name
+    return name
+
+def _readOnly(self, *args, **kwargs):
+    raise TypeError("VQMT metadata is read-only, make a copy with dict() to modify it")
+
+class FrozenDict(dict):
+    # Immutable dict, still serializable by json and usable where dict is expected
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _readOnly
+
+    def __reduce__(self):
+        return (self.__class__, (dict(self),))
+
+    def __hash__(self):
+        return hash(tuple(sorted(self.items(), key=lambda kv: kv[0])))
+
+def freeze(obj):
+    # recursively converts parsed JSON to FrozenDict and tuples
+    if isinstance(obj, dict):
+        return FrozenDict((k, freeze(v)) for k, v in obj.items())
+    if isinstance(obj, list):
+        return tuple(freeze(v) for v in obj)
+    return obj
+
+def parseFrozen(text):
+    return freeze(json.loads(text))
+
+class Column(FrozenDict):
+    # Information of one column of results: column['metric_name'] as before,
+    # or column.metric, column.color etc.
+    def __reduce__(self):
+        return (self.__class__, (dict(self), self.index))
+
+    def __init__(self, info, index):
+        FrozenDict.__init__(self, ((k, freeze(v)) for k, v in info.items()))
+        self.__dict__['index'] = index
+
+    def __setattr__(self, name, value):
+        _readOnly(self)
+
+    @property
+    def letter(self):
+        return self.get('col')
+
+    @property
+    def metric(self):
+        return self.get('metric_name')
+
+    @property
+    def variation(self):
+        return self.get('metric_variation')
+
+    @property
+    def device(self):
+        return self.get('device')
+
+    @property
+    def color(self):
+        return self.get('color_component')
+
+    @property
+    def label(self):
+        # e.g. 'psnr_CPU_Y', the same as column names of exported results
+        parts = [self.metric or 'col']
+        for value in (self.variation, self.device, self.color):
+            if value: parts.append(str(value))
+        return '_'.join(parts)
+
+class ColumnList(tuple):
+    # Tuple of Column with lookup of column index by letter ('A'), label
+    # ('psnr_CPU_Y') or metric name ('psnr', first column of the metric)
+    def __new__(cls, columns):
+        self = tuple.__new__(cls, (c if isinstance(c, Column) else Column(c, i) for i, c in enumerate(columns)))
+        lookup = {}
+        for col in self:
+            lookup.setdefault(col.metric, col.index)
+        for col in self:
+            lookup.setdefault(col.label, col.index)
+        for col in self:
+            if col.letter is not None: lookup[col.letter] = col.index
+        self.lookup = lookup
+        return self
+
+    def __reduce__(self):
+        return (self.__class__, (tuple(self),))
+
+    def indexOf(self, name):
+        # returns None for unknown names
+        return self.lookup.get(name)
+
+    def find(self, metric, color=None, variation=None, device=None):
+        # indices of columns matching all given fields
+        return [c.index for c in self if c.metric == metric and
+                (color is None or c.color == color) and
+                (variation is None or c.variation == variation) and
+                (device is None or c.device == device)]
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            index = self.lookup.get(key)
+            if index is None:
+                raise KeyError(key)
+            return tuple.__getitem__(self, index)
+        return tuple.__getitem__(self, key)
@@ -0,0 +1,104 @@
+# This is a part of MSU VQMT Python Interface
+# https://github.com/msu-video-group/vqmt_python
+#
+# This code can be used only with installed
+# MSU VQMT Pro, Premium, Trial, DEMO v14.1+
+#
+# Copyright MSU Video Group, compression.ru TEAM
+
+import time
+
+_clock = time.perf_counter
+
+class StatsHook:
+    # Base class for exporters (Prometheus, OpenTelemetry, logs...).
+    # Methods are called from VQMT threads and should return quickly.
+    def onEvent(self, invoke, event, timestamp):
+        pass
+
+    def onProgress(self, invoke, frames, fps):
+        pass
+
+    def onComplete(self, invoke, stats):
+        pass
+
+class InvokeProfile:
+    # Counts and times callbacks of one invoke. It's created only if
+    # profiling is requested, so disabled profiling costs nothing per value.
+    def __init__(self, hooks=None, sample_interval=1.0):
+        self.hooks = list(hooks) if hooks is not None else []
+        self.sample_interval = sample_interval
+
+        self.value_calls = 0
+        self.value_time = 0.0
+        self.input_calls = 0
+        self.input_time = 0.0
+        self.input_errors = 0
+
+        self.frames = 0
+        self.last_frame = None
+        self.first_value_time = None
+        self.next_sample = None
+        self.history = []  # (timestamp, frames)
+
+    def _sample(self, invoke, now):
+        self.next_sample = now + self.sample_interval
+        fps = 0.0
+        if self.history:
+            t, frames = self.history[-1]
+            if now > t: fps = (self.frames - frames) / (now - t)
+        self.history.append((now, self.frames))
+        for hook in self.hooks:
+            hook.onProgress(invoke, self.frames, fps)
+
+    def wrapValueCallback(self, invoke, cb):
+        # cb has ctypes signature (invoke_id, frame, col, value, user) or is None
+        def wrapped(invoke_id, frame, col, value, user):
+            start = _clock()
+            if cb is not None: cb(invoke_id, frame, col, value, user)
+            end = _clock()
+            self.value_calls += 1
+            self.value_time += end - start
+
+            if self.last_frame is None or frame > self.last_frame:
+                if self.first_value_time is None:
+                    self.first_value_time = start
+                    self.next_sample = start
+                self.last_frame = frame
+                self.frames += 1
+                if end >= self.next_sample: self._sample(invoke, end)
+
+        return wrapped
+
+    def wrapInputCallback(self, cb):
+        def wrapped(invoke_id, file, frame, data, mask, user):
+            start = _clock()
+            res = cb(invoke_id, file, frame, data, mask, user)
+            self.input_time += _clock() - start
+            self.input_calls += 1
+            if res not in (0, 1): self.input_errors += 1
+            return res
+
+        return wrapped
+
+    def onEvent(self, invoke, event, timestamp):
+        for hook in self.hooks:
+            hook.onEvent(invoke, event, timestamp)
+
+    def onComplete(self, invoke):
+        if self.first_value_time is not None:
+            self._sample(invoke, _clock())
+        if self.hooks:
+            stats = invoke.getStats()
+            for hook in self.hooks:
+                hook.onComplete(invoke, stats)
+
+    def getStats(self):
+        measure_time = self.history[-1][0] - self.first_value_time if len(self.history) > 1 else 0.0
+        return {
+            'value_callbacks': {'count': self.value_calls, 'seconds': self.value_time},
+            'input_callbacks': {'count': self.input_calls, 'seconds': self.input_time, 'errors': self.input_errors},
+            'frames': self.frames,
+            'fps_history': [(t - self.first_value_time, frames) for t, frames in self.history],
+            'callbacks_fps': self.frames / measure_time if measure_time > 0 else None,
+        }
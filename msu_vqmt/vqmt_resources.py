@@ -0,0 +1,325 @@
+# This is a part of MSU VQMT Python Interface
+# https://github.com/msu-video-group/vqmt_python
+#
+# This code can be used only with installed
+# MSU VQMT Pro, Premium, Trial, DEMO v14.1+
+#
+# Copyright MSU Video Group, compression.ru TEAM
+
+import copy
+import os
+import threading
+
+from .vqmt_shared_lib import Invoke, _configToDict
+
+# rough cost of metrics: (CPU cores, working frame buffers). Metrics not
+# listed here cost _DEFAULT_COST, costs can be overridden by metric_costs.
+_METRIC_COSTS = {
+    'psnr': (0.5, 1),
+    'mse': (0.5, 1),
+    'delta': (0.5, 1),
+    'msad': (0.5, 1),
+    'ssim': (1, 3),
+    'msssim': (2, 6),
+    '3ssim': (1, 4),
+    'vqm': (1, 4),
+    'niqe': (2, 4),
+    'vmaf': (4, 12),
+}
+_DEFAULT_COST = (1, 2)
+
+# frames decoded ahead for every file, bytes of frame are for 4:2:0 float planes
+_FILE_BUFFERS = 8
+_BYTES_PER_PIXEL = 1.5 * 4
+_BASE_MEMORY = 64 << 20
+
+def _availableMemory():
+    # free RAM in bytes or None if it can't be found
+    try:
+        import psutil
+        return psutil.virtual_memory().available
+    except ImportError:
+        pass
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_AVPHYS_PAGES')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+def _metricName(entry):
+    metric = entry.get('metric') if isinstance(entry, dict) else entry
+    return metric.get('name') if isinstance(metric, dict) else metric
+
+def _fileResolution(entry):
+    # resolution from props of raw and numpy sources, None if not specified
+    if isinstance(entry, (list, tuple)) and len(entry) > 1 and isinstance(entry[1], dict):
+        props = entry[1].get('props') or {}
+        if 'w' in props and 'h' in props:
+            return int(props['w']), int(props['h'])
+    return None
+
+class JobEstimate:
+    # Resources taken by a job: cores and memory in bytes on CPU and
+    # number of jobs on every GPU device
+    def __init__(self, cores, memory, devices=()):
+        self.cores = cores
+        self.memory = memory
+        self.devices = tuple(devices)
+
+    def __repr__(self):
+        return 'JobEstimate(cores=%g, memory=%dMB, devices=%s)' % (self.cores, self.memory >> 20, list(self.devices))
+
+def estimateJob(config, resolution=(1920, 1080), metric_costs=None, frame_buffers=_FILE_BUFFERS):
+    # Estimates resources of a configuration. Resolution of files is taken
+    # from their props when specified, otherwise `resolution` is used.
+    # Metrics placed on a non-CPU device don't take cores and RAM buffers.
+    conf = _configToDict(config)
+    costs = dict(_METRIC_COSTS, **(metric_costs or {}))
+    files = conf.get('files', [])
+    sizes = [(_fileResolution(f) or resolution) for f in files] or [resolution]
+    frame_bytes = max(w * h for w, h in sizes) * _BYTES_PER_PIXEL
+
+    cores = 0.0
+    buffers = 0
+    devices = []
+    for entry in conf.get('metrics', []):
+        metric = entry.get('metric') if isinstance(entry, dict) else entry
+        device = metric.get('device') if isinstance(metric, dict) else None
+        if device is not None and device != 'CPU':
+            devices.append(device)
+            continue
+        metric_cores, metric_buffers = costs.get(_metricName(entry), _DEFAULT_COST)
+        cores += metric_cores
+        buffers += metric_buffers
+
+    memory = _BASE_MEMORY + (len(files) * frame_buffers + buffers) * frame_bytes
+    return JobEstimate(max(1.0, cores), int(memory), sorted(set(devices)))
+
+def gpuDevices(vqmt):
+    # ids of available non-CPU devices
+    return [d['id'] for d in vqmt.getDevices() if d.get('is_available') and d.get('type') != 'CPU']
+
+def gpuImplementations(vqmt):
+    # {metric name: [device ids]} of metrics listed by getMetrics() with
+    # implementation on available non-CPU devices, e.g. {'vmaf': ['GPU0']}
+    available = set(gpuDevices(vqmt))
+    res = {}
+    for m in vqmt.getMetrics():
+        info = m.get('info', {})
+        if info.get('device') in available and not info.get('variation'):
+            res.setdefault(info['name'], []).append(info['device'])
+    return res
+
+def placeMetrics(config, placement):
+    # Returns config dict with metrics moved to devices, placement is
+    # {metric name: device id}. Metrics with explicit variation or device
+    # are not changed.
+    conf = copy.deepcopy(_configToDict(config))
+    for entry in conf.get('metrics', []):
+        if not isinstance(entry, dict) or not isinstance(entry.get('metric'), str):
+            continue
+        device = placement.get(entry['metric'])
+        if device is not None:
+            entry['metric'] = {'name': entry['metric'], 'device': device}
+    return conf
+
+def _cancel(invoke):
+    # cancel is only possible after preparing, the invoke may also fail before
+    while not invoke.waitPrepareComplete(0.05):
+        if invoke.evtTotalComplete.is_set():
+            return
+    if not invoke.evtMeasureComplete.is_set():
+        invoke.cancel()
+
+class ScheduledJob:
+    # Job of ResourceScheduler, `config` is the config actually measured
+    # (with placement of metrics), `invoke` is None if it wasn't created
+    def __init__(self, index, config):
+        self.index = index
+        self.original_config = config
+        self.config = None
+        self.estimate = None
+        self.invoke = None
+        self.exit_status = None
+        self.error = None
+        self.skipped = 0
+        self.cancelled = False
+
+    def isOk(self):
+        return self.exit_status in (Invoke.EXIT_STATUS_ALL_OK, Invoke.EXIT_STATUS_ERRORS)
+
+    def __repr__(self):
+        return 'ScheduledJob(index=%d, exit_status=%s, %s)' % (self.index, self.exit_status, self.estimate)
+
+class ResourceScheduler:
+    # Runs configs on one VQMT interface, admitting jobs while their
+    # estimated cores and memory fit into budgets. Budgets default to all
+    # cores and 80% of free RAM. Metrics having implementation on a GPU
+    # (or metrics in gpu_metrics, on any available GPU) are moved there
+    # while the device runs less than gpu_jobs jobs, otherwise they stay
+    # on CPU. Jobs are admitted
+    # first-fit, a job skipped `patience` times blocks smaller ones until
+    # it fits. A job larger than budgets runs alone.
+    def __init__(self, vqmt, cpu_budget=None, memory_budget=None, gpu_jobs=1, gpu_metrics=None,
+                 resolution=(1920, 1080), metric_costs=None, patience=None):
+        self.vqmt = vqmt
+        self.cpu_budget = cpu_budget if cpu_budget is not None else os.cpu_count() or 1
+        if memory_budget is None:
+            available = _availableMemory()
+            memory_budget = int(available * 0.8) if available is not None else None
+        self.memory_budget = memory_budget
+        self.gpu_jobs = gpu_jobs
+        self.resolution = resolution
+        self.metric_costs = metric_costs
+        self.patience = patience if patience is not None else max(2, int(self.cpu_budget))
+
+        if self.cpu_budget <= 0:
+            raise ValueError("cpu_budget should be positive")
+        if self.gpu_jobs < 0:
+            raise ValueError("gpu_jobs can't be negative")
+
+        if gpu_jobs == 0:
+            self.gpu = {}
+        elif gpu_metrics is not None:
+            devices = gpuDevices(vqmt)
+            self.gpu = dict((name, devices) for name in gpu_metrics) if devices else {}
+        else:
+            self.gpu = gpuImplementations(vqmt)
+
+        self.cond = threading.Condition()
+        self.used_cores = 0.0
+        self.used_memory = 0
+        self.device_jobs = {}
+        self.running = []
+
+    def getUsage(self):
+        with self.cond:
+            return {'cores': self.used_cores, 'memory': self.used_memory, 'devices': dict(self.device_jobs),
+                    'running': len(self.running)}
+
+    def _estimate(self, config, resolution):
+        return estimateJob(config, resolution or self.resolution, self.metric_costs)
+
+    def _place(self, job, resolution):
+        # metrics go to devices still running less than gpu_jobs jobs, all
+        # metrics of the job on one device count as one job there
+        conf = _configToDict(job.original_config)
+        placement = {}
+        for entry in conf.get('metrics', []):
+            name = _metricName(entry)
+            if name in placement or not isinstance(entry, dict) or not isinstance(entry.get('metric'), str):
+                continue
+            for device in self.gpu.get(name, []):
+                if device in placement.values() or self.device_jobs.get(device, 0) < self.gpu_jobs:
+                    placement[name] = device
+                    break
+        placed = placeMetrics(conf, placement) if placement else conf
+        return placed, self._estimate(placed, resolution)
+
+    def _fits(self, estimate):
+        if not self.running:
+            return True
+        if self.used_cores + estimate.cores > self.cpu_budget:
+            return False
+        if self.memory_budget is not None and self.used_memory + estimate.memory > self.memory_budget:
+            return False
+        return all(self.device_jobs.get(d, 0) < self.gpu_jobs for d in estimate.devices)
+
+    def _admit(self, pending, resolutions):
+        # returns job to start or None
+        for pos, job in enumerate(pending):
+            config, estimate = self._place(job, resolutions[job.index])
+            if self._fits(estimate):
+                del pending[pos]
+                job.config, job.estimate = config, estimate
+                self.used_cores += estimate.cores
+                self.used_memory += estimate.memory
+                for d in estimate.devices:
+                    self.device_jobs[d] = self.device_jobs.get(d, 0) + 1
+                self.running.append(job)
+                for other in pending[:pos]:
+                    other.skipped += 1
+                return job
+            if job.skipped >= self.patience:
+                # the oldest big job waits for resources, the others wait for it
+                return None
+        return None
+
+    def _release(self, job):
+        with self.cond:
+            self.running.remove(job)
+            self.used_cores -= job.estimate.cores
+            self.used_memory -= job.estimate.memory
+            for d in job.estimate.devices:
+                self.device_jobs[d] -= 1
+            self.cond.notify_all()
+
+    def _runJob(self, job, done):
+        try:
+            invoke = self.vqmt.invoke(job.config)
+            with self.cond:
+                # run closed before the invoke was created, it isn't started
+                job.invoke = invoke
+                cancelled = job.cancelled
+            if not job.invoke:
+                job.exit_status = Invoke.EXIT_STATUS_FAILED
+                job.error = job.invoke.getInitError()
+            elif cancelled:
+                job.exit_status = Invoke.EXIT_STATUS_INTERRUPTED
+            else:
+                job.exit_status = job.invoke.start()
+                if job.exit_status == Invoke.EXIT_STATUS_FAILED:
+                    job.error = self.vqmt.getError()
+        except Exception as e:
+            job.exit_status = Invoke.EXIT_STATUS_FAILED
+            job.error = str(e)
+        finally:
+            self._release(job)
+            with self.cond:
+                done.append(job)
+                self.cond.notify_all()
+
+    def run(self, configs, resolutions=None):
+        # yields ScheduledJob objects in order of completion, resolutions
+        # are (width, height) of files of each config or None
+        jobs = [ScheduledJob(i, conf) for i, conf in enumerate(configs)]
+        resolutions = list(resolutions) if resolutions is not None else [None] * len(jobs)
+        if len(resolutions) != len(jobs):
+            raise ValueError("Number of resolutions doesn't match number of configs")
+
+        pending = list(jobs)
+        done = []
+        threads = []
+        finished = 0
+        try:
+            while finished < len(jobs):
+                with self.cond:
+                    while True:
+                        job = self._admit(pending, resolutions) if pending else None
+                        if job is not None:
+                            t = threading.Thread(target=self._runJob, args=(job, done))
+                            t.daemon = True
+                            t.start()
+                            threads.append(t)
+                            continue
+                        if done: break
+                        self.cond.wait()
+                    completed, done[:] = list(done), []
+                for job in completed:
+                    finished += 1
+                    yield job
+        finally:
+            # generator was closed early, stop running jobs
+            pending[:] = []
+            with self.cond:
+                # jobs creating their invokes now won't start them
+                for job in self.running: job.cancelled = True
+                started = [job.invoke for job in self.running if job.invoke]
+            for invoke in started:
+                _cancel(invoke)
+            for t in threads:
+                t.join()
+
+    def runAll(self, configs, resolutions=None):
+        results = list(self.run(configs, resolutions))
+        results.sort(key=lambda r: r.index)
+        return results
@@ -0,0 +1,297 @@
+# This is a part of MSU VQMT Python Interface
+# https://github.com/msu-video-group/vqmt_python
+#
+# This code can be used only with installed
+# MSU VQMT Pro, Premium, Trial, DEMO v14.1+
+#
+# Copyright MSU Video Group, compression.ru TEAM
+
+import math
+import os
+import warnings
+import numpy as np
+
+from .vqmt_meta import ColumnList, columnName
+from .vqmt_cache import CachedInvoke
+from .vqmt_segments import rangeConfig, computeAccumulators, _runThreads, _runProcesses, _mergeStatus, _absoluteFrames
+
+_MODES = ('uniform', 'random', 'stratified')
+
+def _zValue(confidence):
+    # two-sided normal quantile, found by bisection of erf
+    if not 0 < confidence < 1:
+        raise ValueError("confidence should be between 0 and 1")
+    lo, hi = 0.0, 10.0
+    for _ in range(60):
+        mid = (lo + hi) / 2
+        if math.erf(mid / math.sqrt(2)) < confidence: lo = mid
+        else: hi = mid
+    return (lo + hi) / 2
+
+def _tValue(confidence, df):
+    # two-sided Student quantile. With x = sqrt(df) * tan(a), probability
+    # of |T| < x is the integral of cos(a)^(df - 1) from 0 to a, normalized.
+    if df > 1000:
+        return _zValue(confidence)
+    def integral(a):
+        # Simpson's rule, the integrand is smooth on [0, pi / 2]
+        x = np.linspace(0.0, a, 257)
+        y = np.cos(x) ** (df - 1)
+        return (y[0] + y[-1] + 4 * y[1:-1:2].sum() + 2 * y[2:-1:2].sum()) * (a / 256) / 3
+    total = integral(math.pi / 2)
+    lo, hi = 0.0, math.pi / 2
+    for _ in range(50):
+        mid = (lo + hi) / 2
+        if integral(mid) / total < confidence: lo = mid
+        else: hi = mid
+    return math.sqrt(df) * math.tan((lo + hi) / 2)
+
+def _slotCount(total_frames, segment_length):
+    return (total_frames + segment_length - 1) // segment_length
+
+def _strataBounds(slots, strata):
+    strata = max(1, min(strata, slots))
+    return [slots * k // strata for k in range(strata + 1)]
+
+def sampleRanges(total_frames, fraction=0.1, segment_length=30, mode='stratified', seed=None):
+    # Returns sorted [(first, end)] frame ranges of segment_length frames
+    # covering about `fraction` of the video. 'uniform' takes every k-th
+    # segment, 'random' takes random segments, 'stratified' takes one random
+    # segment from each of equal parts of the video.
+    if mode not in _MODES:
+        raise ValueError("mode should be one of %s" % ', '.join(_MODES))
+    if segment_length < 1 or total_frames < 1:
+        raise ValueError("segment_length and total_frames should be positive")
+
+    slots = _slotCount(total_frames, segment_length)
+    n = max(1, min(slots, int(round(slots * fraction))))
+    rng = np.random.RandomState(seed)
+    if mode == 'uniform':
+        chosen = (np.arange(n) * slots) // n
+    elif mode == 'random':
+        chosen = np.sort(rng.choice(slots, n, replace=False))
+    else:
+        bounds = _strataBounds(slots, n)
+        chosen = np.array([rng.randint(a, b) for a, b in zip(bounds[:-1], bounds[1:])])
+    return [(int(s) * segment_length, min((int(s) + 1) * segment_length, total_frames)) for s in chosen]
+
+def _collapseStrata(counts):
+    # groups of neighbouring strata with at least 2 measured units each,
+    # [[strata]]. One group if there are less than 4 units.
+    groups = [[]]
+    units = 0
+    for h, count in enumerate(counts):
+        if units >= 2:
+            groups.append([])
+            units = 0
+        groups[-1].append(h)
+        units += count
+    if units < 2 and len(groups) > 1:
+        last = groups.pop()
+        groups[-1] += last
+    return groups
+
+# pooled variance counts as this many degrees of freedom of a stratum
+_POOLED_DF = 2
+
+def _estimateMean(unit_means, slot_strata, strata_sizes, confidence):
+    # Stratified estimate of mean from per-segment means of one column,
+    # returns (mean, half width of confidence interval). Strata with less
+    # than 2 units are collapsed with neighbours (collapsed strata estimator).
+    # Variances of strata are shrunk to the pooled within-stratum variance:
+    # adaptive sampling adds few segments to strata looking flat by chance,
+    # their own variances would make the interval too narrow. The interval
+    # uses Student quantile for Satterthwaite degrees of freedom.
+    valid = ~np.isnan(unit_means)
+    if not valid.any():
+        return float('nan'), float('nan')
+    means = unit_means[valid]
+    strata = slot_strata[valid]
+    total = float(sum(strata_sizes))
+
+    counts = [int((strata == h).sum()) for h in range(len(strata_sizes))]
+    mean = 0.0
+    groups = []  # (weight, sampling fraction, units, sum of squares)
+    for group in _collapseStrata(counts):
+        m = means[np.isin(strata, group)]
+        size = sum(strata_sizes[h] for h in group)
+        # strata without units are represented by the mean of their group
+        for h in group:
+            mean += strata_sizes[h] / total * (means[strata == h].mean() if counts[h] else m.mean())
+        if len(m) > 1:
+            groups.append((size / total, len(m) / float(size), len(m), float(((m - m.mean()) ** 2).sum())))
+    if not groups:
+        return float(mean), float('nan')
+
+    pooled = sum(ss for _, _, _, ss in groups) / sum(n - 1 for _, _, n, _ in groups)
+    var = 0.0
+    squares = 0.0
+    for w, f, n, ss in groups:
+        v = w * w * (1 - f) / n * (ss + _POOLED_DF * pooled) / (n - 1 + _POOLED_DF)
+        var += v
+        squares += v * v / (n - 1)
+    df = var * var / squares if squares > 0 else sum(n - 1 for _, _, n, _ in groups)
+    return float(mean), float(_tValue(confidence, max(df, 1.0)) * math.sqrt(max(var, 0.0)))
+
+def _neymanDeviations(unit_means, slot_strata, strata):
+    # Std devs of strata for Neyman allocation (stratum gets segments
+    # proportionally to size * std dev), relative to the mean, the largest
+    # over columns. Variances of strata are shrunk to the pooled
+    # within-stratum variance, which is also used for strata with less than
+    # 2 units, so strata measured by few flat-looking segments aren't starved.
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        scale = np.maximum(np.abs(np.nanmean(unit_means, axis=0)), 1e-12)
+    squares = np.zeros([strata, unit_means.shape[1]])
+    dfs = np.zeros(strata)
+    for h in range(strata):
+        m = unit_means[slot_strata == h] / scale
+        n = int((~np.isnan(m)).sum(axis=0).min()) if len(m) else 0
+        if n < 2: continue
+        squares[h] = np.nansum((m - np.nanmean(m, axis=0)) ** 2, axis=0)
+        dfs[h] = n - 1
+    if dfs.sum() == 0:
+        return np.ones(strata)
+    pooled = squares.sum(axis=0) / dfs.sum()
+    variances = (squares + _POOLED_DF * pooled) / (dfs[:, None] + _POOLED_DF)
+    return np.sqrt(variances.max(axis=1))
+
+class SampledInvoke(CachedInvoke):
+    # Result of measureSampled. Values and frames contain only measured
+    # frames, 'mean' accumulator is the estimate for the whole video with
+    # 'mean ci low' and 'mean ci high' bounds. Other accumulators are
+    # computed from sampled frames only.
+    def __init__(self, data, ranges, total_frames, confidence):
+        CachedInvoke.__init__(self, data)
+        self.ranges = ranges
+        self.total_frames = total_frames
+        self.confidence = confidence
+        self.sampled_frames = 0 if data['frames'] is None else len(data['frames'])
+
+    def getSampledFraction(self):
+        return float(self.sampled_frames) / self.total_frames
+
+def _measureRanges(config, ranges, vqmt, runner, workers):
+    confs = [rangeConfig(config, a, b) for a, b in ranges]
+    if runner is not None:
+        return _runProcesses(runner, confs)
+    # there may be hundreds of segments, they don't all run at once
+    return _runThreads(vqmt, confs, workers or min(len(confs), os.cpu_count() or 1))
+
+def measureSampled(config, total_frames, fraction=0.1, segment_length=30, mode='stratified',
+                   vqmt=None, runner=None, workers=None, confidence=0.95, seed=None,
+                   target_error=None, target_columns=None, strata=8, max_fraction=0.5, step=None,
+                   percentiles=()):
+    # Measures only sampled segments of the video and estimates accumulators.
+    # With target_error, segments are added to strata with the highest
+    # variance (Neyman allocation) until half width of confidence interval
+    # of mean of target_columns (all by default) is below target_error or
+    # max_fraction of the video is measured. Metrics depending on previous
+    # frames may differ on segment borders.
+    if (vqmt is None) == (runner is None):
+        raise ValueError("Specify either vqmt or runner")
+    if segment_length < 1 or total_frames < 1:
+        raise ValueError("segment_length and total_frames should be positive")
+
+    if not 0 < confidence < 1:
+        raise ValueError("confidence should be between 0 and 1")
+    rng = np.random.RandomState(seed)
+    slots = _slotCount(total_frames, segment_length)
+
+    if target_error is None:
+        ranges = sampleRanges(total_frames, fraction, segment_length, mode, seed)
+        chosen = [a // segment_length for a, _ in ranges]
+        bounds = _strataBounds(slots, len(chosen)) if mode == 'stratified' else [0, slots]
+    else:
+        # adaptive sampling starts from 2 segments per stratum
+        bounds = _strataBounds(slots, strata)
+        chosen = []
+        for a, b in zip(bounds[:-1], bounds[1:]):
+            chosen += rng.choice(np.arange(a, b), min(2, b - a), replace=False).tolist()
+    strata_sizes = [b - a for a, b in zip(bounds[:-1], bounds[1:])]
+
+    def stratumOf(slot):
+        return int(np.searchsorted(bounds, slot, side='right')) - 1
+
+    def slotRange(slot):
+        return slot * segment_length, min((slot + 1) * segment_length, total_frames)
+
+    measured = {}  # slot -> result of the range
+    pending = sorted(chosen)
+    estimates = None
+    while True:
+        results = _measureRanges(config, [slotRange(s) for s in pending], vqmt, runner, workers)
+        for slot, r in zip(pending, results):
+            measured[slot] = r
+        failed = [r for r in results if r.get('values') is None]
+        if failed:
+            break
+
+        order = sorted(measured)
+        units = [measured[s] for s in order]
+        columns = units[0]['columns']
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            unit_means = np.array([np.nanmean(np.asarray(u['values'], dtype=np.float64), axis=0)
+                                   if len(u['values']) else np.full(len(columns), np.nan) for u in units])
+        slot_strata = np.array([stratumOf(s) for s in order])
+        estimates = [_estimateMean(unit_means[:, j], slot_strata, strata_sizes, confidence) for j in range(len(columns))]
+
+        if target_error is None:
+            break
+        if target_columns is None:
+            targets = list(range(len(columns)))
+        else:
+            cols = ColumnList(columns)
+            targets = [cols.indexOf(name) if not isinstance(name, int) else name for name in target_columns]
+            if None in targets:
+                raise ValueError("Unknown target column in %s" % (target_columns,))
+        worst = max(estimates[j][1] for j in targets)
+        if not math.isnan(worst) and worst <= target_error:
+            break
+        if len(measured) >= max(1, int(max_fraction * slots)) or len(measured) >= slots:
+            break
+
+        deviations = _neymanDeviations(unit_means[:, targets], slot_strata, len(strata_sizes))
+        free = np.asarray([size - int((slot_strata == h).sum()) for h, size in enumerate(strata_sizes)], dtype=np.float64)
+        weights = np.where(free > 0, np.asarray(strata_sizes) * deviations, 0.0)
+        if weights.sum() <= 0:
+            weights = free
+
+        budget = min(step or len(strata_sizes) * 2, int(max_fraction * slots) - len(measured), slots - len(measured))
+        alloc = np.floor(weights / weights.sum() * budget).astype(int)
+        alloc[np.argmax(weights)] += max(0, budget - alloc.sum())
+        pending = []
+        for h, count in enumerate(alloc):
+            if count <= 0: continue
+            free = [s for s in range(bounds[h], bounds[h + 1]) if s not in measured]
+            pending += rng.choice(free, min(count, len(free)), replace=False).tolist()
+        pending = sorted(pending)
+        if not pending:
+            break
+
+    order = sorted(measured)
+    results = [measured[s] for s in order]
+    ranges = [slotRange(s) for s in order]
+    status = _mergeStatus([r['exit_status'] for r in results])
+    data = {'values': None, 'frames': None, 'columns': None, 'files': None, 'accumulators': None, 'exit_status': status}
+
+    if estimates is not None and all(r.get('values') is not None for r in results):
+        data['frames'] = np.concatenate(_absoluteFrames([a for a, _ in ranges], results))
+        data['values'] = np.concatenate([r['values'] for r in results], axis=0)
+        data['columns'] = results[0]['columns']
+        data['files'] = results[0]['files']
+        acc = computeAccumulators(data['values'], data['frames'], percentiles)
+        for j, (mean, half) in enumerate(estimates):
+            if math.isnan(mean): continue
+            letter = columnName(j)
+            acc.setdefault('mean', {})[letter] = mean
+            if not math.isnan(half):
+                acc.setdefault('mean ci low', {})[letter] = mean - half
+                acc.setdefault('mean ci high', {})[letter] = mean + half
+        data['accumulators'] = acc
+
+    result = SampledInvoke(data, ranges, total_frames, confidence)
+    result.err = next((r.get('error') for r in results if r.get('error')), None)
+    result.evtTotalComplete.set()
+    return result
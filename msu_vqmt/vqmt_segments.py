@@ -0,0 +1,137 @@
+# This is a part of MSU VQMT Python Interface
+# https://github.com/msu-video-group/vqmt_python
+#
+# This code can be used only with installed
+# MSU VQMT Pro, Premium, Trial, DEMO v14.1+
+#
+# Copyright MSU Video Group, compression.ru TEAM
+
+import copy
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from .vqmt_shared_lib import Invoke, _configToDict
+from .vqmt_cache import CachedInvoke, columnName
+
+def computeAccumulators(values, frames, percentiles=()):
+    # VQMT-like accumulators computed from per-frame values, NaN are ignored.
+    # Keys of result are accumulator names, values are {column letter: value}
+    values = np.asarray(values, dtype=np.float64)
+    frames = np.asarray(frames)
+    res = {}
+    if values.ndim != 2 or values.shape[0] == 0:
+        return res
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        valid = ~np.isnan(values)
+        count = valid.sum(axis=0)
+        mean = np.nanmean(values, axis=0)
+        harmonic = count / np.nansum(1.0 / values, axis=0)
+        variance = np.nanvar(values, axis=0)
+        filled_min = np.where(valid, values, np.inf)
+        filled_max = np.where(valid, values, -np.inf)
+        min_rows = np.argmin(filled_min, axis=0)
+        max_rows = np.argmax(filled_max, axis=0)
+        pct = dict((p, np.nanpercentile(values, p, axis=0)) for p in percentiles)
+
+    for j in range(values.shape[1]):
+        if count[j] == 0: continue
+        letter = columnName(j)
+        res.setdefault('mean', {})[letter] = float(mean[j])
+        res.setdefault('harmonic mean', {})[letter] = float(harmonic[j])
+        res.setdefault('min. val', {})[letter] = float(values[min_rows[j], j])
+        res.setdefault('max. val', {})[letter] = float(values[max_rows[j], j])
+        res.setdefault('min. frame', {})[letter] = int(frames[min_rows[j]])
+        res.setdefault('max. frame', {})[letter] = int(frames[max_rows[j]])
+        res.setdefault('std dev', {})[letter] = float(np.sqrt(variance[j]))
+        res.setdefault('variance', {})[letter] = float(variance[j])
+        for p in percentiles:
+            res.setdefault('percentile %g' % p, {})[letter] = float(pct[p][j])
+
+    return res
+
+def _fileRange(opts):
+    rng = opts.get('range', [0])
+    return rng[0], rng[1] if len(rng) > 1 else None
+
+def rangeConfig(config, a, b):
+    # configuration measuring frames [a, b) of the original ranges, raises
+    # ValueError if the range is past the end of a file
+    conf = copy.deepcopy(_configToDict(config))
+    files = []
+    for f in conf.get('files', []):
+        path, opts = (f[0], dict(f[1]) if len(f) > 1 else {}) if isinstance(f, (list, tuple)) else (f, {})
+        start, end = _fileRange(opts)
+        seg_end = start + b if end is None else min(end, start + b)
+        if start + a >= seg_end:
+            raise ValueError("Frames [%d, %d) are out of range of file '%s'" % (a, b, path))
+        opts['range'] = [start + a, seg_end]
+        files.append([path, opts])
+    conf['files'] = files
+    return conf
+
+def splitConfig(config, total_frames, segments):
+    # returns [(first frame, config)] measuring consecutive frame ranges
+    conf = _configToDict(config)
+    segments = max(1, min(segments, total_frames))
+    bounds = [total_frames * k // segments for k in range(segments + 1)]
+    return [(a, rangeConfig(conf, a, b)) for a, b in zip(bounds[:-1], bounds[1:])]
+
+def _mergeStatus(statuses):
+    for status in (Invoke.EXIT_STATUS_FAILED, Invoke.EXIT_STATUS_INTERRUPTED, Invoke.EXIT_STATUS_ERRORS):
+        if status in statuses:
+            return status
+    return Invoke.EXIT_STATUS_ALL_OK
+
+def _runThreads(vqmt, confs, workers):
+    def run(conf):
+        invoke = vqmt.invoke(conf)
+        if not invoke:
+            return {'exit_status': Invoke.EXIT_STATUS_FAILED, 'error': invoke.getInitError()}
+        status = invoke.start()
+        if not invoke.evtMeasureComplete.is_set() or status == Invoke.EXIT_STATUS_FAILED:
+            return {'exit_status': status, 'error': vqmt.getError()}
+        return {'exit_status': status, 'values': invoke.getValuesAsArray(), 'frames': invoke.getFrameNumbersAsArray(),
+                'columns': invoke.getColumns(), 'files': invoke.getFiles()}
+
+    with ThreadPoolExecutor(max_workers=workers or len(confs)) as pool:
+        return list(pool.map(run, confs))
+
+def _runProcesses(runner, confs):
+    return [{'exit_status': r.exit_status, 'error': r.error, 'values': r.values, 'frames': r.frames,
+             'columns': r.columns, 'files': r.files} for r in runner.runAll(confs)]
+
+def _absoluteFrames(firsts, results):
+    frames = []
+    for first, r in zip(firsts, results):
+        # VQMT numbers frames of a range from 0
+        frames.append(np.asarray(r['frames'], dtype=np.intc) + first)
+    return frames
+
+def measureSegmented(config, total_frames, segments=4, vqmt=None, runner=None, workers=None, percentiles=()):
+    # Measures frame ranges of one configuration concurrently and stitches
+    # them. Uses threads on `vqmt` or processes of BatchRunner `runner`.
+    # Metrics depending on previous frames may differ on segment borders.
+    if (vqmt is None) == (runner is None):
+        raise ValueError("Specify either vqmt or runner")
+
+    parts = splitConfig(config, total_frames, segments)
+    confs = [conf for _, conf in parts]
+    results = _runProcesses(runner, confs) if runner is not None else _runThreads(vqmt, confs, workers)
+
+    status = _mergeStatus([r['exit_status'] for r in results])
+    data = {'values': None, 'frames': None, 'columns': None, 'files': None, 'accumulators': None, 'exit_status': status}
+
+    if all(r.get('values') is not None for r in results):
+        data['frames'] = np.concatenate(_absoluteFrames([first for first, _ in parts], results))
+        data['values'] = np.concatenate([r['values'] for r in results], axis=0)
+        data['columns'] = results[0]['columns']
+        data['files'] = results[0]['files']
+        data['accumulators'] = computeAccumulators(data['values'], data['frames'], percentiles)
+
+    result = CachedInvoke(data)
+    result.err = next((r.get('error') for r in results if r.get('error')), None)
+    result.evtTotalComplete.set()
+    return result
@@ -0,0 +1,557 @@
+# This is a part of MSU VQMT Python Interface
+# https://github.com/msu-video-group/vqmt_python
+#
+# This code can be used only with installed
+# MSU VQMT Pro, Premium, Trial, DEMO v14.1+
+#
+# Copyright MSU Video Group, compression.ru TEAM
+#
+# Measurement server keeping VQMT loaded, and a client mirroring
+# SharedInterface/Invoke API. Start the server with
+#   python -m msu_vqmt --socket /tmp/vqmt.sock --workers 4
+
+import argparse
+import heapq
+import itertools
+import json
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import numpy as np
+
+from .vqmt_shared_lib import Invoke, _configToDict
+from .vqmt_batch import _loadInterface
+from .vqmt_meta import ColumnList, freeze
+from .vqmt_template import CompiledConfig
+
+_HEADER = struct.Struct('!I')
+
+# Messages are 4-byte length of JSON header, the header, and raw bytes of
+# arrays listed in header['arrays'] as [name, dtype, shape]
+def _sendMessage(sock, header, arrays=None):
+    arrays = arrays or {}
+    header = dict(header)
+    header['arrays'] = [[name, arr.dtype.str, list(arr.shape)] for name, arr in arrays.items()]
+    data = json.dumps(header).encode('utf-8')
+    sock.sendall(_HEADER.pack(len(data)) + data)
+    for arr in arrays.values():
+        if arr.nbytes: sock.sendall(memoryview(np.ascontiguousarray(arr)).cast('B'))
+
+def _recvExact(f, size):
+    data = f.read(size)
+    if data is None or len(data) < size:
+        raise EOFError("Connection closed")
+    return data
+
+def _recvMessage(f):
+    size, = _HEADER.unpack(_recvExact(f, _HEADER.size))
+    header = json.loads(_recvExact(f, size).decode('utf-8'))
+    arrays = {}
+    for name, dtype, shape in header.pop('arrays', []):
+        dtype = np.dtype(dtype)
+        arr = np.empty(shape, dtype=dtype)
+        view = memoryview(arr).cast('B') if arr.nbytes else b''
+        pos = 0
+        while pos < len(view):
+            n = f.readinto(view[pos:])
+            if not n:
+                raise EOFError("Connection closed")
+            pos += n
+        arrays[name] = arr
+    return header, arrays
+
+def _connect(address):
+    if isinstance(address, str):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.connect(address)
+    return sock
+
+class _Job:
+    # started and cancelled are guarded by lock of the scheduler
+    def __init__(self, job_id, invoke, client, priority, events, lock):
+        self.id = job_id
+        self.invoke = invoke
+        self.client = client
+        self.priority = priority
+        self.events = events
+        self.lock = lock
+        self.started = False
+        self.cancelled = False
+        self.status = None
+
+    def cancel(self):
+        with self.lock:
+            self.cancelled = True
+            started = self.started
+        if not started:
+            return
+        invoke = self.invoke
+        # VQMT can cancel only prepared invoke
+        while not invoke.evtPrepareComplete.wait(0.05):
+            if invoke.evtTotalComplete.is_set():
+                return
+        if not invoke.evtTotalComplete.is_set():
+            invoke.cancel()
+
+class _Scheduler:
+    # Worker threads run queued jobs on the shared VQMT interface, higher
+    # priority first. Clients can't run more than `quota` jobs at once.
+    def __init__(self, workers, quota):
+        self.quota = quota
+        self.cond = threading.Condition()
+        self.pending = []  # heap of (-priority, seq, job)
+        self.running = {}  # client -> number of running jobs
+        self.seq = itertools.count()
+        self.stopped = False
+        self.threads = [threading.Thread(target=self._worker) for _ in range(workers)]
+        for t in self.threads:
+            t.daemon = True
+            t.start()
+
+    def submit(self, job):
+        with self.cond:
+            heapq.heappush(self.pending, (-job.priority, next(self.seq), job))
+            self.cond.notify_all()
+
+    def remove(self, job):
+        with self.cond:
+            for entry in self.pending:
+                if entry[2] is job:
+                    self.pending.remove(entry)
+                    heapq.heapify(self.pending)
+                    return True
+        return False
+
+    def _take(self):
+        for entry in sorted(self.pending, key=lambda e: e[:2]):
+            job = entry[2]
+            if self.quota is None or self.running.get(job.client, 0) < self.quota:
+                self.pending.remove(entry)
+                heapq.heapify(self.pending)
+                self.running[job.client] = self.running.get(job.client, 0) + 1
+                return job
+        return None
+
+    def _worker(self):
+        while True:
+            with self.cond:
+                job = None
+                while not self.stopped:
+                    job = self._take()
+                    if job is not None: break
+                    self.cond.wait()
+                if job is None:
+                    return
+                # job could be cancelled before it was taken
+                job.started = not job.cancelled
+
+            try:
+                if not job.started:
+                    job.status = Invoke.EXIT_STATUS_INTERRUPTED
+                else:
+                    job.status = job.invoke.start()
+            except Exception:
+                job.status = Invoke.EXIT_STATUS_FAILED
+            finally:
+                job.events.put(None)
+                with self.cond:
+                    self.running[job.client] -= 1
+                    self.cond.notify_all()
+
+    def getStats(self):
+        with self.cond:
+            return {'pending': len(self.pending), 'running': sum(self.running.values())}
+
+    def stop(self):
+        with self.cond:
+            self.stopped = True
+            self.cond.notify_all()
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    # restarted server can bind the port while old connections are in TIME_WAIT
+    allow_reuse_address = True
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            header, _ = _recvMessage(self.rfile)
+        except (EOFError, ValueError):
+            return
+        op = header.get('op')
+        server = self.server.owner
+        try:
+            if op == 'invoke':
+                self._invoke(server, header)
+            elif op in ('cancel', 'pause', 'resume'):
+                self._control(server, op, header)
+            elif op == 'info':
+                _sendMessage(self.connection, {'result': server._info(header.get('what'))})
+            else:
+                _sendMessage(self.connection, {'error': "Unknown operation '%s'" % op})
+        except (EOFError, OSError):
+            pass
+        except Exception as e:
+            try:
+                _sendMessage(self.connection, {'error': str(e)})
+            except OSError:
+                pass
+
+    def _control(self, server, op, header):
+        job = server.jobs.get(header.get('job'))
+        if job is None:
+            _sendMessage(self.connection, {'error': "Unknown job"})
+            return
+        if op == 'cancel':
+            removed = server.scheduler.remove(job)
+            job.cancel()
+            if removed:
+                job.status = Invoke.EXIT_STATUS_INTERRUPTED
+                job.events.put(None)
+        elif not job.invoke.evtPrepareComplete.is_set():
+            _sendMessage(self.connection, {'error': "Invoke is not prepared yet"})
+            return
+        else:
+            getattr(job.invoke, op)()
+        _sendMessage(self.connection, {'ok': True})
+
+    def _invoke(self, server, header):
+        vqmt = server.vqmt
+        job_events = queue.Queue()
+        invoke = vqmt.invoke(CompiledConfig(header['config'].encode('utf-8')), event_cb=job_events.put)
+        if not invoke:
+            _sendMessage(self.connection, {'error': invoke.getInitError() or vqmt.getError()})
+            return
+
+        client = str(header.get('client', self.client_address))
+        # VQMT events and the end marker of the job share one queue
+        job = server._addJob(invoke, client, int(header.get('priority', 0)), job_events)
+        try:
+            _sendMessage(self.connection, {'job': job.id})
+            start, _ = _recvMessage(self.rfile)
+            if start.get('op') != 'start':
+                return
+
+            server.scheduler.submit(job)
+            while True:
+                event = job.events.get()
+                if event is None: break
+                _sendMessage(self.connection, {'event': event})
+            self._sendResult(job)
+        except (EOFError, OSError):
+            # client is gone, its job isn't needed anymore
+            server.scheduler.remove(job)
+            job.cancel()
+        finally:
+            server._removeJob(job)
+
+    def _sendResult(self, job):
+        invoke = job.invoke
+        res = {'exit_status': job.status, 'error': None}
+        arrays = {}
+        if job.status == Invoke.EXIT_STATUS_FAILED:
+            res['error'] = invoke.shared_interface.getError()
+        if invoke.evtMeasureComplete.is_set():
+            res['columns'] = invoke.getColumns()
+            res['files'] = invoke.getFiles()
+            res['accumulators'] = invoke.getAccumulators()
+            values = invoke.getValuesAsArray()
+            frames = invoke.getFrameNumbersAsArray()
+            if values is not None and frames is not None:
+                arrays = {'values': values, 'frames': frames}
+        _sendMessage(self.connection, {'result': res}, arrays)
+
+class MeasureServer:
+    # Keeps VQMT loaded and runs invokes of clients on `workers` threads.
+    # address is a Unix socket path or (host, port) tuple.
+    def __init__(self, address, vqmt=None, vqmt_path=None, vqmt_dir=None, version=None, workers=2, quota=None):
+        self.vqmt = vqmt if vqmt is not None else _loadInterface(vqmt_path, vqmt_dir, version)
+        self.address = address
+        self.scheduler = _Scheduler(workers, quota)
+        self.jobs = {}
+        self.jobs_lock = threading.Lock()
+        self.job_ids = itertools.count(1)
+        self.thread = None
+
+        if isinstance(address, str):
+            if os.path.exists(address):
+                os.remove(address)
+            self.server = socketserver.ThreadingUnixStreamServer(address, _Handler)
+        else:
+            self.server = _TCPServer(address, _Handler)
+            self.address = self.server.server_address
+        self.server.daemon_threads = True
+        self.server.owner = self
+
+    def _addJob(self, invoke, client, priority, events):
+        with self.jobs_lock:
+            job = _Job(next(self.job_ids), invoke, client, priority, events, self.scheduler.cond)
+            self.jobs[job.id] = job
+        return job
+
+    def _removeJob(self, job):
+        with self.jobs_lock:
+            self.jobs.pop(job.id, None)
+
+    def _info(self, what):
+        if what == 'metrics': return self.vqmt.getMetrics()
+        if what == 'devices': return self.vqmt.getDevices()
+        if what == 'colorspaces': return self.vqmt.getColorspaces()
+        if what == 'picture_types': return self.vqmt.getPictureTypes()
+        if what == 'version': return self.vqmt.getVersion()
+        if what == 'stats': return self.scheduler.getStats()
+        raise ValueError("Unknown information '%s'" % what)
+
+    def serveForever(self):
+        self.server.serve_forever()
+
+    def start(self):
+        # serves in background thread
+        self.thread = threading.Thread(target=self.serveForever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.scheduler.stop()
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.remove(self.address)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+class RemoteInvoke:
+    # Invoke running on MeasureServer. Events are delivered while measuring,
+    # value_cb is called with all values after measure is complete.
+    def __init__(self, client, config, event_cb=None, value_cb=None, priority=0):
+        self.client = client
+        self.event_cb = event_cb
+        self.value_cb = value_cb
+        self.invoke_id = -1
+        self.err = None
+        self.exit_status = None
+        self.thread = None
+        self.result = None
+        self.arrays = {}
+        self.columns = None
+
+        self.evtPrepareStart = threading.Event()
+        self.evtPrepareComplete = threading.Event()
+        self.evtMeasureComplete = threading.Event()
+        self.evtTotalComplete = threading.Event()
+
+        if hasattr(config, 'getEncoded'):
+            conf = config.getEncoded().decode('utf-8')
+        else:
+            conf = json.dumps(_configToDict(config))
+
+        self.sock = _connect(client.address)
+        self.rfile = self.sock.makefile('rb')
+        _sendMessage(self.sock, {'op': 'invoke', 'config': conf, 'priority': priority, 'client': client.name})
+        header, _ = _recvMessage(self.rfile)
+        if 'error' in header:
+            self.err = header['error']
+            self._close()
+        else:
+            self.invoke_id = header['job']
+
+    def _close(self):
+        self.rfile.close()
+        self.sock.close()
+
+    def getInitError(self):
+        return self.err
+
+    def _event(self, data):
+        name = data.get('event')
+        if name == 'PrepareStart': self.evtPrepareStart.set()
+        elif name == 'PrepareComplete': self.evtPrepareComplete.set()
+        elif name == 'MeasureComplete': self.evtMeasureComplete.set()
+        if self.event_cb is not None: self.event_cb(data)
+
+    def start(self):
+        assert self
+        try:
+            _sendMessage(self.sock, {'op': 'start'})
+            while True:
+                header, arrays = _recvMessage(self.rfile)
+                if 'event' in header:
+                    self._event(header['event'])
+                    continue
+                if 'error' in header:
+                    raise Exception(header['error'])
+                self.result = header['result']
+                self.arrays = arrays
+                self.exit_status = self.result['exit_status']
+                self.err = self.result.get('error')
+                break
+        except (EOFError, OSError) as e:
+            self.exit_status = Invoke.EXIT_STATUS_FAILED
+            self.err = 'Connection to server lost: %s' % e
+        finally:
+            self._close()
+            try:
+                self._replayValues()
+            finally:
+                self.evtTotalComplete.set()
+        return self.exit_status
+
+    def _replayValues(self):
+        if self.value_cb is None or 'values' not in self.arrays:
+            return
+        values, frames = self.arrays['values'], self.arrays['frames']
+        for row, frame in enumerate(frames.tolist()):
+            for col, value in enumerate(values[row].tolist()):
+                if value == value: self.value_cb(self.invoke_id, frame, col, value)
+
+    def startAsynch(self):
+        self.thread = threading.Thread(target=self.start)
+        self.thread.start()
+
+    def waitPrepareStart(self, timeout=None):
+        return self.evtPrepareStart.wait(timeout)
+
+    def waitPrepareComplete(self, timeout=None):
+        return self.evtPrepareComplete.wait(timeout)
+
+    def waitMeasureComplete(self, timeout=None):
+        return self.evtMeasureComplete.wait(timeout)
+
+    def wait(self, timeout=None):
+        self.evtTotalComplete.wait(timeout)
+        return self.exit_status
+
+    def _control(self, op):
+        return self.client._request({'op': op, 'job': self.invoke_id})
+
+    def cancel(self):
+        self._control('cancel')
+
+    def pause(self):
+        self._control('pause')
+
+    def resume(self):
+        self._control('resume')
+
+    def getExitStatus(self):
+        return self.exit_status
+
+    def computeIsFailed(self):
+        return self.exit_status == Invoke.EXIT_STATUS_FAILED
+
+    def _checkResult(self, key):
+        if self.result is None or key not in self.result:
+            raise Exception("Results are not available")
+        return self.result[key]
+
+    def getColumns(self):
+        if self.columns is None:
+            self.columns = ColumnList(self._checkResult('columns'))
+        return self.columns
+
+    def getFiles(self):
+        return freeze(self._checkResult('files'))
+
+    def getAccumulators(self):
+        return self._checkResult('accumulators')
+
+    def getRowCount(self):
+        values = self.arrays.get('values')
+        return None if values is None else len(values)
+
+    def getValuesAsArray(self):
+        values = self.arrays.get('values')
+        return None if values is None else values.copy()
+
+    def getFrameNumbersAsArray(self):
+        frames = self.arrays.get('frames')
+        return None if frames is None else frames.copy()
+
+    def __bool__(self):
+        return self.invoke_id >= 0
+    __nonzero__ = __bool__
+
+class MeasureClient:
+    # Thin client of MeasureServer with the same invoke() and information
+    # methods as SharedInterface. Jobs of one client name share its quota.
+    def __init__(self, address, name=None):
+        self.address = tuple(address) if isinstance(address, list) else address
+        self.name = name if name is not None else '%s:%d' % (socket.gethostname(), os.getpid())
+        self.info_cache = {}
+
+    def _request(self, header):
+        sock = _connect(self.address)
+        try:
+            rfile = sock.makefile('rb')
+            _sendMessage(sock, header)
+            res, _ = _recvMessage(rfile)
+            rfile.close()
+        finally:
+            sock.close()
+        if 'error' in res:
+            raise Exception(res['error'])
+        return res
+
+    def invoke(self, config, event_cb=None, value_cb=None, priority=0):
+        return RemoteInvoke(self, config, event_cb, value_cb, priority)
+
+    def _getInfo(self, what):
+        info = self.info_cache.get(what)
+        if info is None:
+            info = self.info_cache[what] = freeze(self._request({'op': 'info', 'what': what})['result'])
+        return info
+
+    def getVersion(self):
+        return self._request({'op': 'info', 'what': 'version'})['result']
+
+    def getMetrics(self):
+        return self._getInfo('metrics')
+
+    def getDevices(self):
+        return self._getInfo('devices')
+
+    def getColorspaces(self):
+        return self._getInfo('colorspaces')
+
+    def getPictureTypes(self):
+        return self._getInfo('picture_types')
+
+    def getStats(self):
+        return self._request({'op': 'info', 'what': 'stats'})['result']
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m msu_vqmt', description='MSU VQMT measurement server')
+    parser.add_argument('--socket', help='Unix socket path')
+    parser.add_argument('--port', type=int, help='TCP port on --host')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--quota', type=int, help='max running jobs per client')
+    parser.add_argument('--vqmt-path', help='path to libvqmt.so or vqmt.dll')
+    parser.add_argument('--vqmt-dir', help='VQMT installation directory')
+    parser.add_argument('--version', help='VQMT version to find')
+    args = parser.parse_args()
+
+    if (args.socket is None) == (args.port is None):
+        parser.error('specify either --socket or --port')
+    address = args.socket if args.socket is not None else (args.host, args.port)
+    server = MeasureServer(address, vqmt_path=args.vqmt_path, vqmt_dir=args.vqmt_dir, version=args.version,
+                           workers=args.workers, quota=args.quota)
+    print('Serving on %s' % (server.address,))
+    try:
+        server.serveForever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+if __name__ == '__main__':
+    main()
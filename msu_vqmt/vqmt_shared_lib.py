@@ -11,7 +11,14 @@ import json
 import copy
 import threading
 import os
-import numpy as np
+
+from .vqmt_lazy import LazyModule
+from .vqmt_profile import InvokeProfile, _clock
+from . import vqmt_export
+from .vqmt_meta import ColumnList, parseFrozen
+from .vqmt_stream import ValueStream, PartialResults
+
+np = LazyModule('numpy')
 
 class VQMT_Version(ctypes.Structure):
     _fields_ = [("maj",        ctypes.c_int),
@@ -23,9 +30,47 @@ class VQMT_Version(ctypes.Structure):
                 ("build_date", ctypes.c_char_p),
                ]
 
-def _getStrFunc(func, type=ctypes.c_char_p):
-    func.restype = type
-    return func
+_EventCallback = ctypes.CFUNCTYPE(None, ctypes.c_char_p, ctypes.c_void_p)
+_ValueCallback = ctypes.CFUNCTYPE(None, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_double, ctypes.c_void_p)
+_InputCallback = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_void_p, ctypes.c_int, ctypes.c_void_p)
+
+# attribute of SharedInterface: (library function, restype, argtypes),
+# functions are bound on first use
+_FUNCTIONS = {
+    'func_get_version':                         ('vqmt_get_version', VQMT_Version, []),
+    'func_get_version_json':                    ('vqmt_get_version_json', ctypes.c_char_p, []),
+    'func_init':                                ('vqmt_init', None, []),
+    'func_invoke_init_with_config_json':        ('vqmt_invoke_init_with_config_json', ctypes.c_int,
+                                                 [ctypes.c_char_p, _EventCallback, _ValueCallback, ctypes.c_void_p]),
+    'func_get_picture_types_json':              ('vqmt_get_picture_types_json', ctypes.c_char_p, []),
+    'func_get_colorspaces_json':                ('vqmt_get_colorspaces_json', ctypes.c_char_p, []),
+    'func_get_devices_json':                    ('vqmt_get_devices_json', ctypes.c_char_p, []),
+    'func_get_metrics_json':                    ('vqmt_get_metrics_json', ctypes.c_char_p, []),
+    'func_detach_invoke':                       ('vqmt_detach_invoke', None, [ctypes.c_int]),
+    'func_get_error':                           ('vqmt_get_error', ctypes.c_char_p, []),
+    'func_start_process':                       ('vqmt_start_process', ctypes.c_int, [ctypes.c_int]),
+    'func_cancel_invoke':                       ('vqmt_cancel_invoke', None, [ctypes.c_int]),
+    'func_pause_invoke':                        ('vqmt_pause_invoke', None, [ctypes.c_int]),
+    'func_resume_invoke':                       ('vqmt_resume_invoke', None, [ctypes.c_int]),
+    'func_get_invoke_columns_information_json': ('vqmt_get_invoke_columns_information_json', ctypes.c_char_p, [ctypes.c_int]),
+    'func_get_invoke_files_information_json':   ('vqmt_get_invoke_files_information_json', ctypes.c_char_p, [ctypes.c_int]),
+    'func_get_invoke_values_json':              ('vqmt_get_invoke_values_json', ctypes.c_char_p, [ctypes.c_int]),
+    'func_get_invoke_values_array':             ('vqmt_get_invoke_values_array', ctypes.c_bool, [ctypes.c_int, ctypes.c_void_p]),
+    'func_get_invoke_frames_array':             ('vqmt_get_invoke_frames_array', ctypes.c_bool, [ctypes.c_int, ctypes.c_void_p]),
+    'func_get_invoke_rowcount':                 ('vqmt_get_invoke_rowcount', ctypes.c_int, [ctypes.c_int]),
+    'func_get_invoke_accumulators_json':        ('vqmt_get_invoke_accumulators_json', ctypes.c_char_p, [ctypes.c_int]),
+    'func_set_invoke_input_callback':           ('vqmt_set_invoke_input_callback', ctypes.c_bool,
+                                                 [ctypes.c_int, _InputCallback, ctypes.c_void_p]),
+    'func_get_invoke_generalized_info_json':    ('vqmt_get_invoke_generalized_info_json', ctypes.c_char_p, [ctypes.c_int]),
+    'func_get_exit_status':                     ('vqmt_get_exit_status', ctypes.c_int, [ctypes.c_int]),
+    'func_check_activation':                    ('vqmt_check_activation', ctypes.c_bool, []),
+    'func_activate_pro':                        ('vqmt_activate_pro', ctypes.c_bool, [ctypes.c_char_p]),
+    'func_activate_pro_advanced':               ('vqmt_activate_pro_advanced', ctypes.c_bool, [ctypes.c_char_p] * 4),
+    'func_activate_premium':                    ('vqmt_activate_premium', ctypes.c_bool, [ctypes.c_char_p]),
+    'func_utility_copy_image':                  ('vqmt_utility_copy_image', None, [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_int]),
+    'func_utility_copy_plane':                  ('vqmt_utility_copy_plane', None,
+                                                 [ctypes.c_void_p, ctypes.c_int, ctypes.c_void_p, ctypes.c_int]),
+}
 
 def _mergeToDict(src, srcdst):
     for k, v in src.items():
@@ -63,6 +108,15 @@ class Invoke:
         self.evtPrepareComplete = threading.Event()
         self.evtMeasureComplete = threading.Event()
         self.evtTotalComplete = threading.Event()
+        self.start_cbs = []
+        self.complete_cbs = []
+        self.event_cbs = []
+        self.value_stream = None
+        self.profile = None
+        self.partial_results = None
+        self.timestamps = {'Created': _clock()}
+        self.columns = None
+        self.files = None
 
     def _set_id(self, invoke_id, cbs):
         self.invoke_id = invoke_id
@@ -72,9 +126,20 @@ class Invoke:
         self.err = err
 
     def _event_cb(self, event_data):
+        name = event_data['event']
+        if name in ('PrepareStart', 'PrepareComplete', 'MeasureComplete'):
+            self.timestamps[name] = _clock()
+            if self.profile is not None: self.profile.onEvent(self, name, self.timestamps[name])
+
         if event_data['event'] == 'PrepareStart': self.evtPrepareStart.set()
-        elif event_data['event'] == 'PrepareComplete': self.evtPrepareComplete.set()
-        elif event_data['event'] == 'MeasureComplete': self.evtMeasureComplete.set()
+        elif event_data['event'] == 'PrepareComplete':
+            self.evtPrepareComplete.set()
+            if self.value_stream is not None: self.value_stream._setColumns(len(self.getColumns()))
+        elif event_data['event'] == 'MeasureComplete':
+            if self.value_stream is not None: self.value_stream._finish()
+            self.evtMeasureComplete.set()
+
+        for cb in self.event_cbs: cb(event_data)
 
     def _checkPrepareComplete(self):
         if not self.evtPrepareComplete.is_set():
@@ -91,25 +156,67 @@ class Invoke:
     def getInitError(self):
         return self.err
 
-    def waitPrepareStart(self):
-        self.evtPrepareStart.wait()
+    def waitPrepareStart(self, timeout=None):
+        return self.evtPrepareStart.wait(timeout)
 
-    def waitPrepareComplete(self):
-        self.evtPrepareComplete.wait()
+    def waitPrepareComplete(self, timeout=None):
+        return self.evtPrepareComplete.wait(timeout)
 
-    def waitMeasureComplete(self):
-        self.evtMeasureComplete.wait()
+    def waitMeasureComplete(self, timeout=None):
+        return self.evtMeasureComplete.wait(timeout)
 
-    def wait(self):
-        self.evtTotalComplete.wait()
+    def wait(self, timeout=None):
+        self.evtTotalComplete.wait(timeout)
         return self.exit_status
             
     def start(self):
         assert self
+        for cb in self.start_cbs: cb(self)
+        self.timestamps['Start'] = _clock()
         self.exit_status = self.shared_interface.start(self.invoke_id)
-        self.evtTotalComplete.set()
+        self.timestamps['TotalComplete'] = _clock()
+        try:
+            if self.value_stream is not None: self.value_stream._finish()
+            if self.profile is not None: self.profile.onComplete(self)
+            for cb in self.complete_cbs: cb(self)
+        finally:
+            self.evtTotalComplete.set()
         return self.exit_status
 
+    def getStats(self):
+        created = self.timestamps['Created']
+        ts = dict((k, v - created) for k, v in self.timestamps.items())
+
+        def span(a, b):
+            return ts[b] - ts[a] if a in ts and b in ts else None
+
+        stats = {
+            'timestamps': ts,
+            'durations': {
+                'prepare': span('PrepareStart', 'PrepareComplete'),
+                'measure': span('PrepareComplete', 'MeasureComplete'),
+                'finalize': span('MeasureComplete', 'TotalComplete'),
+                'total': span('Start', 'TotalComplete'),
+            },
+            'exit_status': self.exit_status,
+            'profiling': self.profile is not None,
+        }
+        if self.profile is not None:
+            stats.update(self.profile.getStats())
+        return stats
+
+    def addStartCallback(self, cb):
+        # cb(invoke) is called by start() in its thread before VQMT starts
+        self.start_cbs.append(cb)
+
+    def addCompleteCallback(self, cb):
+        # cb(invoke) is called after measure finished, before wait() returns
+        self.complete_cbs.append(cb)
+
+    def addEventCallback(self, cb):
+        # cb(event_data) is called from VQMT thread after internal handling
+        self.event_cbs.append(cb)
+
     def getExitStatus(self):
         res = self.shared_interface.func_get_exit_status(self.invoke_id)
         return None if res < 0 else res
@@ -134,19 +241,54 @@ class Invoke:
         self.shared_interface.func_resume_invoke(self.invoke_id)
 
     def getColumns(self):
-        self._checkPrepareComplete()
-        return json.loads(self.shared_interface.func_get_invoke_columns_information_json(self.invoke_id))
+        # columns don't change after preparing, they are parsed only once
+        if self.columns is None:
+            self._checkPrepareComplete()
+            self.columns = ColumnList(json.loads(self.shared_interface.func_get_invoke_columns_information_json(self.invoke_id)))
+        return self.columns
+
+    def getColumnIndex(self, name):
+        # name is column letter, label ('psnr_CPU_Y') or metric name
+        return self.getColumns().indexOf(name)
 
     def getFiles(self):
+        # files information is final only after measuring
+        if self.files is not None:
+            return self.files
         self._checkPrepareComplete()
-        return json.loads(self.shared_interface.func_get_invoke_files_information_json(self.invoke_id))
-
-    def getValuesAsArray(self):
+        files = parseFrozen(self.shared_interface.func_get_invoke_files_information_json(self.invoke_id))
+        if self.evtMeasureComplete.is_set():
+            self.files = files
+        return files
+
+    def getPartialResults(self):
+        # values measured so far, available while measuring
+        if self.partial_results is None:
+            raise ValueError("Invoke was created without partial_results=True")
+        return self.partial_results
+
+    def getRowCount(self):
         self._checkMeasureComplete()
         totalFrames = self.shared_interface.func_get_invoke_rowcount(self.invoke_id)
-        if totalFrames < 0: return None
+        return None if totalFrames < 0 else totalFrames
 
-        values = np.ndarray([totalFrames, len(self.getColumns())], dtype=np.single)
+    @staticmethod
+    def _checkOutArray(out, shape, dtype):
+        if not isinstance(out, np.ndarray) or out.dtype != dtype or tuple(out.shape) != tuple(shape) \
+                or not out.flags['C_CONTIGUOUS'] or not out.flags['WRITEABLE']:
+            raise ValueError("out should be writeable C-contiguous %s array of shape %s" % (np.dtype(dtype).name, tuple(shape)))
+
+    def getValuesAsArray(self, out=None):
+        # out: optional preallocated float32 array (rows x columns) to fill
+        totalFrames = self.getRowCount()
+        if totalFrames is None: return None
+
+        shape = [totalFrames, len(self.getColumns())]
+        if out is None:
+            values = np.ndarray(shape, dtype=np.single)
+        else:
+            self._checkOutArray(out, shape, np.single)
+            values = out
         values.fill(np.nan)
 
         if not self.shared_interface.func_get_invoke_values_array(self.invoke_id, values.ctypes):
@@ -154,12 +296,16 @@ class Invoke:
 
         return values
 
-    def getFrameNumbersAsArray(self):
-        self._checkMeasureComplete()
-        totalFrames = self.shared_interface.func_get_invoke_rowcount(self.invoke_id)
-        if totalFrames < 0: return None
+    def getFrameNumbersAsArray(self, out=None):
+        # out: optional preallocated intc array (rows) to fill
+        totalFrames = self.getRowCount()
+        if totalFrames is None: return None
 
-        frames = np.ndarray([totalFrames], dtype=np.intc)
+        if out is None:
+            frames = np.ndarray([totalFrames], dtype=np.intc)
+        else:
+            self._checkOutArray(out, [totalFrames], np.intc)
+            frames = out
 
         if not self.shared_interface.func_get_invoke_frames_array(self.invoke_id, frames.ctypes):
             return None
@@ -174,10 +320,26 @@ class Invoke:
         self._checkMeasureComplete()
         return json.loads(self.shared_interface.func_get_invoke_accumulators_json(self.invoke_id))
 
+    def exportNpy(self, path):
+        return vqmt_export.exportNpy(self, path)
+
+    def exportParquet(self, path, row_group_size=65536, compression='zstd'):
+        return vqmt_export.exportParquet(self, path, row_group_size, compression)
+
+    def exportArrow(self, path, row_group_size=65536):
+        return vqmt_export.exportArrow(self, path, row_group_size)
+
     def getGeneralizedInfo(self):
         self._checkTotalComplete()
         return json.loads(self.shared_interface.func_get_invoke_generalized_info_json(self.invoke_id))
 
+    def _setRawInputCallback(self, cb_wrapper):
+        if self.profile is not None:
+            cb_wrapper = self.profile.wrapInputCallback(cb_wrapper)
+        event_callback = _InputCallback(cb_wrapper)
+        self.shared_interface.func_set_invoke_input_callback(self.invoke_id, event_callback, None)
+        self.cbs.append(event_callback)
+
     def setInputCallback(self, cb):
         def cb_wrapper(invoke_id, file, frame, data, mask, unused):
             result = cb(invoke_id, file.decode('utf-8', errors='ignore'), frame, data, mask)
@@ -186,9 +348,28 @@ class Invoke:
 
             return Invoke.INPUT_CB_OK if result else Invoke.INPUT_CB_EOF
 
-        event_callback = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_void_p, ctypes.c_int, ctypes.c_void_p)(cb_wrapper)
-        self.shared_interface.func_set_invoke_input_callback(self.invoke_id, event_callback, ctypes.c_void_p())
-        self.cbs.append(event_callback)
+        self._setRawInputCallback(cb_wrapper)
+
+    def setInputSources(self, sources):
+        # sources maps file names of callback mode files to objects having
+        # readFrame(frame, data, chan_mask) method returning INPUT_CB_* code.
+        # Sources with close_on_complete are closed when the invoke is complete.
+        by_name = dict((_makeStr(name), source) for name, source in sources.items())
+        for source in by_name.values():
+            if getattr(source, 'close_on_complete', False):
+                self.addCompleteCallback(lambda inv, source=source: source.close())
+
+        def cb_wrapper(invoke_id, file, frame, data, mask, unused):
+            source = by_name.get(file)
+            if source is None:
+                return Invoke.INPUT_CB_ERROR
+
+            try:
+                return source.readFrame(frame, data, mask)
+            except Exception:
+                return Invoke.INPUT_CB_ERROR
+
+        self._setRawInputCallback(cb_wrapper)
 
     def __bool__(self):
         return self.invoke_id >= 0
@@ -229,7 +410,7 @@ class Config:
             raise ValueError("Do not specify both variation and device")
         elif variation is not None:
             metr["metric"] = {"name":name, "variation": variation}
-        elif variation is not None:
+        elif device is not None:
             metr["metric"] = {"name":name, "device": device}
 
         #if component is None:
@@ -243,79 +424,61 @@ class Config:
         self.addedMetrics.append(metr)
 
     def addFile(self, path, startFrame=0, endFrame=None, offsetType=None, stdin=False, props=None, mode=None, indexType=None, indexFile=None):
-        data = {}
-        if startFrame != 0 or endFrame is not None:
-            data['range'] = [startFrame] if endFrame is None else [startFrame, endFrame]
-
-        if offsetType is not None:
-            data['offset_type'] = offset_type
-
-        if mode is not None:
-            data['mode'] = mode
-
-        if indexType is not None:
-            data['index'] = indexType
-
-        if indexFile is not None:
-            data['index_file'] = indexFile
-
-        if props is not None:
-            data['props'] = props
+        self.addedFiles.append(_makeFileEntry(path, startFrame, endFrame, offsetType, stdin, props, mode, indexType, indexFile))
 
-        if stdin:
-            data['stdin'] = stdin
-
-        if len(data) == 0: obj = path
-        else: obj = [path, data]
-        
-        self.addedFiles.append(obj)
-
-class SharedInterface:
-    def __init__(self, vqmt_dll_path):
-        self.dll = ctypes.cdll.LoadLibrary(vqmt_dll_path)
+def _makeFileEntry(path, startFrame=0, endFrame=None, offsetType=None, stdin=False, props=None, mode=None, indexType=None, indexFile=None):
+    data = {}
+    if startFrame != 0 or endFrame is not None:
+        data['range'] = [startFrame] if endFrame is None else [startFrame, endFrame]
 
-        self.func_get_version = _getStrFunc(self.dll.vqmt_get_version, VQMT_Version)
-        self.func_get_version_json = _getStrFunc(self.dll.vqmt_get_version_json)
+    if offsetType is not None:
+        data['offset_type'] = offsetType
 
-        self.func_init = _getStrFunc(self.dll.vqmt_init, None)
+    if mode is not None:
+        data['mode'] = mode
 
-        self.func_invoke_init_with_config_json = self.dll.vqmt_invoke_init_with_config_json
+    if indexType is not None:
+        data['index'] = indexType
 
-        self.func_get_picture_types_json = _getStrFunc(self.dll.vqmt_get_picture_types_json)
-        self.func_get_colorspaces_json = _getStrFunc(self.dll.vqmt_get_colorspaces_json)
-        self.func_get_devices_json = _getStrFunc(self.dll.vqmt_get_devices_json)
-        self.func_get_metrics_json = _getStrFunc(self.dll.vqmt_get_metrics_json)
+    if indexFile is not None:
+        data['index_file'] = indexFile
 
-        self.func_detach_invoke = _getStrFunc(self.dll.vqmt_detach_invoke, None)
+    if props is not None:
+        data['props'] = props
 
-        self.func_get_error = _getStrFunc(self.dll.vqmt_get_error)
+    if stdin:
+        data['stdin'] = stdin
 
-        self.func_start_process = self.dll.vqmt_start_process
-        self.func_cancel_invoke = _getStrFunc(self.dll.vqmt_cancel_invoke, None)
-        self.func_pause_invoke = _getStrFunc(self.dll.vqmt_pause_invoke, None)
-        self.func_resume_invoke = _getStrFunc(self.dll.vqmt_resume_invoke, None)
+    if len(data) == 0: return path
+    return [path, data]
 
-        self.func_get_invoke_columns_information_json = _getStrFunc(self.dll.vqmt_get_invoke_columns_information_json)
-        self.func_get_invoke_files_information_json = _getStrFunc(self.dll.vqmt_get_invoke_files_information_json)
-        self.func_get_invoke_values_json = _getStrFunc(self.dll.vqmt_get_invoke_values_json)
-        self.func_get_invoke_values_array = _getStrFunc(self.dll.vqmt_get_invoke_values_array, ctypes.c_bool)
-        self.func_get_invoke_frames_array = _getStrFunc(self.dll.vqmt_get_invoke_frames_array, ctypes.c_bool)
-        self.func_get_invoke_rowcount = _getStrFunc(self.dll.vqmt_get_invoke_rowcount, ctypes.c_int)
-        self.func_get_invoke_accumulators_json = _getStrFunc(self.dll.vqmt_get_invoke_accumulators_json)
-        self.func_set_invoke_input_callback = _getStrFunc(self.dll.vqmt_set_invoke_input_callback, ctypes.c_bool)
-        self.func_get_invoke_generalized_info_json = _getStrFunc(self.dll.vqmt_get_invoke_generalized_info_json)
-        self.func_get_exit_status = self.dll.vqmt_get_exit_status
+def _configToDict(config):
+    if isinstance(config, Config) or hasattr(config, 'getEncoded'):
+        return config.getConfig()
+    elif isinstance(config, dict):
+        return config
 
-        self.func_check_activation      = _getStrFunc(self.dll.vqmt_check_activation, ctypes.c_bool)
-        self.func_activate_pro          = _getStrFunc(self.dll.vqmt_activate_pro, ctypes.c_bool)
-        self.func_activate_pro_advanced = _getStrFunc(self.dll.vqmt_activate_pro_advanced, ctypes.c_bool)
-        self.func_activate_premium      = _getStrFunc(self.dll.vqmt_activate_premium, ctypes.c_bool)
+    raise ValueError("Specify config as a Config instance or dict")
 
-        self.func_utility_copy_image      = _getStrFunc(self.dll.vqmt_utility_copy_image, None)
-        self.func_utility_copy_plane      = _getStrFunc(self.dll.vqmt_utility_copy_plane, None)
+class SharedInterface:
+    def __init__(self, vqmt_dll_path):
+        self.path = vqmt_dll_path
+        self.dll = ctypes.cdll.LoadLibrary(vqmt_dll_path)
+        self.info_cache = {}
 
         self.func_init()
 
+    def __getattr__(self, name):
+        # binds library function on first use
+        if name not in _FUNCTIONS:
+            raise AttributeError("'SharedInterface' object has no attribute '%s'" % name)
+        symbol, restype, argtypes = _FUNCTIONS[name]
+        func = getattr(self.dll, symbol)
+        func.restype = restype
+        func.argtypes = argtypes
+        setattr(self, name, func)
+        return func
+
     def getError(self):
         return self.func_get_error().decode('utf-8', errors='ignore')
 
@@ -337,28 +500,47 @@ class SharedInterface:
     def isActivated(self):
         return self.func_check_activation()
 
-    def invoke(self, config, event_cb=None, value_cb=None):
+    def invoke(self, config, event_cb=None, value_cb=None, value_stream=None, profile=False, hooks=None,
+               partial_results=False):
         invoke = Invoke(self)
+        if partial_results:
+            if value_stream is None:
+                value_stream = ValueStream(batch_size=32, use_queue=False)
+            invoke.partial_results = PartialResults(value_stream)
+        invoke.value_stream = value_stream
+        if profile or hooks:
+            invoke.profile = InvokeProfile(hooks)
 
         def eventCbAltered(event_data, dummy):
             data = json.loads(event_data)
             invoke._event_cb(data)
             if event_cb is not None: event_cb(data)
 
-        event_callback = ctypes.CFUNCTYPE(None, ctypes.c_char_p, ctypes.c_void_p)(eventCbAltered)
-        value_callback = (ctypes.CFUNCTYPE(None, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_double, ctypes.c_void_p)(lambda id, frame, col, value, _ : value_cb(id, frame, col, value))
-                                if value_cb is not None else ctypes.c_void_p())
-
-        conf_json = None
-        if isinstance(config, Config):
-            conf_json = config.getConfig()
-        elif isinstance(config, dict):
-            conf_json = config
-
-        if conf_json is None:
-            raise ValueError("Specify config as a Config instance or dict")
+        event_callback = _EventCallback(eventCbAltered)
+        value_func = None
+        if value_stream is not None and value_cb is not None:
+            def valueCbBoth(id, frame, col, value, user):
+                value_stream._push(id, frame, col, value)
+                value_cb(id, frame, col, value)
+            value_func = valueCbBoth
+        elif value_stream is not None:
+            # stream is called directly to save a python call per value
+            value_func = value_stream._push
+        elif value_cb is not None:
+            value_func = lambda id, frame, col, value, _ : value_cb(id, frame, col, value)
+
+        if invoke.profile is not None:
+            value_func = invoke.profile.wrapValueCallback(invoke, value_func)
+
+        value_callback = _ValueCallback(value_func) if value_func is not None else _ValueCallback()
+
+        # compiled templates are already encoded
+        if hasattr(config, 'getEncoded'):
+            conf_encoded = config.getEncoded()
+        else:
+            conf_encoded = json.dumps(_configToDict(config)).encode('utf-8')
 
-        invoke_id = self.func_invoke_init_with_config_json(json.dumps(conf_json).encode('utf-8'), event_callback, value_callback, ctypes.c_void_p())
+        invoke_id = self.func_invoke_init_with_config_json(conf_encoded, event_callback, value_callback, None)
         invoke._set_id(invoke_id, [event_callback, value_callback])
 
         if not invoke:
@@ -375,17 +557,24 @@ class SharedInterface:
     def getVersionObject(self):
         return self.func_get_version()
 
+    def _getInfo(self, name, func):
+        # information of the library doesn't change, parse it only once
+        info = self.info_cache.get(name)
+        if info is None:
+            info = self.info_cache[name] = parseFrozen(func())
+        return info
+
     def getPictureTypes(self) :
-        return json.loads(self.func_get_picture_types_json())
+        return self._getInfo('picture_types', self.func_get_picture_types_json)
 
     def getColorspaces(self) :
-        return json.loads(self.func_get_colorspaces_json())
+        return self._getInfo('colorspaces', self.func_get_colorspaces_json)
 
     def getDevices(self) :
-        return json.loads(self.func_get_devices_json())
+        return self._getInfo('devices', self.func_get_devices_json)
 
     def getMetrics(self) :
-        return json.loads(self.func_get_metrics_json())
+        return self._getInfo('metrics', self.func_get_metrics_json)
 
     @staticmethod
     def _checkNdArray(src):
@@ -399,11 +588,55 @@ class SharedInterface:
 
     def copyPlane(self, src, dst, plane):
         self._checkNdArray(src)
-        return self.func_utility_copy_image(src.ctypes, src.shape[0] * src.itemsize, ctypes.c_void_p(dst), 
+        return self.func_utility_copy_plane(src.ctypes, src.shape[0] * src.itemsize, ctypes.c_void_p(dst), 
             ctypes.c_int(plane))
 
-def loadByDir(path):
+def _locationCachePath():
+    base = os.environ.get('MSU_VQMT_CACHE_DIR')
+    if not base:
+        root = os.environ.get('LOCALAPPDATA') if os.name == 'nt' else os.environ.get('XDG_CACHE_HOME')
+        base = os.path.join(root or os.path.join(os.path.expanduser('~'), '.cache'), 'msu_vqmt')
+    return os.path.join(base, 'location.json')
+
+def _readLocations():
+    try:
+        with open(_locationCachePath()) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _cachedLocation(key):
+    # returns path of library found before, if it's still the same file
+    entry = _readLocations().get(key)
+    if not isinstance(entry, dict): return None
+    try:
+        if os.path.getmtime(entry['path']) != entry['mtime']: return None
+    except (OSError, KeyError, TypeError):
+        return None
+    return entry['path']
+
+def _storeLocation(key, path):
+    # location of library is remembered across processes, errors are ignored
+    cache_path = _locationCachePath()
+    try:
+        locations = _readLocations()
+        locations[key] = {'path': path, 'mtime': os.path.getmtime(path)}
+        if not os.path.isdir(os.path.dirname(cache_path)):
+            os.makedirs(os.path.dirname(cache_path))
+        tmp_path = '%s.%d.tmp' % (cache_path, os.getpid())
+        with open(tmp_path, 'w') as f:
+            json.dump(locations, f)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass
+
+def loadByDir(path, use_cache=True):
     if os.name == 'nt':
+        cache_key = 'dir:' + os.path.abspath(path)
+        cached = _cachedLocation(cache_key) if use_cache else None
+        if cached is not None:
+            return SharedInterface(cached)
+
         loader_file = os.path.join(path, 'vqmt_finder.dll')
         if not os.path.exists(loader_file):
             raise Exception("Loader vqmt_finder.dll is not found")
@@ -416,12 +649,14 @@ def loadByDir(path):
         if path=='':
             raise Exception("VQMT can not be loaded")
 
-        return SharedInterface(path)
+        res = SharedInterface(path)
+        if use_cache: _storeLocation(cache_key, path)
+        return res
 
     elif os.name == 'posix':
         vqmt_file = os.path.join(path, 'libvqmt.so')
         
-        if not os.path.exists(loader_file):
+        if not os.path.exists(vqmt_file):
             raise Exception("libvqmt.so is not found")
 
         return SharedInterface(vqmt_file)
@@ -430,8 +665,14 @@ def loadByDir(path):
         raise Exception("Unknown OS, use SharedInterface constructor instead")
 
 
-def find(version_str=None):
+def find(version_str=None, use_cache=True):
     version = tuple(map(int, str(version_str).split('.')) if version_str is not None else [])
+    cache_key = 'find:%s' % ('.'.join(map(str, version)))
+    cached = _cachedLocation(cache_key) if use_cache else None
+    if cached is not None:
+        # registry lookup and version check were done when it was stored
+        return SharedInterface(cached)
+
     if os.name == 'nt':
         import winreg
         try:
@@ -458,7 +699,7 @@ def find(version_str=None):
         if len(all_versions) == 0:
             raise Exception("Can't find suitable VQMT installation")
 
-        res = loadByDir(all_versions[max(all_versions.keys())])
+        res = loadByDir(all_versions[max(all_versions.keys())], use_cache)
 
     elif os.name == 'posix':
         dll_path = '/usr/lib/libvqmt.so'
@@ -476,4 +717,5 @@ def find(version_str=None):
     if len(version) > len(found_ver_tup) or found_ver_tup[0:len(version)] != version:
         raise Exception("Found VQMT version doesn't match the requested one")
 
+    if use_cache: _storeLocation(cache_key, res.path)
     return res
\ No newline at end of file
@@ -0,0 +1,583 @@
+# This is a part of MSU VQMT Python Interface
+# https://github.com/msu-video-group/vqmt_python
+#
+# This code can be used only with installed
+# MSU VQMT Pro, Premium, Trial, DEMO v14.1+
+#
+# Copyright MSU Video Group, compression.ru TEAM
+
+import ctypes
+import mmap
+import os
+import queue
+import re
+import threading
+import numpy as np
+
+from .vqmt_shared_lib import Invoke
+
+# bytes per pixel of packed picture types
+_PACKED_TYPES = {
+    'rgb24': 3, 'bgr24': 3,
+    'rgb32': 4, 'bgr32': 4, 'rgba': 4, 'bgra': 4, 'argb': 4, 'abgr': 4,
+    'rgba32': 4, 'bgra32': 4, 'argb32': 4, 'abgr32': 4,
+    'rgb48': 6, 'bgr48': 6, 'rgb48le': 6, 'bgr48le': 6,
+    'yuyv': 2, 'yuy2': 2, 'uyvy': 2, 'yuyv422': 2, 'uyvy422': 2,
+}
+
+# bytes per sample of monochrome picture types
+_GRAY_TYPES = {
+    'gray': 1, 'gray8': 1, 'y8': 1, 'y800': 1,
+    'gray10le': 2, 'gray12le': 2, 'gray16le': 2, 'gray16': 2, 'y16': 2,
+}
+
+# chroma subsampling (x, y), order of chroma planes, is semi-planar
+_PLANAR_TYPES = {
+    'yuv420p': (2, 2, 'UV', False), 'i420': (2, 2, 'UV', False), 'iyuv': (2, 2, 'UV', False),
+    'yv12': (2, 2, 'VU', False),
+    'yuv422p': (2, 1, 'UV', False), 'yv16': (2, 1, 'VU', False),
+    'yuv444p': (1, 1, 'UV', False), 'yv24': (1, 1, 'VU', False),
+    'nv12': (2, 2, 'UV', True), 'nv21': (2, 2, 'VU', True),
+    'p010': (2, 2, 'UV', True), 'p016': (2, 2, 'UV', True),
+}
+
+_HIGH_DEPTH_RE = re.compile(r'^(yuv4[24][024]p)(9|10|12|14|16)(le)?$')
+
+# Y4M colorspace tag to picture type
+_Y4M_COLORSPACES = {
+    '420': 'yuv420p', '420jpeg': 'yuv420p', '420paldv': 'yuv420p', '420mpeg2': 'yuv420p',
+    '422': 'yuv422p', '444': 'yuv444p', 'mono': 'gray',
+    '420p10': 'yuv420p10le', '422p10': 'yuv422p10le', '444p10': 'yuv444p10le',
+    '420p12': 'yuv420p12le', '422p12': 'yuv422p12le', '444p12': 'yuv444p12le',
+    '420p16': 'yuv420p16le', '422p16': 'yuv422p16le', '444p16': 'yuv444p16le',
+    'mono16': 'gray16le',
+}
+
+_CHANNEL_BITS = {'Y': 1, 'U': 2, 'V': 4}
+_ALL_CHANNELS = 0xF
+
+class PictureLayout:
+    # plane layout of one frame stored contiguously in the given picture type
+    def __init__(self, fmt, w, h):
+        self.fmt = fmt
+        self.w = w
+        self.h = h
+        self.planes = []  # (offset, size, chan_mask)
+
+        key = str(fmt).lower()
+        high = _HIGH_DEPTH_RE.match(key)
+        self.sample_bytes = 1
+        if high is not None:
+            key = high.group(1)
+            self.sample_bytes = 2
+        elif key in ('p010', 'p016'):
+            self.sample_bytes = 2
+
+        if key in _PACKED_TYPES:
+            bpp = _PACKED_TYPES[key]
+            self.sample_bytes = 2 if bpp == 6 else 1
+            self._addPlane(w * h * bpp, _ALL_CHANNELS)
+        elif key in _GRAY_TYPES:
+            self.sample_bytes = _GRAY_TYPES[key]
+            self._addPlane(w * h * self.sample_bytes, _CHANNEL_BITS['Y'])
+        elif key in _PLANAR_TYPES:
+            sx, sy, order, semi = _PLANAR_TYPES[key]
+            cw, ch = (w + sx - 1) // sx, (h + sy - 1) // sy
+            self._addPlane(w * h * self.sample_bytes, _CHANNEL_BITS['Y'])
+            if semi:
+                self._addPlane(cw * ch * 2 * self.sample_bytes, _CHANNEL_BITS['U'] | _CHANNEL_BITS['V'])
+            else:
+                for c in order:
+                    self._addPlane(cw * ch * self.sample_bytes, _CHANNEL_BITS[c])
+        else:
+            raise ValueError("Unsupported picture type '%s'" % fmt)
+
+        self.frame_size = sum(size for _, size, _ in self.planes)
+
+    def _addPlane(self, size, chan_mask):
+        offset = self.planes[-1][0] + self.planes[-1][1] if self.planes else 0
+        self.planes.append((offset, size, chan_mask))
+
+    @staticmethod
+    def fromProps(props):
+        if props is None or 'fmt' not in props or 'w' not in props or 'h' not in props:
+            raise ValueError("props should contain fmt, w and h")
+        return PictureLayout(props['fmt'], int(props['w']), int(props['h']))
+
+    def copyFrame(self, src_ptr, dst_ptr, chan_mask):
+        # copies only planes requested by chan_mask, whole frame if there is
+        # just one plane or mask is unknown
+        if len(self.planes) == 1 or not chan_mask & _ALL_CHANNELS:
+            ctypes.memmove(dst_ptr, src_ptr, self.frame_size)
+            return
+
+        for offset, size, mask in self.planes:
+            if mask & chan_mask:
+                ctypes.memmove(dst_ptr + offset, src_ptr + offset, size)
+
+def _bufferAddress(buf):
+    if isinstance(buf, np.ndarray):
+        return buf.ctypes.data, buf.nbytes
+    if isinstance(buf, bytes):
+        return ctypes.cast(ctypes.c_char_p(buf), ctypes.c_void_p).value, len(buf)
+
+    view = memoryview(buf)
+    if view.readonly:
+        arr = np.frombuffer(view, dtype=np.uint8)
+        return arr.ctypes.data, arr.nbytes
+    return ctypes.addressof(ctypes.c_char.from_buffer(view)), view.nbytes
+
+class ArraySource:
+    # Feeds frames of a callback mode file from numpy array, np.memmap
+    # (first axis is frame number) or iterator of buffer-protocol objects.
+    # Frames are copied straight to VQMT buffer, layout is checked once.
+    def __init__(self, frames, props):
+        self.props = props
+        self.layout = PictureLayout.fromProps(props)
+        self.expected_frames = props.get('frames')
+
+        if isinstance(frames, np.ndarray):
+            self._initArray(frames)
+        else:
+            self._initIterator(frames)
+
+    def _initArray(self, frames):
+        if frames.ndim < 1 or frames.shape[0] == 0:
+            raise ValueError("frames array should have at least one frame")
+
+        frame = frames[0]
+        if not frame.flags['C_CONTIGUOUS']:
+            raise ValueError("each frame should be C-contiguous in memory")
+        if frames.dtype.itemsize not in (1, self.layout.sample_bytes):
+            raise ValueError("dtype %s doesn't match %d-byte samples of '%s'" %
+                             (frames.dtype, self.layout.sample_bytes, self.layout.fmt))
+        if frame.nbytes != self.layout.frame_size:
+            raise ValueError("frame has %d bytes, picture type '%s' %dx%d requires %d" %
+                             (frame.nbytes, self.layout.fmt, self.layout.w, self.layout.h, self.layout.frame_size))
+        if self.expected_frames is not None and frames.shape[0] < self.expected_frames:
+            raise ValueError("array has %d frames, props declare %d" % (frames.shape[0], self.expected_frames))
+
+        self.array = frames
+        self.iterator = None
+        self.base = frames.ctypes.data
+        self.stride = frames.strides[0]
+        self.count = frames.shape[0]
+
+    def _initIterator(self, frames):
+        self.array = None
+        self.iterator = iter(frames)
+        self.next_frame = 0
+        self.current = None
+        self.current_ptr = None
+        self.count = None
+
+    def _nextBuffer(self):
+        buf = next(self.iterator)
+        ptr, size = _bufferAddress(buf)
+        if size != self.layout.frame_size:
+            raise ValueError("frame %d has %d bytes, expected %d" % (self.next_frame, size, self.layout.frame_size))
+        # keep the object alive while VQMT may read it
+        self.current = buf
+        self.current_ptr = ptr
+        self.next_frame += 1
+
+    def readFrame(self, frame, data, chan_mask):
+        if self.iterator is None:
+            if frame >= self.count:
+                return Invoke.INPUT_CB_EOF
+            self.layout.copyFrame(self.base + frame * self.stride, data, chan_mask)
+            return Invoke.INPUT_CB_OK
+
+        if frame < self.next_frame - 1:
+            return Invoke.INPUT_CB_ERROR
+
+        try:
+            while self.next_frame <= frame:
+                self._nextBuffer()
+        except StopIteration:
+            return Invoke.INPUT_CB_EOF
+
+        self.layout.copyFrame(self.current_ptr, data, chan_mask)
+        return Invoke.INPUT_CB_OK
+
+class BatchSource:
+    # Feeds frames of a callback mode file from producer(first, count), which
+    # returns an array of up to `count` frames starting from `first` (frame
+    # is the first axis). Fewer frames or None mean the end of the video.
+    # VQMT requests are served from the last batch, with prefetch > 0 next
+    # batches are produced by a background thread while metrics are computed.
+    # The thread stops at the end of the video and when the invoke using
+    # the source is complete, the source can be used again after that.
+    close_on_complete = True
+
+    def __init__(self, producer, props, batch_size=16, prefetch=0):
+        if batch_size < 1:
+            raise ValueError("batch_size should be positive")
+
+        self.producer = producer
+        self.props = props
+        self.layout = PictureLayout.fromProps(props)
+        self.batch_size = batch_size
+        self.prefetch = prefetch
+
+        self.batch = None
+        self.first = 0
+        self.end = 0
+        self.eof = None  # number of frames, known after the last batch
+        self.base = 0
+        self.stride = 0
+
+        self.queue = None
+        self.thread = None
+        self.stopped = threading.Event()
+
+    def _produce(self, first):
+        batch = self.producer(first, self.batch_size)
+        if batch is None:
+            return None
+        batch = np.ascontiguousarray(batch)
+        if batch.ndim < 1 or len(batch) == 0:
+            return None
+        if len(batch) > self.batch_size:
+            raise ValueError("producer returned %d frames, at most %d requested" % (len(batch), self.batch_size))
+        if batch.dtype.itemsize not in (1, self.layout.sample_bytes):
+            raise ValueError("dtype %s doesn't match %d-byte samples of '%s'" %
+                             (batch.dtype, self.layout.sample_bytes, self.layout.fmt))
+        if batch[0].nbytes != self.layout.frame_size:
+            raise ValueError("frame has %d bytes, picture type '%s' %dx%d requires %d" %
+                             (batch[0].nbytes, self.layout.fmt, self.layout.w, self.layout.h, self.layout.frame_size))
+        return batch
+
+    def _prefetchLoop(self, first):
+        while not self.stopped.is_set():
+            try:
+                batch = self._produce(first)
+            except Exception as e:
+                batch = e
+            while not self.stopped.is_set():
+                try:
+                    self.queue.put((first, batch), timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+            if not isinstance(batch, np.ndarray) or len(batch) < self.batch_size:
+                return
+            first += len(batch)
+
+    def _setBatch(self, first, batch):
+        if isinstance(batch, Exception):
+            raise batch
+        if batch is None or len(batch) < self.batch_size:
+            self.eof = first + (0 if batch is None else len(batch))
+        if batch is None:
+            return
+        self.batch = batch
+        self.first = first
+        self.end = first + len(batch)
+        self.base = batch.ctypes.data
+        self.stride = batch.strides[0]
+
+    def _fetch(self, frame):
+        if self.prefetch > 0:
+            if self.thread is None:
+                self.queue = queue.Queue(self.prefetch)
+                self.thread = threading.Thread(target=self._prefetchLoop, args=(frame,))
+                self.thread.daemon = True
+                self.thread.start()
+            # take prefetched batches until the frame is reached
+            while frame >= self.end and (self.eof is None or frame < self.eof) and \
+                    (self.thread.is_alive() or not self.queue.empty()):
+                try:
+                    first, batch = self.queue.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if frame < first:
+                    break
+                self._setBatch(first, batch)
+            if self.first <= frame < self.end or (self.eof is not None and frame >= self.eof):
+                return
+
+        # first request, seek backwards or no prefetching
+        self._setBatch(frame, self._produce(frame))
+
+    def readFrame(self, frame, data, chan_mask):
+        if not self.first <= frame < self.end:
+            if self.eof is not None and frame >= self.eof:
+                self.close()
+                return Invoke.INPUT_CB_EOF
+            self._fetch(frame)
+            if not self.first <= frame < self.end:
+                self.close()
+                return Invoke.INPUT_CB_EOF
+
+        self.layout.copyFrame(self.base + (frame - self.first) * self.stride, data, chan_mask)
+        return Invoke.INPUT_CB_OK
+
+    def close(self):
+        # stops prefetching, it's started again by the next request
+        self.stopped.set()
+        if self.thread is not None:
+            if self.thread is not threading.current_thread():
+                self.thread.join()
+            self.thread = None
+            self.queue = None
+        self.stopped.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+class RawFileSource:
+    # Feeds frames of raw .yuv or .y4m file using memory mapping. Frame
+    # offsets are computed from picture type (.yuv) or indexed once from
+    # frame headers (.y4m), so only requested frames are ever touched.
+    def __init__(self, path, props=None):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.mapping = None
+        try:
+            size = os.fstat(self.file.fileno()).st_size
+            if size == 0:
+                raise ValueError("File %s is empty" % path)
+            self.mapping = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            # address of mapping, np.frombuffer accepts read-only buffers
+            self.view = np.frombuffer(self.mapping, dtype=np.uint8)
+            self.base = self.view.ctypes.data
+
+            if self.mapping[:10] == b'YUV4MPEG2 ':
+                self._initY4M(props)
+            else:
+                self._initYUV(props, size)
+        except Exception:
+            self.close()
+            raise
+
+    def _initYUV(self, props, size):
+        self.layout = PictureLayout.fromProps(props)
+        self.props = dict(props)
+        self.offsets = None
+        self.count = size // self.layout.frame_size
+        self.props['frames'] = min(self.count, self.props.get('frames', self.count))
+        self.count = self.props['frames']
+
+    def _initY4M(self, props):
+        header_end = self.mapping.find(b'\n')
+        if header_end < 0:
+            raise ValueError("Broken Y4M header in %s" % self.path)
+
+        params = {}
+        for token in self.mapping[10:header_end].decode('ascii', errors='ignore').split():
+            params[token[0]] = token[1:]
+
+        if 'W' not in params or 'H' not in params:
+            raise ValueError("Y4M header doesn't specify frame size in %s" % self.path)
+
+        colorspace = params.get('C', '420')
+        if colorspace not in _Y4M_COLORSPACES:
+            raise ValueError("Unsupported Y4M colorspace C%s in %s" % (colorspace, self.path))
+
+        self.props = {'fmt': _Y4M_COLORSPACES[colorspace], 'w': int(params['W']), 'h': int(params['H'])}
+        if props is not None:
+            self.props.update(props)
+        self.layout = PictureLayout.fromProps(self.props)
+
+        # index frame data offsets skipping FRAME headers, data is not read
+        offsets = []
+        pos = header_end + 1
+        total = len(self.mapping)
+        while pos + 5 <= total and self.mapping[pos:pos + 5] == b'FRAME':
+            nl = self.mapping.find(b'\n', pos)
+            if nl < 0 or nl + 1 + self.layout.frame_size > total:
+                break
+            offsets.append(nl + 1)
+            pos = nl + 1 + self.layout.frame_size
+
+        self.offsets = offsets
+        self.count = len(offsets)
+        self.props['frames'] = self.count
+
+    def frameOffset(self, frame):
+        if self.offsets is None:
+            return frame * self.layout.frame_size
+        return self.offsets[frame]
+
+    def addToConfig(self, config, name, startFrame=0, endFrame=None):
+        config.addFile(name, startFrame=startFrame, endFrame=endFrame, mode='callback', props=dict(self.props))
+
+    def readFrame(self, frame, data, chan_mask):
+        if frame < 0 or frame >= self.count:
+            return Invoke.INPUT_CB_EOF
+
+        self.layout.copyFrame(self.base + self.frameOffset(frame), data, chan_mask)
+        return Invoke.INPUT_CB_OK
+
+    def close(self):
+        self.view = None
+        if self.mapping is not None:
+            self.mapping.close()
+            self.mapping = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+class ReferenceReader:
+    # source of one consumer of SharedReference
+    def __init__(self, shared):
+        self.shared = shared
+        self.pos = 0
+        self.closed = False
+
+    def readFrame(self, frame, data, chan_mask):
+        ptr = self.shared._fetch(self, frame)
+        if ptr is None:
+            return Invoke.INPUT_CB_EOF
+
+        self.shared.layout.copyFrame(ptr, data, chan_mask)
+        self.shared._advance(self, frame + 1)
+        return Invoke.INPUT_CB_OK
+
+    def close(self):
+        self.shared._close(self)
+
+class SharedReference:
+    # Decodes reference once and feeds it to several concurrent invokes.
+    # Frames are taken from source object (readFrame method) or iterator of
+    # buffers and kept in a pool of `window` frames. A frame is replaced
+    # only when all readers have consumed it, so the fastest invoke waits
+    # for the slowest one. Readers should be created before invokes start.
+    def __init__(self, frames, props, window=32):
+        if window < 1:
+            raise ValueError("window should be positive")
+
+        self.props = dict(props)
+        self.layout = PictureLayout.fromProps(props)
+        self.window = window
+        self.pool = np.empty([window, self.layout.frame_size], dtype=np.uint8)
+        self.pool_ptr = self.pool.ctypes.data
+
+        self.source = frames if hasattr(frames, 'readFrame') else None
+        self.iterator = None if self.source is not None else iter(frames)
+        self.current = None
+
+        self.produced = 0   # pool holds frames [produced - window, produced)
+        self.eof = None     # number of frames when the end is reached
+        self.error = None
+        self.producing = False
+        self.readers = []
+        self.cond = threading.Condition()
+
+    def reader(self):
+        r = ReferenceReader(self)
+        with self.cond:
+            self.readers.append(r)
+        return r
+
+    def addToConfig(self, config, name, startFrame=0, endFrame=None):
+        config.addFile(name, startFrame=startFrame, endFrame=endFrame, mode='callback', props=dict(self.props))
+
+    def attach(self, invoke, name, sources=None):
+        # sets input sources of invoke, the reader is closed when invoke completes
+        r = self.reader()
+        all_sources = dict(sources) if sources is not None else {}
+        all_sources[name] = r
+        invoke.setInputSources(all_sources)
+        invoke.addCompleteCallback(lambda inv: r.close())
+        return r
+
+    def _slot(self, frame):
+        return self.pool_ptr + (frame % self.window) * self.layout.frame_size
+
+    def _minPos(self):
+        positions = [r.pos for r in self.readers if not r.closed]
+        return min(positions) if positions else self.produced
+
+    def _produce(self, frame):
+        ptr = self._slot(frame)
+        if self.source is not None:
+            res = self.source.readFrame(frame, ptr, 0)
+            if res == Invoke.INPUT_CB_ERROR:
+                raise ValueError("Reference source failed on frame %d" % frame)
+            return res == Invoke.INPUT_CB_OK
+
+        try:
+            buf = next(self.iterator)
+        except StopIteration:
+            return False
+        src, size = _bufferAddress(buf)
+        if size != self.layout.frame_size:
+            raise ValueError("frame %d has %d bytes, expected %d" % (frame, size, self.layout.frame_size))
+        ctypes.memmove(ptr, src, size)
+        return True
+
+    def _fetch(self, reader, frame):
+        while True:
+            with self.cond:
+                # frames before the requested one won't be needed by reader
+                if frame > reader.pos:
+                    reader.pos = frame
+                    self.cond.notify_all()
+
+                while True:
+                    if self.error is not None:
+                        raise self.error
+                    if self.eof is not None and frame >= self.eof:
+                        return None
+                    if frame < self.produced:
+                        if frame < self.produced - self.window:
+                            raise ValueError("Frame %d has already left the window" % frame)
+                        return self._slot(frame)
+                    if not self.producing and self.produced - self._minPos() < self.window:
+                        break
+                    self.cond.wait()
+
+                self.producing = True
+                n = self.produced
+
+            ok = False
+            try:
+                ok = self._produce(n)
+            except Exception as e:
+                with self.cond:
+                    self.error = e
+                raise
+            finally:
+                with self.cond:
+                    self.producing = False
+                    if ok: self.produced += 1
+                    elif self.error is None: self.eof = n
+                    self.cond.notify_all()
+
+    def _advance(self, reader, pos):
+        with self.cond:
+            if pos > reader.pos:
+                reader.pos = pos
+                self.cond.notify_all()
+
+    def _close(self, reader):
+        with self.cond:
+            reader.closed = True
+            self.cond.notify_all()
+
+def runWithSharedReference(vqmt, shared, configs, name, sources=None, event_cb=None):
+    # starts invokes of all configs (each should contain reference file
+    # `name` added with shared.addToConfig) and waits for them
+    invokes = []
+    for i, config in enumerate(configs):
+        invoke = vqmt.invoke(config, event_cb)
+        if invoke:
+            shared.attach(invoke, name, sources[i] if sources is not None else None)
+        invokes.append(invoke)
+
+    for invoke in invokes:
+        if invoke: invoke.startAsynch()
+    for invoke in invokes:
+        if invoke: invoke.wait()
+    return invokes
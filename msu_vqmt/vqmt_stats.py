@@ -0,0 +1,223 @@
+# This is a part of MSU VQMT Python Interface
+# https://github.com/msu-video-group/vqmt_python
+#
+# This code can be used only with installed
+# MSU VQMT Pro, Premium, Trial, DEMO v14.1+
+#
+# Copyright MSU Video Group, compression.ru TEAM
+
+import warnings
+import numpy as np
+
+from .vqmt_meta import ColumnList
+from .vqmt_export import _resultArrays, _resultParts
+from .vqmt_segments import computeAccumulators
+
+# metrics where lower values mean better quality, worst frames are the highest ones
+_LOWER_IS_BETTER = ('mse', 'delta', 'msad', 'vqm', 'niqe', 'blocking', 'blurring')
+
+def _percentiles(percentiles):
+    return [float(p) for p in np.atleast_1d(percentiles)]
+
+class FrameStats:
+    # Statistics over per-frame values of one or several results. Rows are
+    # matched to segments and scenes by frame numbers, so results with gaps
+    # (sampled) or stitched from several jobs work as well. NaN are ignored
+    # everywhere. Grouped results are dicts of name: array [groups x columns].
+    def __init__(self, values, frames=None, columns=None):
+        self.values = np.asarray(values, dtype=np.float64)
+        if self.values.ndim != 2:
+            raise ValueError("values should be 2D array [frames x columns]")
+        self.frames = np.arange(len(self.values)) if frames is None else np.asarray(frames, dtype=np.int64)
+        if len(self.frames) != len(self.values):
+            raise ValueError("frames and values have different length")
+        self.columns = None if columns is None else ColumnList(columns)
+
+    @classmethod
+    def fromResult(cls, result):
+        # Invoke, CachedInvoke, BatchResult or results of measureSegmented etc.
+        frames, values = _resultArrays(result)
+        if values is None:
+            raise ValueError("Result has no values")
+        return cls(values, frames, _resultParts(result)[0])
+
+    @classmethod
+    def concat(cls, results, frame_offsets=None):
+        # merges results of several jobs, frame_offsets are added to frame
+        # numbers of each result (e.g. first frames of measured ranges)
+        parts = [r if isinstance(r, FrameStats) else cls.fromResult(r) for r in results]
+        if not parts:
+            raise ValueError("Nothing to merge")
+        if len(set(p.values.shape[1] for p in parts)) != 1:
+            raise ValueError("Results have different columns")
+        offsets = frame_offsets if frame_offsets is not None else [0] * len(parts)
+        return cls(np.concatenate([p.values for p in parts], axis=0),
+                   np.concatenate([p.frames + off for p, off in zip(parts, offsets)]),
+                   parts[0].columns)
+
+    def _index(self, column):
+        if isinstance(column, (int, np.integer)):
+            if not 0 <= column < self.values.shape[1]:
+                raise ValueError("Column %d is out of range" % column)
+            return int(column)
+        index = self.columns.indexOf(column) if self.columns is not None else None
+        if index is None:
+            raise ValueError("Unknown column %s" % (column,))
+        return index
+
+    def accumulators(self, percentiles=()):
+        # the same dict as getAccumulators() of VQMT
+        return computeAccumulators(self.values, self.frames, percentiles)
+
+    def percentile(self, percentiles, column=None):
+        # array [len(percentiles) x columns], or [len(percentiles)] for one column
+        values = self.values if column is None else self.values[:, self._index(column)]
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            return np.nanpercentile(values, _percentiles(percentiles), axis=0)
+
+    def groupBy(self, bounds, percentiles=()):
+        # Aggregates frames into groups [bounds[i], bounds[i + 1]), bounds are
+        # sorted frame numbers. Frames outside of bounds are skipped, empty
+        # groups give NaN. Result has 'first' and 'end' frames of groups,
+        # count, mean, harmonic mean, min, max, std dev and
+        # 'percentile <p>' for requested percentiles.
+        bounds = np.asarray(bounds, dtype=np.int64)
+        if bounds.ndim != 1 or len(bounds) < 2 or np.any(np.diff(bounds) <= 0):
+            raise ValueError("bounds should be increasing frame numbers")
+        groups = len(bounds) - 1
+        gid = np.searchsorted(bounds, self.frames, side='right') - 1
+        inside = (gid >= 0) & (gid < groups)
+        gid, values = gid[inside], self.values[inside]
+        cols = values.shape[1]
+
+        # one sort puts rows of every group together, NaN go last inside group
+        order = np.argsort(gid, kind='mergesort')
+        gid, values = gid[order], values[order]
+        valid = ~np.isnan(values)
+        filled = np.where(valid, values, 0.0)
+
+        def perGroup(weights):
+            # sums of weights [rows x columns] per group
+            flat = (gid[:, None] * cols + np.arange(cols)).ravel()
+            return np.bincount(flat, weights=weights.ravel(), minlength=groups * cols).reshape(groups, cols)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            count = perGroup(valid.astype(np.float64))
+            mean = perGroup(filled) / count
+            square = perGroup(filled * filled) / count
+            inverse = perGroup(np.where(valid, 1.0 / np.where(valid, values, 1.0), 0.0))
+            res = {
+                'first': bounds[:-1].copy(),
+                'end': bounds[1:].copy(),
+                'count': count.astype(np.int64),
+                'mean': mean,
+                'harmonic mean': count / inverse,
+                'std dev': np.sqrt(np.maximum(square - mean * mean, 0.0)),
+            }
+
+        starts = np.searchsorted(gid, np.arange(groups))
+        nonempty = np.searchsorted(gid, np.arange(groups), side='right') > starts
+        res['min'] = np.full((groups, cols), np.nan)
+        res['max'] = np.full((groups, cols), np.nan)
+        if nonempty.any():
+            res['min'][nonempty] = np.minimum.reduceat(np.where(valid, values, np.inf), starts[nonempty], axis=0)
+            res['max'][nonempty] = np.maximum.reduceat(np.where(valid, values, -np.inf), starts[nonempty], axis=0)
+        empty = count == 0
+        res['min'][empty] = np.nan
+        res['max'][empty] = np.nan
+
+        if len(percentiles) and not len(values):
+            for p in _percentiles(percentiles):
+                res['percentile %g' % p] = np.full((groups, cols), np.nan)
+        elif len(percentiles):
+            # values are sorted inside groups (NaN last), percentiles are
+            # interpolated between neighbours like numpy 'linear' method
+            rows = np.empty_like(values)
+            for j in range(cols):
+                rows[:, j] = values[np.lexsort((values[:, j], gid)), j]
+            n = res['count']
+            for p in _percentiles(percentiles):
+                pos = np.maximum(n - 1, 0) * p / 100.0
+                lo = np.floor(pos).astype(np.int64)
+                hi = np.minimum(lo + 1, np.maximum(n - 1, 0))
+                a = rows[np.minimum(starts[:, None] + lo, len(rows) - 1), np.arange(cols)]
+                b = rows[np.minimum(starts[:, None] + hi, len(rows) - 1), np.arange(cols)]
+                res['percentile %g' % p] = np.where(n > 0, a + (b - a) * (pos - lo), np.nan)
+        return res
+
+    def bySegments(self, length, percentiles=()):
+        # groups of `length` consecutive frames starting from the first frame
+        if length < 1:
+            raise ValueError("length should be positive")
+        first = int(self.frames.min()) if len(self.frames) else 0
+        last = int(self.frames.max()) + 1 if len(self.frames) else 1
+        return self.groupBy(np.arange(first, last + length, length), percentiles)
+
+    def byScenes(self, cuts, percentiles=()):
+        # cuts are first frames of scenes (e.g. from a scene detector), the
+        # first scene starts at the first frame and the last one ends after the last frame
+        first = int(self.frames.min()) if len(self.frames) else 0
+        end = int(self.frames.max()) + 1 if len(self.frames) else 1
+        cuts = [c for c in sorted(set(int(c) for c in cuts)) if first < c < end]
+        return self.groupBy([first] + cuts + [end], percentiles)
+
+    def rolling(self, window, stat='mean', column=None):
+        # Statistic of every `window` consecutive rows, array
+        # [rows - window + 1 x columns]. Row i covers rows [i, i + window).
+        # stat is 'mean', 'std dev', 'min' or 'max'. Windows without values are NaN.
+        if window < 1:
+            raise ValueError("window should be positive")
+        values = self.values if column is None else self.values[:, self._index(column)][:, None]
+        rows = len(values) - window + 1
+        if rows <= 0:
+            res = np.ndarray([0, values.shape[1]], dtype=np.float64)
+            return res if column is None else res[:, 0]
+
+        valid = ~np.isnan(values)
+        if stat in ('mean', 'std dev'):
+            filled = np.where(valid, values, 0.0)
+            count = _windowSums(valid.astype(np.float64), window)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = _windowSums(filled, window) / count
+                if stat == 'mean':
+                    res = mean
+                else:
+                    # deviations from the global mean keep the sums of squares precise
+                    shift = np.nanmean(values, axis=0) if valid.any() else np.zeros(values.shape[1])
+                    centered = np.where(valid, values - shift, 0.0)
+                    m = _windowSums(centered, window) / count
+                    res = np.sqrt(np.maximum(_windowSums(centered * centered, window) / count - m * m, 0.0))
+        elif stat in ('min', 'max'):
+            fill = np.inf if stat == 'min' else -np.inf
+            filled = np.where(valid, values, fill)
+            windows = np.lib.stride_tricks.as_strided(
+                filled, (rows, window, values.shape[1]),
+                (filled.strides[0], filled.strides[0], filled.strides[1]), writeable=False)
+            res = windows.min(axis=1) if stat == 'min' else windows.max(axis=1)
+            res = np.where(np.isinf(res), np.nan, res)
+        else:
+            raise ValueError("stat should be 'mean', 'std dev', 'min' or 'max'")
+        return res if column is None else res[:, 0]
+
+    def worst(self, column, k=10, lower_is_worse=None):
+        # k worst frames of a column, worst first: (frames, values). By
+        # default lower values are worse except for metrics like mse or delta.
+        index = self._index(column)
+        if lower_is_worse is None:
+            metric = self.columns[index].metric if self.columns is not None else None
+            lower_is_worse = metric not in _LOWER_IS_BETTER
+        values = self.values[:, index]
+        valid = np.flatnonzero(~np.isnan(values))
+        keys = values[valid] if lower_is_worse else -values[valid]
+        k = min(k, len(valid))
+        if k <= 0:
+            return np.ndarray([0], dtype=self.frames.dtype), np.ndarray([0], dtype=np.float64)
+        part = np.argpartition(keys, k - 1)[:k]
+        rows = valid[part[np.argsort(keys[part], kind='mergesort')]]
+        return self.frames[rows], values[rows]
+
+def _windowSums(values, window):
+    # sums of every `window` consecutive rows by one cumulative sum
+    csum = np.concatenate([np.zeros([1, values.shape[1]]), np.cumsum(values, axis=0)])
+    return csum[window:] - csum[:-window]
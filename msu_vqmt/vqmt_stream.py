@@ -0,0 +1,276 @@
+# This is a part of MSU VQMT Python Interface
+# https://github.com/msu-video-group/vqmt_python
+#
+# This code can be used only with installed
+# MSU VQMT Pro, Premium, Trial, DEMO v14.1+
+#
+# Copyright MSU Video Group, compression.ru TEAM
+
+import ctypes
+import queue
+import threading
+import warnings
+
+from .vqmt_lazy import LazyModule
+from .vqmt_meta import columnName
+
+np = LazyModule('numpy')
+
+class ValueStream:
+    # Collects values from VQMT value callback into preallocated float32 ring
+    # buffer (frame x column) and hands out completed rows in batches.
+    # Pass it to SharedInterface.invoke(config, value_stream=stream).
+    def __init__(self, batch_size=256, capacity=1024, maxsize=0, use_queue=True):
+        if batch_size < 1:
+            raise ValueError("batch_size should be positive")
+
+        self.batch_size = batch_size
+        self.capacity = max(capacity, batch_size)
+        self.ncols = 0
+        self._allocate(self.capacity, 1)
+        self.counts = [0] * self.capacity
+
+        self.base = 0      # first frame not handed out yet
+        self.head = 0      # slot of base frame
+        self.ready = 0     # number of complete rows starting from base
+        self.max_pos = -1  # farthest filled position relative to base
+        self.first = True
+
+        self.lock = threading.Lock()
+        self.closed = False
+        self.finished = threading.Event()  # set after the last batch is handed out
+        self.listeners = []
+        self.queue = queue.Queue(maxsize) if use_queue else None
+        self.total_rows = 0
+        self.dropped = 0   # values of frames handed out before they came
+
+    def addListener(self, cb):
+        # cb(frames, values) is called from measurement thread for every batch
+        self.listeners.append(cb)
+
+    def _setColumns(self, ncols):
+        with self.lock:
+            if ncols > self.ncols:
+                self._resize(self.capacity, ncols)
+
+    def _allocate(self, capacity, ncols):
+        # values are written through ctypes array which is much cheaper per
+        # item than numpy, batches are taken through numpy view of the memory
+        self.cbuf = (ctypes.c_float * (capacity * ncols))()
+        self.buf = np.frombuffer(self.cbuf, dtype=np.float32).reshape([capacity, ncols])
+        self.buf.fill(np.nan)
+        self.stride = ncols
+
+    def _resize(self, capacity, ncols):
+        # unrolls the ring so base frame moves to slot 0
+        order = (self.head + np.arange(self.capacity)) % self.capacity
+        old_buf, old_counts = self.buf, self.counts
+        self._allocate(capacity, max(ncols, 1))
+        self.buf[:self.capacity, :old_buf.shape[1]] = old_buf[order]
+        self.counts = [old_counts[i] for i in order] + [0] * (capacity - self.capacity)
+        self.capacity, self.ncols, self.head = capacity, max(ncols, self.ncols), 0
+
+    def _shiftBase(self, frame):
+        # moves base back to an earlier frame, ring slots before head are free
+        shift = self.base - frame
+        if self.max_pos + 1 + shift > self.capacity:
+            self._resize(max(self.capacity * 2, self.max_pos + 1 + shift), self.ncols)
+        self.head = (self.head - shift) % self.capacity
+        self.base = frame
+        self.max_pos += shift
+        self.ready = 0
+
+    def _push(self, invoke_id, frame, col, value, user=None):
+        # hot path, called by VQMT for every value
+        with self.lock:
+            if self.first:
+                self.base, self.first = frame, False
+            pos = frame - self.base
+            if pos < 0:
+                if self.total_rows > 0:
+                    self.dropped += 1
+                    return
+                # VQMT threads may deliver an earlier frame after the first one
+                self._shiftBase(frame)
+                pos = 0
+            if col >= self.ncols or pos >= self.capacity:
+                self._resize(max(self.capacity * 2, pos + 1) if pos >= self.capacity else self.capacity,
+                             max(col + 1, self.ncols))
+
+            slot = (self.head + pos) % self.capacity
+            self.cbuf[slot * self.stride + col] = value
+            self.counts[slot] += 1
+            if pos > self.max_pos: self.max_pos = pos
+
+            if pos != self.ready or self.counts[slot] < self.ncols:
+                return
+            self._advanceReady()
+            if self.ready < self.batch_size:
+                return
+            batch = self._take(self.ready)
+
+        self._emit(batch)
+
+    def _take(self, rows):
+        slots = (self.head + np.arange(rows)) % self.capacity
+        frames = np.arange(self.base, self.base + rows, dtype=np.intc)
+        values = self.buf[slots, :self.ncols].copy()
+
+        self.buf[slots] = np.nan
+        for slot in slots.tolist(): self.counts[slot] = 0
+        self.base += rows
+        self.head = (self.head + rows) % self.capacity
+        self.ready = 0
+        self.max_pos -= rows
+        self._advanceReady()
+        self.total_rows += rows
+        return frames, values
+
+    def _advanceReady(self):
+        while self.ready <= self.max_pos and self.counts[(self.head + self.ready) % self.capacity] >= self.ncols:
+            self.ready += 1
+
+    def _emit(self, batch):
+        for cb in self.listeners:
+            cb(batch[0], batch[1])
+        if self.queue is not None:
+            self.queue.put(batch)
+
+    def _finish(self):
+        # flushes incomplete rows, called when measure is complete
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            batch = self._take(self.max_pos + 1) if self.max_pos >= 0 else None
+
+        if batch is not None:
+            self._emit(batch)
+        self.finished.set()
+        if self.queue is not None:
+            self.queue.put(None)
+        if self.dropped:
+            warnings.warn("ValueStream dropped %d values of frames that came after later frames were handed out"
+                          % self.dropped, RuntimeWarning)
+
+    def isFinished(self):
+        return self.finished.is_set()
+
+    def getDroppedCount(self):
+        # values lost because their frame came after a batch of later frames
+        return self.dropped
+
+    def batches(self, timeout=None):
+        # yields (frames, values) batches until measure is complete
+        if self.queue is None:
+            raise ValueError("The stream was created without queue")
+        while True:
+            batch = self.queue.get(timeout=timeout)
+            if batch is None:
+                return
+            yield batch
+
+class PartialResults:
+    # Keeps all rows received from ValueStream in growing buffer with running
+    # accumulators, so results can be read from other threads while the
+    # invoke is measuring. Rows appear when the stream hands out a batch.
+    def __init__(self, stream, capacity=4096):
+        self.lock = threading.Lock()
+        self.rows = 0
+        self.frames = np.ndarray([max(capacity, 1)], dtype=np.intc)
+        self.values = None
+
+        self.count = None
+        self.sum = None
+        self.min = None
+        self.max = None
+        self.min_frame = None
+        self.max_frame = None
+        self.finished = stream.finished
+        stream.addListener(self._append)
+
+    def _init(self, ncols):
+        self.values = np.full([len(self.frames), ncols], np.nan, dtype=np.float32)
+        self.count = np.zeros(ncols, dtype=np.int64)
+        self.sum = np.zeros(ncols, dtype=np.float64)
+        self.min = np.full(ncols, np.inf)
+        self.max = np.full(ncols, -np.inf)
+        self.min_frame = np.full(ncols, -1, dtype=np.int64)
+        self.max_frame = np.full(ncols, -1, dtype=np.int64)
+
+    def _grow(self, rows):
+        capacity = max(rows, 2 * len(self.frames))
+        frames = np.ndarray([capacity], dtype=np.intc)
+        values = np.full([capacity, self.values.shape[1]], np.nan, dtype=np.float32)
+        frames[:self.rows] = self.frames[:self.rows]
+        values[:self.rows] = self.values[:self.rows]
+        self.frames, self.values = frames, values
+
+    def _append(self, frames, values):
+        # accumulators are updated per batch, O(columns) per frame
+        n = len(frames)
+        if n == 0:
+            return
+        valid = ~np.isnan(values)
+        filled_min = np.where(valid, values, np.inf)
+        filled_max = np.where(valid, values, -np.inf)
+        cols = np.arange(values.shape[1])
+        min_rows = np.argmin(filled_min, axis=0)
+        max_rows = np.argmax(filled_max, axis=0)
+        batch_min = filled_min[min_rows, cols]
+        batch_max = filled_max[max_rows, cols]
+
+        with self.lock:
+            if self.values is None:
+                self._init(values.shape[1])
+            if self.rows + n > len(self.frames):
+                self._grow(self.rows + n)
+            self.frames[self.rows:self.rows + n] = frames
+            self.values[self.rows:self.rows + n] = values
+            self.rows += n
+
+            self.count += valid.sum(axis=0)
+            self.sum += np.where(valid, values, 0).sum(axis=0, dtype=np.float64)
+            lower = batch_min < self.min
+            self.min[lower] = batch_min[lower]
+            self.min_frame[lower] = frames[min_rows[lower]]
+            higher = batch_max > self.max
+            self.max[higher] = batch_max[higher]
+            self.max_frame[higher] = frames[max_rows[higher]]
+
+    def getRowCount(self):
+        return self.rows
+
+    def isFinished(self):
+        return self.finished.is_set()
+
+    def snapshot(self):
+        # returns (frames, values) copies of all rows received so far
+        with self.lock:
+            if self.values is None:
+                return np.ndarray([0], dtype=np.intc), None
+            return self.frames[:self.rows].copy(), self.values[:self.rows].copy()
+
+    def delta(self, cursor=0):
+        # returns (frames, values, cursor) of rows received after cursor,
+        # pass the returned cursor to the next call
+        with self.lock:
+            if self.values is None or cursor >= self.rows:
+                return np.ndarray([0], dtype=np.intc), None, max(cursor, self.rows)
+            return self.frames[cursor:self.rows].copy(), self.values[cursor:self.rows].copy(), self.rows
+
+    def getAccumulators(self):
+        # running mean, min. and max. in the same form as Invoke.getAccumulators
+        res = {}
+        with self.lock:
+            if self.values is None:
+                return res
+            for j in range(len(self.count)):
+                if self.count[j] == 0: continue
+                letter = columnName(j)
+                res.setdefault('mean', {})[letter] = float(self.sum[j] / self.count[j])
+                res.setdefault('min. val', {})[letter] = float(self.min[j])
+                res.setdefault('max. val', {})[letter] = float(self.max[j])
+                res.setdefault('min. frame', {})[letter] = int(self.min_frame[j])
+                res.setdefault('max. frame', {})[letter] = int(self.max_frame[j])
+        return res
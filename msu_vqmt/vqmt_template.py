@@ -0,0 +1,81 @@
+# This is a part of MSU VQMT Python Interface
+# https://github.com/msu-video-group/vqmt_python
+#
+# This code can be used only with installed
+# MSU VQMT Pro, Premium, Trial, DEMO v14.1+
+#
+# Copyright MSU Video Group, compression.ru TEAM
+
+import itertools
+import json
+
+from .vqmt_shared_lib import _configToDict, _makeFileEntry
+
+class CompiledConfig:
+    # Configuration already encoded to JSON, accepted everywhere instead of
+    # Config. invoke() passes the bytes to VQMT as is, dict is made only
+    # when asked by getConfig() (e.g. for cache keys).
+    def __init__(self, encoded):
+        self.encoded = encoded
+
+    def getEncoded(self):
+        return self.encoded
+
+    def getConfig(self):
+        return json.loads(self.encoded.decode('utf-8'))
+
+    def __repr__(self):
+        return 'CompiledConfig(%s)' % self.encoded.decode('utf-8', errors='replace')
+
+class FileEntry:
+    # File of configuration encoded once, can be reused by many compiled configs
+    def __init__(self, path, startFrame=0, endFrame=None, offsetType=None, stdin=False, props=None, mode=None,
+                 indexType=None, indexFile=None):
+        self.encoded = json.dumps(_makeFileEntry(path, startFrame, endFrame, offsetType, stdin, props, mode,
+                                                 indexType, indexFile)).encode('utf-8')
+
+def _withRange(f, start, end):
+    if isinstance(f, FileEntry):
+        raise ValueError("Range can't be applied to FileEntry, specify it when creating the entry")
+    if isinstance(f, (tuple, list)):
+        return [f[0], dict(f[1], range=[start, end])]
+    return [f, {'range': [start, end]}]
+
+class ConfigTemplate:
+    # Metrics and global properties of config are encoded once, compile()
+    # only encodes files and joins byte strings. Files of the template
+    # config are ignored.
+    def __init__(self, config):
+        conf = dict(_configToDict(config))
+        conf.pop('files', None)
+        head = json.dumps(conf).encode('utf-8')
+        self.head = (head[:-1] + b', "files": [') if conf else b'{"files": ['
+        self.tail = b']}'
+
+    @staticmethod
+    def _encodeFile(f):
+        if isinstance(f, FileEntry):
+            return f.encoded
+        if isinstance(f, (tuple, list)) and len(f) == 3 and not isinstance(f[1], dict):
+            # (path, startFrame, endFrame)
+            return json.dumps(_makeFileEntry(f[0], f[1], f[2])).encode('utf-8')
+        return json.dumps(f).encode('utf-8')
+
+    def compile(self, files):
+        # files are FileEntry, path strings, [path, options] or (path, start, end)
+        return CompiledConfig(self.head + b', '.join(self._encodeFile(f) for f in files) + self.tail)
+
+    def sweep(self, file_sets, ranges=None):
+        # yields CompiledConfig for every set of files (and every (start, end)
+        # range applied to all files of the set)
+        for files in file_sets:
+            if ranges is None:
+                yield self.compile(files)
+                continue
+            for start, end in ranges:
+                yield self.compile([_withRange(f, start, end) for f in files])
+
+def sweepConfigs(metric_sets, file_sets, ranges=None):
+    # CompiledConfig for each metric set (Config or dict) x file set x range
+    templates = [ConfigTemplate(m) for m in metric_sets]
+    return itertools.chain.from_iterable(t.sweep(file_sets, ranges) for t in templates)
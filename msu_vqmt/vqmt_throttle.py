@@ -0,0 +1,214 @@
+# This is a part of MSU VQMT Python Interface
+# https://github.com/msu-video-group/vqmt_python
+#
+# This code can be used only with installed
+# MSU VQMT Pro, Premium, Trial, DEMO v14.1+
+#
+# Copyright MSU Video Group, compression.ru TEAM
+
+import os
+import threading
+
+from .vqmt_profile import _clock
+
+def systemLoad():
+    # load of the host per core: 1-minute load average on POSIX, CPU usage
+    # from optional psutil elsewhere. 1.0 means all cores are busy.
+    if hasattr(os, 'getloadavg'):
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    try:
+        import psutil
+    except ImportError:
+        raise Exception("System load is unknown on this platform, install psutil or pass load_func")
+    return psutil.cpu_percent() / 100.0
+
+def _queueDepth(invoke):
+    stream = invoke.value_stream
+    if stream is None or stream.queue is None:
+        return None
+    return stream.queue.qsize()
+
+class _Entry:
+    def __init__(self, invoke, depth, seq):
+        self.invoke = invoke
+        self.depth = depth
+        self.seq = seq
+        self.paused = False
+        self.backlogged = False
+        self.since = _clock()
+
+    def isMeasuring(self):
+        return self.invoke.evtPrepareComplete.is_set() and not self.invoke.evtMeasureComplete.is_set()
+
+class ThrottleController:
+    # Pauses and resumes attached invokes from a background thread:
+    # - at most max_measuring invokes measure at once, the others wait
+    #   paused and are resumed in order of waiting. With time_slice,
+    #   invokes measuring longer than it give way to waiting ones.
+    # - while load of the host (systemLoad() or load_func()) is above
+    #   max_load, one more invoke is paused every `cooldown` seconds,
+    #   below resume_load one is resumed back. min_active invokes always
+    #   measure.
+    # - an invoke whose consumer queue (queue of its value stream or
+    #   depth() given to attach) has more than max_queue batches is paused
+    #   until the queue is drained to resume_queue.
+    # Invokes are controlled after PrepareComplete and forgotten when
+    # measuring is complete.
+    def __init__(self, max_measuring=None, max_load=None, resume_load=None, load_func=None,
+                 max_queue=None, resume_queue=None, time_slice=None, min_active=1, interval=0.1, cooldown=2.0):
+        if max_measuring is not None and max_measuring < 1:
+            raise ValueError("max_measuring should be positive")
+        if max_queue is not None and max_queue < 1:
+            raise ValueError("max_queue should be positive")
+        if min_active < 0:
+            raise ValueError("min_active can't be negative")
+
+        self.max_measuring = max_measuring
+        self.max_load = max_load
+        self.resume_load = resume_load if resume_load is not None else (max_load * 0.8 if max_load is not None else None)
+        self.load_func = load_func if load_func is not None else systemLoad
+        self.max_queue = max_queue
+        self.resume_queue = resume_queue if resume_queue is not None else (max_queue // 2 if max_queue is not None else None)
+        self.time_slice = time_slice
+        self.min_active = min_active
+        self.interval = interval
+        self.cooldown = cooldown
+
+        self.cond = threading.Condition()
+        self.entries = []
+        self.seq = 0
+        self.load = None
+        self.load_slots = None  # slots left by load control, None is unlimited
+        self.load_changed = _clock()  # the first change waits for cooldown too
+        self.pauses = 0
+        self.resumes = 0
+        self.stopped = False
+        self.thread = threading.Thread(target=self._loop)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def attach(self, invoke, depth=None):
+        # depth() returns number of unconsumed batches of the invoke, by
+        # default size of the queue of its value stream
+        with self.cond:
+            if self.stopped:
+                raise ValueError("Controller is closed")
+            entry = _Entry(invoke, depth if depth is not None else (lambda: _queueDepth(invoke)), self.seq)
+            self.seq += 1
+            self.entries.append(entry)
+        invoke.addEventCallback(lambda event: self._wake() if event['event'] == 'PrepareComplete' else None)
+        invoke.addCompleteCallback(self.detach)
+
+    def detach(self, invoke):
+        with self.cond:
+            self.entries = [e for e in self.entries if e.invoke is not invoke]
+            self.cond.notify_all()
+
+    def _wake(self):
+        with self.cond:
+            self.cond.notify_all()
+
+    def isPaused(self, invoke):
+        with self.cond:
+            return any(e.paused for e in self.entries if e.invoke is invoke)
+
+    def getStats(self):
+        with self.cond:
+            measuring = [e for e in self.entries if e.isMeasuring()]
+            return {'attached': len(self.entries), 'measuring': len([e for e in measuring if not e.paused]),
+                    'paused': len([e for e in measuring if e.paused]),
+                    'backlogged': len([e for e in measuring if e.backlogged]),
+                    'load': self.load, 'pauses': self.pauses, 'resumes': self.resumes}
+
+    def _updateLoad(self, active):
+        now = _clock()
+        if now - self.load_changed < self.cooldown:
+            return
+        self.load = self.load_func()
+        if self.load > self.max_load:
+            self.load_slots = max(self.min_active, (active if self.load_slots is None else self.load_slots) - 1)
+        elif self.load < self.resume_load and self.load_slots is not None:
+            self.load_slots += 1
+        else:
+            return
+        self.load_changed = now
+
+    def _plan(self):
+        # returns (to pause, to resume), state of entries is updated
+        measuring = [e for e in self.entries if e.isMeasuring()]
+        for e in measuring:
+            depth = e.depth() if self.max_queue is not None else None
+            if depth is None:
+                e.backlogged = False
+            elif depth > self.max_queue:
+                e.backlogged = True
+            elif depth <= self.resume_queue:
+                e.backlogged = False
+
+        runnable = [e for e in measuring if not e.backlogged]
+        if self.max_load is not None:
+            self._updateLoad(len([e for e in runnable if not e.paused]))
+            if self.load_slots is not None and self.load_slots >= len(runnable):
+                self.load_slots = None
+
+        slots = len(runnable)
+        if self.max_measuring is not None: slots = min(slots, self.max_measuring)
+        if self.load_slots is not None: slots = min(slots, self.load_slots)
+        slots = max(slots, min(self.min_active, len(runnable)))
+
+        now = _clock()
+        def order(e):
+            # measuring invokes keep running, unless their time slice is over,
+            # waiting ones are resumed in order of waiting
+            if not e.paused:
+                expired = self.time_slice is not None and now - e.since >= self.time_slice
+                return (2 if expired else 0, e.since, e.seq)
+            return (1, e.since, e.seq)
+        runnable.sort(key=order)
+        selected = set(id(e) for e in runnable[:slots])
+
+        pause, resume = [], []
+        for e in measuring:
+            run = id(e) in selected
+            if run and e.paused:
+                e.paused, e.since = False, now
+                resume.append(e.invoke)
+            elif not run and not e.paused:
+                e.paused, e.since = True, now
+                pause.append(e.invoke)
+        self.pauses += len(pause)
+        self.resumes += len(resume)
+        return pause, resume
+
+    def _loop(self):
+        while True:
+            with self.cond:
+                if self.stopped:
+                    return
+                pause, resume = self._plan()
+            # VQMT is called without the lock, its callbacks may need it
+            for invoke in pause:
+                if not invoke.evtMeasureComplete.is_set(): invoke.pause()
+            for invoke in resume:
+                invoke.resume()
+            with self.cond:
+                if not self.stopped:
+                    self.cond.wait(self.interval)
+
+    def close(self):
+        # stops controlling and resumes all paused invokes
+        with self.cond:
+            self.stopped = True
+            paused = [e.invoke for e in self.entries if e.paused]
+            self.entries = []
+            self.cond.notify_all()
+        if threading.current_thread() is not self.thread:
+            self.thread.join()
+        for invoke in paused:
+            if not invoke.evtMeasureComplete.is_set(): invoke.resume()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,116 @@
+# This is a part of MSU VQMT Python Interface
+# https://github.com/msu-video-group/vqmt_python
+#
+# This code can be used only with installed
+# MSU VQMT Pro, Premium, Trial, DEMO v14.1+
+#
+# Copyright MSU Video Group, compression.ru TEAM
+
+import weakref
+import numpy as np
+
+def _sharedMemory():
+    try:
+        from multiprocessing import shared_memory
+    except ImportError:
+        raise Exception("Shared memory transport requires Python 3.8 or newer")
+    return shared_memory
+
+def _untrack(shm):
+    # the block is owned by the receiving process, creator shouldn't remove it
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    except Exception:
+        pass
+
+class SharedArray:
+    # Picklable descriptor of numpy array stored in a shared memory block
+    def __init__(self, name, shape, dtype):
+        self.name = name
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype).str
+
+    @staticmethod
+    def create(shape, dtype, name=None):
+        # returns (descriptor, shared memory, array backed by it)
+        size = max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize)
+        shm = _sharedMemory().SharedMemory(name=name, create=True, size=size)
+        _untrack(shm)
+        arr = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        return SharedArray(shm.name, shape, dtype), shm, arr
+
+    def attach(self):
+        # returns (shared memory, array backed by it)
+        shm = _sharedMemory().SharedMemory(name=self.name)
+        return shm, np.ndarray(self.shape, dtype=np.dtype(self.dtype), buffer=shm.buf)
+
+def releaseShared(shm, unlink=True):
+    try:
+        shm.close()
+    except BufferError:
+        # arrays referencing the block are still alive, mapping is freed with them
+        pass
+    if unlink:
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+def unlinkShared(name):
+    # removes block by name if it still exists
+    try:
+        shm = _sharedMemory().SharedMemory(name=name)
+    except FileNotFoundError:
+        return
+    releaseShared(shm)
+
+def blockNames(prefix, index):
+    # names of values and frames blocks of a job, known to both sides, so
+    # the receiver can remove blocks of results it never got
+    return '%s%dv' % (prefix, index), '%s%df' % (prefix, index)
+
+def exportResults(invoke, result, prefix):
+    # fills values and frame numbers straight into new shared memory blocks
+    rows = invoke.getRowCount()
+    if rows is None:
+        return False
+
+    cols = len(invoke.getColumns())
+    values_name, frames_name = blockNames(prefix, result.index)
+    values_desc, values_shm, values = SharedArray.create([rows, cols], np.single, values_name)
+    frames_desc, frames_shm, frames = SharedArray.create([rows], np.intc, frames_name)
+    try:
+        ok = invoke.getValuesAsArray(out=values) is not None and invoke.getFrameNumbersAsArray(out=frames) is not None
+    finally:
+        del values, frames
+        releaseShared(values_shm, unlink=False)
+        releaseShared(frames_shm, unlink=False)
+
+    if not ok:
+        for desc in (values_desc, frames_desc):
+            shm, arr = desc.attach()
+            del arr
+            releaseShared(shm)
+        return False
+
+    result.values_shared = values_desc
+    result.frames_shared = frames_desc
+    return True
+
+def _releaseAll(shms):
+    while shms:
+        releaseShared(shms.pop())
+
+def importResults(result):
+    # Maps shared blocks of result received from worker without copying.
+    # Blocks are freed by release() or when the result is garbage collected.
+    shms = []
+    for attr in ('values', 'frames'):
+        desc = getattr(result, attr + '_shared', None)
+        if desc is None: continue
+        shm, arr = desc.attach()
+        shms.append(shm)
+        setattr(result, attr, arr)
+    if shms:
+        result._finalizer = weakref.finalize(result, _releaseAll, shms)
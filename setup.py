@@ -26,6 +26,7 @@ setup(
     url='https://github.com/msu-video-group/vqmt_python', # package URL
     install_requires=['numpy'],                # list of packages this package depends
                                                # on.
+    extras_require={'arrow': ['pyarrow']},     # optional Arrow and Parquet export
     packages=['msu_vqmt'],              # List of module names that installing
                                         # this package will provide.
     keywords=["video", "images", "compression", "codecs", "quality", "analysis"],
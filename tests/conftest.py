@@ -0,0 +1,55 @@
+# This is a part of MSU VQMT Python Interface
+# https://github.com/msu-video-group/vqmt_python
+#
+# Tests run on the stub library from benchmarks/stub, it is built with
+# the C compiler from CC (cc by default) when it's missing or outdated.
+#
+# Copyright MSU Video Group, compression.ru TEAM
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+_STUB_ENV = ('VQMT_STUB_FRAMES', 'VQMT_STUB_LATENCY_US', 'VQMT_STUB_FAIL_FIRST', 'VQMT_STUB_DEVICES',
+             'VQMT_STUB_PREPARE_US')
+
+@pytest.fixture(scope='session')
+def stub_path():
+    src = os.path.join(root, 'benchmarks', 'stub', 'vqmt_stub.c')
+    lib = os.path.join(root, 'benchmarks', 'stub', 'libvqmt.so')
+    if not os.path.exists(lib) or os.path.getmtime(lib) < os.path.getmtime(src):
+        try:
+            subprocess.check_call([os.environ.get('CC', 'cc'), '-O2', '-shared', '-fPIC',
+                                   '-o', lib, src, '-lpthread', '-lm'])
+        except (OSError, subprocess.CalledProcessError):
+            pytest.skip("Can't build stub VQMT library")
+    return lib
+
+@pytest.fixture
+def stub_env(monkeypatch):
+    # stub reads its settings when invokes start, workers inherit them
+    for name in _STUB_ENV:
+        monkeypatch.delenv(name, raising=False)
+    def setEnv(**values):
+        for name, value in values.items():
+            monkeypatch.setenv('VQMT_STUB_' + name.upper(), str(value))
+    return setEnv
+
+@pytest.fixture
+def vqmt(stub_path, stub_env):
+    import msu_vqmt
+    return msu_vqmt.SharedInterface(stub_path)
+
+def makeConfig(metrics=('psnr',), files=('orig', 'dist')):
+    import msu_vqmt
+    config = msu_vqmt.Config()
+    for metric in metrics:
+        config.addMetric(metric, component='Y')
+    for f in files:
+        config.addFile(f)
+    return config
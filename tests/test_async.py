@@ -0,0 +1,65 @@
+# This is a part of MSU VQMT Python Interface
+# https://github.com/msu-video-group/vqmt_python
+#
+# Copyright MSU Video Group, compression.ru TEAM
+
+import asyncio
+
+import numpy as np
+import pytest
+
+from msu_vqmt import AsyncInvoke, Invoke, gatherInvokes, invokeAsync
+from conftest import makeConfig
+
+def _run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+def test_async_invoke_streams_values(vqmt, stub_env):
+    stub_env(frames=100)
+
+    async def measure():
+        invoke = invokeAsync(vqmt, makeConfig(), batch_size=16)
+        task = asyncio.ensure_future(invoke.start())
+        batches = []
+        async for frames, values in invoke.values():
+            batches.append((frames, values))
+        return invoke, await task, batches
+
+    invoke, status, batches = _run(measure())
+    assert status == Invoke.EXIT_STATUS_ALL_OK
+    assert list(np.concatenate([b[0] for b in batches])) == list(range(100))
+    assert np.allclose(np.concatenate([b[1] for b in batches]), invoke.getValuesAsArray())
+
+def test_async_invoke_requires_running_loop(vqmt, stub_env):
+    invoke = vqmt.invoke(makeConfig())
+    with pytest.raises(RuntimeError):
+        AsyncInvoke(invoke)
+
+def test_finished_invoke_completes_once(vqmt, stub_env):
+    stub_env(frames=10)
+    invoke = vqmt.invoke(makeConfig())
+    invoke.start()
+
+    async def wrap():
+        wrapper = AsyncInvoke(invoke)
+        # complete callback of the invoke which finished while wrapping it
+        wrapper._onComplete(invoke)
+        status = await wrapper.wait()
+        await asyncio.sleep(0)
+        return wrapper, status
+
+    wrapper, status = _run(wrap())
+    assert status == Invoke.EXIT_STATUS_ALL_OK
+    assert wrapper.batches.qsize() == 1
+
+def test_gather_invokes_keeps_order(vqmt, stub_env):
+    stub_env(frames=20)
+    configs = [makeConfig(metrics=metrics) for metrics in (('psnr',), ('psnr', 'ssim'), ('ssim',))]
+    invokes = _run(gatherInvokes(vqmt, configs, limit=2))
+
+    assert [invoke.getExitStatus() for invoke in invokes] == [Invoke.EXIT_STATUS_ALL_OK] * 3
+    assert [invoke.getValuesAsArray().shape[1] for invoke in invokes] == [1, 2, 1]
@@ -0,0 +1,144 @@
+# This is a part of MSU VQMT Python Interface
+# https://github.com/msu-video-group/vqmt_python
+#
+# Copyright MSU Video Group, compression.ru TEAM
+
+import gc
+import os
+import time
+
+import pytest
+
+from msu_vqmt import BatchRunner, Invoke, vqmt_batch
+from conftest import makeConfig
+
+def test_runAll_returns_results_in_order(stub_path, stub_env):
+    stub_env(frames=50)
+    results = BatchRunner(vqmt_path=stub_path, processes=2).runAll([makeConfig() for _ in range(4)])
+
+    assert [r.index for r in results] == [0, 1, 2, 3]
+    for r in results:
+        assert r.exit_status == Invoke.EXIT_STATUS_ALL_OK
+        assert r.values.shape == (50, 1)
+        assert list(r.frames) == list(range(50))
+        assert 'mean' in r.accumulators
+
+def test_run_streams_results_in_completion_order(stub_path, stub_env):
+    stub_env(latency_us=2000)
+    slow = makeConfig(files=())
+    slow.addFile('orig', props={'frames': 300})
+    slow.addFile('dist', props={'frames': 300})
+    runner = BatchRunner(vqmt_path=stub_path, processes=2)
+
+    start = time.time()
+    stream = runner.run([slow, makeConfig()])
+    first = next(stream)
+    first_time = time.time() - start
+    rest = list(stream)
+
+    assert first.index == 1
+    assert first_time < 0.5
+    assert [r.index for r in rest] == [0]
+
+def test_timeout_cancels_invoke(stub_path, stub_env):
+    stub_env(frames=10000, latency_us=1000)
+    start = time.time()
+    result, = BatchRunner(vqmt_path=stub_path, processes=1, timeout=0.3).runAll([makeConfig()])
+
+    assert time.time() - start < 5
+    assert result.timed_out
+    assert result.exit_status == Invoke.EXIT_STATUS_INTERRUPTED
+
+def test_timeout_while_preparing_is_bounded(stub_path, stub_env):
+    stub_env(prepare_us=5000000)
+    start = time.time()
+    result, = BatchRunner(vqmt_path=stub_path, processes=1, timeout=0.3).runAll([makeConfig()])
+
+    assert time.time() - start < 3
+    assert result.timed_out
+    assert result.error
+
+def _runJobWithPid(job):
+    result = vqmt_batch._originalRunJob(job)
+    result.worker_pid = os.getpid()
+    return result
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="needs fork")
+def test_worker_abandoning_invoke_is_recycled(stub_path, stub_env, monkeypatch):
+    stub_env(prepare_us=5000000)
+    monkeypatch.setattr(vqmt_batch, '_originalRunJob', vqmt_batch._runJob, raising=False)
+    monkeypatch.setattr(vqmt_batch, '_runJob', _runJobWithPid)
+    runner = BatchRunner(vqmt_path=stub_path, processes=1, timeout=0.1, start_method='fork')
+    # the config without files fails at once in the same worker unless it was replaced
+    results = runner.runAll([makeConfig(), makeConfig(files=())])
+
+    assert results[0].error == "Preparing didn't complete in time"
+    assert results[1].exit_status is None and results[1].error
+    assert results[0].worker_pid != results[1].worker_pid
+
+def test_closing_run_early_stops_workers(stub_path, stub_env):
+    stub_env(frames=100000, latency_us=1000)
+    runner = BatchRunner(vqmt_path=stub_path, processes=2)
+    # a config without files fails at once, the others would measure for minutes
+    stream = runner.run([makeConfig(files=())] + [makeConfig() for _ in range(4)])
+
+    start = time.time()
+    assert next(stream).index == 0
+    stream.close()
+    assert time.time() - start < 5
+
+# stub counts failed invokes per process, forked workers would inherit
+# the count of invokes created by other tests
+def test_retries_failed_invokes(stub_path, stub_env):
+    stub_env(fail_first=2, frames=20)
+    runner = BatchRunner(vqmt_path=stub_path, processes=1, retries=2, start_method='spawn')
+    result, = runner.runAll([makeConfig()])
+
+    assert result.attempts == 3
+    assert result.exit_status == Invoke.EXIT_STATUS_ALL_OK
+    assert result.values.shape == (20, 1)
+
+def test_failure_reported_after_retries(stub_path, stub_env):
+    stub_env(fail_first=5)
+    runner = BatchRunner(vqmt_path=stub_path, processes=1, retries=1, start_method='spawn')
+    result, = runner.runAll([makeConfig()])
+
+    assert result.attempts == 2
+    assert result.exit_status == Invoke.EXIT_STATUS_FAILED
+    assert result.error
+    assert result.values is None
+
+def test_unloadable_library_reported_by_jobs(stub_env):
+    start = time.time()
+    results = BatchRunner(vqmt_path='/nonexistent/libvqmt.so', processes=2).runAll([makeConfig(), makeConfig()])
+
+    assert time.time() - start < 10
+    assert [r.index for r in results] == [0, 1]
+    for r in results:
+        assert not r.isOk()
+        assert "Can't load VQMT" in r.error
+
+def _sharedBlocks():
+    return set(name for name in os.listdir('/dev/shm') if name.startswith('vqmt'))
+
+@pytest.mark.skipif(not os.path.isdir('/dev/shm'), reason="needs /dev/shm")
+def test_shared_memory_blocks_are_freed(stub_path, stub_env):
+    stub_env(frames=100)
+    before = _sharedBlocks()
+    runner = BatchRunner(vqmt_path=stub_path, processes=2, transport='shared_memory')
+
+    results = runner.runAll([makeConfig() for _ in range(3)])
+    assert all(r.values.shape == (100, 1) for r in results)
+    with results[0]:
+        pass
+    assert results[0].values is None
+    del results
+    gc.collect()
+    assert _sharedBlocks() == before
+
+    # iteration stopped while other jobs are still running
+    stub_env(frames=100, latency_us=1000)
+    stream = runner.run([makeConfig() for _ in range(6)])
+    next(stream).release()
+    stream.close()
+    assert _sharedBlocks() == before
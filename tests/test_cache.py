@@ -0,0 +1,73 @@
+# This is a part of MSU VQMT Python Interface
+# https://github.com/msu-video-group/vqmt_python
+#
+# Copyright MSU Video Group, compression.ru TEAM
+
+import numpy as np
+
+from msu_vqmt import CachedInvoke, ColumnCache, Invoke, ResultCache
+from conftest import makeConfig
+
+def _start(cache, vqmt, config):
+    events, values = [], []
+    invoke = cache.invoke(vqmt, config, lambda e: events.append(e['event']),
+                          lambda invoke_id, frame, col, value: values.append((frame, col)))
+    assert invoke.start() == Invoke.EXIT_STATUS_ALL_OK
+    return invoke, events, values
+
+def _assertOnce(events, values, frames, columns):
+    assert events == ['PrepareStart', 'PrepareComplete', 'MeasureComplete']
+    assert sorted(values) == [(f, c) for f in range(frames) for c in range(columns)]
+
+def test_incremental_invoke_replays_one_sequence(vqmt, stub_env, tmp_path):
+    stub_env(frames=10)
+    cache = ColumnCache(str(tmp_path))
+
+    # miss, partial hit and full hit
+    for metrics in (('psnr',), ('psnr', 'ssim'), ('psnr', 'ssim')):
+        invoke, events, values = _start(cache, vqmt, makeConfig(metrics=metrics))
+        _assertOnce(events, values, 10, len(metrics))
+    assert invoke.computed_metrics == []
+    assert (cache.hits, cache.misses) == (3, 2)
+
+def test_incremental_invoke_fallback_replays_one_sequence(vqmt, stub_env, tmp_path):
+    stub_env(frames=10)
+    cache = ColumnCache(str(tmp_path))
+    _start(cache, vqmt, makeConfig(metrics=('psnr',)))
+
+    # cached frames don't match fresh ones, everything is measured again
+    stub_env(frames=6)
+    invoke, events, values = _start(cache, vqmt, makeConfig(metrics=('psnr', 'ssim')))
+    assert invoke.computed_metrics == [0, 1]
+    _assertOnce(events, values, 6, 2)
+
+def test_result_cache_hit_miss_invalidate(vqmt, stub_env, tmp_path):
+    stub_env(frames=20)
+    paths = []
+    for name in ('orig.yuv', 'dist.yuv'):
+        path = tmp_path / name
+        path.write_bytes(b'x' * 100)
+        paths.append(str(path))
+    cache = ResultCache(str(tmp_path / 'cache'))
+    config = makeConfig(files=paths)
+
+    def measure():
+        invoke = cache.invoke(vqmt, config)
+        assert invoke.start() == Invoke.EXIT_STATUS_ALL_OK
+        return invoke
+
+    first = measure()
+    second = measure()
+    assert isinstance(second, CachedInvoke)
+    assert np.array_equal(second.getValuesAsArray(), first.getValuesAsArray())
+    assert np.array_equal(second.getFrameNumbersAsArray(), first.getFrameNumbersAsArray())
+    assert second.getAccumulators() == first.getAccumulators()
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # changed input and invalidated entry are measured again
+    (tmp_path / 'dist.yuv').write_bytes(b'y' * 200)
+    assert not isinstance(measure(), CachedInvoke)
+    cache.invalidate(config)
+    assert not isinstance(measure(), CachedInvoke)
+    assert isinstance(measure(), CachedInvoke)
+    assert (cache.hits, cache.misses) == (2, 3)
@@ -0,0 +1,55 @@
+# This is a part of MSU VQMT Python Interface
+# https://github.com/msu-video-group/vqmt_python
+#
+# Copyright MSU Video Group, compression.ru TEAM
+
+import json
+
+import numpy as np
+import pytest
+
+from msu_vqmt import CachedInvoke, Invoke, exportNpy, loadNpy
+from conftest import makeConfig
+
+def _measure(vqmt):
+    invoke = vqmt.invoke(makeConfig(metrics=('psnr', 'ssim')))
+    assert invoke.start() == Invoke.EXIT_STATUS_ALL_OK
+    return invoke
+
+def test_npy_round_trip(vqmt, stub_env, tmp_path):
+    stub_env(frames=40)
+    invoke = _measure(vqmt)
+    path = str(tmp_path / 'result')
+    invoke.exportNpy(path)
+    frames, values, meta = loadNpy(path)
+
+    assert np.array_equal(frames, invoke.getFrameNumbersAsArray())
+    assert np.array_equal(values, invoke.getValuesAsArray())
+    assert meta['rows'] == 40
+    assert meta['labels'] == ['psnr_CPU_Y', 'ssim_CPU_Y']
+    assert meta['accumulators'] == json.loads(json.dumps(invoke.getAccumulators()))
+
+    # results without Invoke are saved from their arrays
+    cached = CachedInvoke({'values': invoke.getValuesAsArray(), 'frames': invoke.getFrameNumbersAsArray(),
+                           'columns': invoke.getColumns(), 'files': invoke.getFiles(),
+                           'accumulators': invoke.getAccumulators(), 'exit_status': Invoke.EXIT_STATUS_ALL_OK})
+    exportNpy(cached, path + '2')
+    frames2, values2, _ = loadNpy(path + '2')
+    assert np.array_equal(frames2, frames) and np.array_equal(values2, values)
+
+def test_parquet_round_trip(vqmt, stub_env, tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    stub_env(frames=50)
+    invoke = _measure(vqmt)
+    path = str(tmp_path / 'result.parquet')
+    invoke.exportParquet(path, row_group_size=16)
+
+    parquet = pq.ParquetFile(path)
+    table = parquet.read()
+    assert parquet.metadata.num_row_groups == 4
+    assert table.column_names == ['frame', 'psnr_CPU_Y', 'ssim_CPU_Y']
+    assert np.array_equal(table.column('frame').to_numpy(), invoke.getFrameNumbersAsArray())
+    values = np.stack([table.column(name).to_numpy() for name in ('psnr_CPU_Y', 'ssim_CPU_Y')], axis=1)
+    assert np.array_equal(values, invoke.getValuesAsArray())
+    meta = json.loads(table.schema.metadata[b'vqmt'].decode('utf-8'))
+    assert meta['exit_status'] == Invoke.EXIT_STATUS_ALL_OK
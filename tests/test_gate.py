@@ -0,0 +1,59 @@
+# This is a part of MSU VQMT Python Interface
+# https://github.com/msu-video-group/vqmt_python
+#
+# Copyright MSU Video Group, compression.ru TEAM
+
+import numpy as np
+
+from msu_vqmt import GateResult, Invoke, QualityGate, Rule, ValueStream, runGated
+from conftest import makeConfig
+
+def test_gate_passes_when_no_rule_fires(vqmt, stub_env):
+    stub_env(frames=50)
+    result = runGated(vqmt, makeConfig(), [Rule('psnr', '<', 0)])
+
+    assert result.passed and result.error is None
+    assert result.exit_status == Invoke.EXIT_STATUS_ALL_OK
+    assert len(result.frames) == 50
+
+def test_gate_stops_at_first_failing_frame(vqmt, stub_env):
+    stub_env(frames=500, latency_us=200)
+    result = runGated(vqmt, makeConfig(), [Rule('psnr', '<', 31)], batch_size=8)
+
+    assert not result.passed
+    assert result.exit_status == Invoke.EXIT_STATUS_INTERRUPTED
+    assert result.frame == int(result.frames[np.argmax(result.values[:, 0] < 31)])
+    assert result.value < 31
+    assert len(result.frames) < 500
+
+def test_unknown_column_fails_gate_before_measuring(vqmt, stub_env):
+    stub_env(frames=50)
+    result = runGated(vqmt, makeConfig(), [Rule('psnr', '<', 0), Rule('vmaf', '<', 20)])
+
+    assert not result.passed
+    assert result.rule is None
+    assert 'unknown column' in result.error
+    assert result.exit_status == Invoke.EXIT_STATUS_INTERRUPTED
+    assert len(result.frames) == 0
+
+def test_gates_share_rules_without_sharing_state(vqmt, stub_env):
+    stub_env(frames=300, latency_us=200)
+    rules = [Rule('psnr', '<', 31, window=5)]
+    runs = []
+    for _ in range(2):
+        invoke = vqmt.invoke(makeConfig(), value_stream=ValueStream(batch_size=8, use_queue=False),
+                             partial_results=True)
+        gate = QualityGate(rules)
+        gate.attach(invoke)
+        invoke.startAsynch()
+        runs.append((invoke, gate))
+
+    results = []
+    for invoke, gate in runs:
+        invoke.wait()
+        results.append(GateResult(invoke, gate))
+
+    assert rules[0].index is None
+    assert not results[0].passed
+    assert results[0].frame == results[1].frame
+    assert results[0].value == results[1].value
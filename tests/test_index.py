@@ -0,0 +1,55 @@
+# This is a part of MSU VQMT Python Interface
+# https://github.com/msu-video-group/vqmt_python
+#
+# Copyright MSU Video Group, compression.ru TEAM
+
+import os
+
+from msu_vqmt import IndexManager, Invoke
+from conftest import makeConfig
+
+def _files(tmp_path, names):
+    paths = []
+    for name in names:
+        path = tmp_path / name
+        path.write_bytes(name.encode('ascii') * 100)
+        paths.append(str(path))
+    return paths
+
+def _measure(vqmt, indexes, files):
+    invoke = indexes.invoke(vqmt, makeConfig(files=files))
+    assert invoke.start() == Invoke.EXIT_STATUS_ALL_OK
+
+def test_indexes_are_built_once(vqmt, stub_env, tmp_path):
+    stub_env(frames=10)
+    indexes = IndexManager(str(tmp_path / 'indexes'))
+    files = _files(tmp_path, ['orig.y4m', 'dist.y4m'])
+
+    _measure(vqmt, indexes, files)
+    _measure(vqmt, indexes, files)
+
+    stats = indexes.getStats()
+    assert (stats['hits'], stats['misses'], stats['indexes']) == (2, 2, 2)
+
+def test_eviction_removes_lock_files(vqmt, stub_env, tmp_path):
+    stub_env(frames=10)
+    directory = str(tmp_path / 'indexes')
+    indexes = IndexManager(directory)
+    _measure(vqmt, indexes, _files(tmp_path, ['orig.y4m', 'dist.y4m']))
+    # lock file of an index which was never built
+    open(os.path.join(directory, 'missing.vqmtidx.lock'), 'w').close()
+    assert len(os.listdir(directory)) == 5
+
+    indexes.max_size = 0
+    assert indexes.evict() == 2
+    assert os.listdir(directory) == []
+
+def test_max_size_bounds_index_directory(vqmt, stub_env, tmp_path):
+    stub_env(frames=10)
+    directory = str(tmp_path / 'indexes')
+    indexes = IndexManager(directory, max_size=1)
+    for i in range(5):
+        _measure(vqmt, indexes, _files(tmp_path, ['orig%d.y4m' % i, 'dist%d.y4m' % i]))
+
+    # indexes of the last invoke are evicted after it has built them
+    assert os.listdir(directory) == []
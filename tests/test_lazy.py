@@ -0,0 +1,35 @@
+# This is a part of MSU VQMT Python Interface
+# https://github.com/msu-video-group/vqmt_python
+#
+# Copyright MSU Video Group, compression.ru TEAM
+
+import subprocess
+import sys
+
+from conftest import root
+
+# runs in a fresh interpreter, modules imported by other tests don't count
+_SCRIPT = '''
+import sys
+import msu_vqmt
+
+def loaded():
+    return 'numpy' in sys.modules, sorted(m for m in sys.modules if m.startswith('msu_vqmt.'))
+
+assert loaded() == (False, []), loaded()
+config = msu_vqmt.Config()
+config.addMetric('psnr')
+config.addFile('orig')
+config.addFile('dist')
+invoke = msu_vqmt.SharedInterface(sys.argv[1]).invoke(config)
+assert invoke.start() == msu_vqmt.Invoke.EXIT_STATUS_ALL_OK
+assert invoke.getAccumulators()['mean']
+assert not loaded()[0], loaded()
+assert 'msu_vqmt.vqmt_batch' not in loaded()[1]
+
+invoke.getValuesAsArray()
+assert loaded()[0]
+'''
+
+def test_import_does_not_load_numpy(stub_path, stub_env):
+    subprocess.check_call([sys.executable, '-c', _SCRIPT, stub_path], cwd=root)
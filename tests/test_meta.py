@@ -0,0 +1,48 @@
+# This is a part of MSU VQMT Python Interface
+# https://github.com/msu-video-group/vqmt_python
+#
+# Copyright MSU Video Group, compression.ru TEAM
+
+import pickle
+
+import pytest
+
+from msu_vqmt import ColumnList, FrozenDict, Invoke
+from conftest import makeConfig
+
+def test_column_lookup(vqmt, stub_env):
+    stub_env(frames=10)
+    invoke = vqmt.invoke(makeConfig(metrics=('psnr', 'ssim', 'psnr')))
+    assert invoke.start() == Invoke.EXIT_STATUS_ALL_OK
+    columns = invoke.getColumns()
+
+    assert isinstance(columns, ColumnList)
+    assert columns is invoke.getColumns()
+    assert [c.index for c in columns] == [0, 1, 2]
+    assert columns.indexOf('psnr') == 0
+    assert columns.indexOf('ssim_CPU_Y') == invoke.getColumnIndex('ssim') == 1
+    assert columns.indexOf('C') == 2
+    assert columns.indexOf('vmaf') is None
+    assert columns.find('psnr') == [0, 2]
+    assert columns['B'].metric == 'ssim'
+    assert columns[1]['metric_name'] == 'ssim'
+    with pytest.raises(KeyError):
+        columns['vmaf']
+    assert pickle.loads(pickle.dumps(columns)).indexOf('C') == 2
+
+def test_metadata_is_immutable(vqmt, stub_env):
+    stub_env(frames=10)
+    invoke = vqmt.invoke(makeConfig())
+    invoke.start()
+
+    for info in (invoke.getColumns()[0], vqmt.getMetrics()[0], invoke.getFiles()[0]):
+        assert isinstance(info, FrozenDict)
+        with pytest.raises(TypeError):
+            info['x'] = 1
+        with pytest.raises(TypeError):
+            info.update(x=1)
+    assert isinstance(vqmt.getMetrics(), tuple)
+    assert isinstance(invoke.getFiles(), tuple)
+    assert vqmt.getMetrics() is vqmt.getMetrics()
+    with pytest.raises(TypeError):
+        invoke.getColumns()[0].index = 5
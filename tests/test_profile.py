@@ -0,0 +1,50 @@
+# This is a part of MSU VQMT Python Interface
+# https://github.com/msu-video-group/vqmt_python
+#
+# Copyright MSU Video Group, compression.ru TEAM
+
+from msu_vqmt import Invoke, StatsHook
+from conftest import makeConfig
+
+class _CountingHook(StatsHook):
+    def __init__(self):
+        self.events = []
+        self.progress = []
+        self.completed = []
+
+    def onEvent(self, invoke, event, timestamp):
+        self.events.append(event)
+
+    def onProgress(self, invoke, frames, fps):
+        self.progress.append(frames)
+
+    def onComplete(self, invoke, stats):
+        self.completed.append(stats)
+
+def test_stats_hook_counts_callbacks(vqmt, stub_env):
+    stub_env(frames=30)
+    values = []
+    hook = _CountingHook()
+    invoke = vqmt.invoke(makeConfig(metrics=('psnr', 'ssim')), value_cb=lambda *args: values.append(args),
+                         hooks=[hook])
+    assert invoke.start() == Invoke.EXIT_STATUS_ALL_OK
+    stats = invoke.getStats()
+
+    assert hook.events == ['PrepareStart', 'PrepareComplete', 'MeasureComplete']
+    assert hook.progress[-1] == 30
+    assert len(hook.completed) == 1
+    assert stats['profiling']
+    assert stats['value_callbacks']['count'] == len(values) == 60
+    assert stats['frames'] == 30
+    assert stats['fps_history'][-1][1] == 30
+    assert all(stats['durations'][name] >= 0 for name in ('prepare', 'measure', 'finalize', 'total'))
+
+def test_stats_without_profiling(vqmt, stub_env):
+    stub_env(frames=10)
+    invoke = vqmt.invoke(makeConfig())
+    invoke.start()
+    stats = invoke.getStats()
+
+    assert not stats['profiling']
+    assert 'value_callbacks' not in stats
+    assert stats['durations']['total'] >= stats['durations']['measure'] >= 0
@@ -0,0 +1,62 @@
+# This is a part of MSU VQMT Python Interface
+# https://github.com/msu-video-group/vqmt_python
+#
+# Copyright MSU Video Group, compression.ru TEAM
+
+import time
+
+from msu_vqmt import Invoke, ResourceScheduler, estimateJob
+from msu_vqmt.vqmt_resources import gpuImplementations
+from conftest import makeConfig
+
+def test_estimate_uses_resolution_from_props():
+    config = makeConfig(metrics=('vmaf',), files=())
+    for name in ('orig', 'dist'):
+        config.addFile(name, mode='callback', props={'fmt': 'yuv420p', 'w': 3840, 'h': 2160})
+
+    uhd = estimateJob(config)
+    hd = estimateJob(makeConfig(metrics=('vmaf',)))
+
+    assert uhd.cores == hd.cores
+    assert uhd.memory > 3 * hd.memory
+
+def test_closing_run_early_cancels_jobs(vqmt, stub_env):
+    stub_env(frames=100000, latency_us=1000, prepare_us=100000)
+    scheduler = ResourceScheduler(vqmt, cpu_budget=4)
+    # a config without files fails at once, others are still preparing
+    jobs = scheduler.run([makeConfig() for _ in range(3)] + [makeConfig(files=())])
+
+    job = next(jobs)
+    assert job.exit_status == Invoke.EXIT_STATUS_FAILED
+    jobs.close()
+    assert scheduler.getUsage()['running'] == 0
+
+def test_closing_run_cancels_jobs_not_created_yet(vqmt, stub_env):
+    stub_env(frames=100000, latency_us=1000)
+    createInvoke = vqmt.invoke
+    def slowInvoke(config):
+        # admitted jobs with files are still creating invokes when the run is closed
+        if config.get('files'): time.sleep(0.3)
+        return createInvoke(config)
+    vqmt.invoke = slowInvoke
+    scheduler = ResourceScheduler(vqmt, cpu_budget=4)
+    jobs = scheduler.run([makeConfig() for _ in range(2)] + [makeConfig(files=())])
+
+    start = time.time()
+    assert next(jobs).exit_status == Invoke.EXIT_STATUS_FAILED
+    jobs.close()
+    assert time.time() - start < 5
+    assert scheduler.getUsage()['running'] == 0
+
+def test_metrics_placed_on_free_gpu(vqmt, stub_env):
+    stub_env(frames=200, latency_us=1000, devices='GPU0')
+    assert gpuImplementations(vqmt) == {'vmaf': ['GPU0']}
+
+    scheduler = ResourceScheduler(vqmt, cpu_budget=8, gpu_jobs=1)
+    jobs = scheduler.runAll([makeConfig(metrics=('vmaf', 'psnr')) for _ in range(2)])
+
+    # the second job runs while the GPU is busy and stays on CPU
+    placed = [[c['device'] for c in job.invoke.getColumns()] for job in jobs]
+    assert sorted(placed) == [['CPU', 'CPU'], ['GPU0', 'CPU']]
+    assert sorted(job.estimate.devices for job in jobs) == [(), ('GPU0',)]
+    assert all(job.isOk() for job in jobs)
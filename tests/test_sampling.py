@@ -0,0 +1,44 @@
+# This is a part of MSU VQMT Python Interface
+# https://github.com/msu-video-group/vqmt_python
+#
+# Copyright MSU Video Group, compression.ru TEAM
+
+import pytest
+
+from msu_vqmt import measureSampled, sampleRanges
+from msu_vqmt.vqmt_sampling import _collapseStrata, _tValue
+from conftest import makeConfig
+
+def test_student_quantiles():
+    for df, expected in ((1, 12.706), (2, 4.303), (5, 2.571), (30, 2.042), (5000, 1.960)):
+        assert _tValue(0.95, df) == pytest.approx(expected, abs=1e-3)
+
+def test_strata_are_collapsed_to_two_units():
+    assert _collapseStrata([1, 1, 1, 1]) == [[0, 1], [2, 3]]
+    assert _collapseStrata([1, 1, 1]) == [[0, 1, 2]]
+    assert _collapseStrata([2, 0, 3]) == [[0], [1, 2]]
+    assert _collapseStrata([2, 2, 1]) == [[0], [1, 2]]
+
+def test_stratified_ranges_cover_every_part():
+    ranges = sampleRanges(200, fraction=0.2, segment_length=10, seed=1)
+    assert [a // 50 for a, _ in ranges] == [0, 1, 2, 3]
+    assert all(b - a == 10 for a, b in ranges)
+
+def _coverage(vqmt, truth, seeds, **kwargs):
+    hits = 0
+    for seed in range(seeds):
+        acc = measureSampled(makeConfig(), 200, fraction=0.2, segment_length=10, vqmt=vqmt,
+                             seed=seed, **kwargs).getAccumulators()
+        hits += acc['mean ci low']['A'] <= truth <= acc['mean ci high']['A']
+    return hits / float(seeds)
+
+@pytest.mark.parametrize('kwargs', [{'mode': 'stratified'}, {'mode': 'random'},
+                                    {'target_error': 0.5, 'strata': 4, 'max_fraction': 0.6}])
+def test_confidence_interval_coverage(vqmt, stub_env, kwargs):
+    stub_env(frames=200)
+    full = vqmt.invoke(makeConfig())
+    full.start()
+    truth = float(full.getValuesAsArray()[:, 0].mean())
+
+    # nominal 95%, 40 runs
+    assert _coverage(vqmt, truth, 40, **kwargs) >= 0.875
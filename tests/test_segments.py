@@ -0,0 +1,54 @@
+# This is a part of MSU VQMT Python Interface
+# https://github.com/msu-video-group/vqmt_python
+#
+# Copyright MSU Video Group, compression.ru TEAM
+
+import numpy as np
+import pytest
+
+from msu_vqmt import Config, Invoke, computeAccumulators, measureSegmented, rangeConfig
+from conftest import makeConfig
+
+def _rangedConfig(start, end=None):
+    config = Config()
+    config.addMetric('psnr', component='Y')
+    config.addMetric('ssim', component='Y')
+    config.addFile('orig', start, end)
+    config.addFile('dist', start, end)
+    return config
+
+def _full(vqmt, config):
+    invoke = vqmt.invoke(config)
+    assert invoke.start() == Invoke.EXIT_STATUS_ALL_OK
+    return invoke
+
+@pytest.mark.parametrize('start, end, total', [(0, None, 100), (20, None, 80), (10, 70, 60)])
+def test_segments_match_one_invoke(vqmt, stub_env, start, end, total):
+    stub_env(frames=100)
+    full = _full(vqmt, _rangedConfig(start, end))
+    result = measureSegmented(_rangedConfig(start, end), total, segments=3, vqmt=vqmt)
+
+    assert result.getExitStatus() == Invoke.EXIT_STATUS_ALL_OK
+    assert np.array_equal(result.getFrameNumbersAsArray(), full.getFrameNumbersAsArray())
+    assert np.allclose(result.getValuesAsArray(), full.getValuesAsArray())
+
+def test_accumulators_match_vqmt(vqmt, stub_env):
+    stub_env(frames=50)
+    full = _full(vqmt, makeConfig(metrics=('psnr', 'ssim')))
+    expected = full.getAccumulators()
+    acc = computeAccumulators(full.getValuesAsArray(), full.getFrameNumbersAsArray())
+
+    assert sorted(acc) == sorted(expected)
+    for name, columns in expected.items():
+        for letter, value in columns.items():
+            assert acc[name][letter] == pytest.approx(value, rel=1e-5)
+
+def test_range_past_end_of_file_raises():
+    conf = rangeConfig(_rangedConfig(10, 70), 0, 30)
+    assert [opts['range'] for _, opts in conf['files']] == [[10, 40], [10, 40]]
+    # the last segment is cut by the end of files
+    conf = rangeConfig(_rangedConfig(10, 70), 30, 90)
+    assert [opts['range'] for _, opts in conf['files']] == [[40, 70], [40, 70]]
+
+    with pytest.raises(ValueError):
+        rangeConfig(_rangedConfig(10, 70), 60, 90)
@@ -0,0 +1,139 @@
+# This is a part of MSU VQMT Python Interface
+# https://github.com/msu-video-group/vqmt_python
+#
+# Copyright MSU Video Group, compression.ru TEAM
+
+import queue
+import socket
+import threading
+
+import numpy as np
+
+from msu_vqmt import Invoke, MeasureClient, MeasureServer
+from msu_vqmt.vqmt_server import _Job, _Scheduler, _recvMessage, _sendMessage
+from conftest import makeConfig
+
+class _FakeInvoke:
+    def __init__(self, name, started, release=None):
+        self.name = name
+        self.started = started
+        self.release = release
+        self.running = threading.Event()
+
+    def start(self):
+        self.started.append(self.name)
+        self.running.set()
+        if self.release is not None:
+            self.release.wait(10)
+        return Invoke.EXIT_STATUS_ALL_OK
+
+def _job(scheduler, name, started, client='a', priority=0, release=None):
+    return _Job(name, _FakeInvoke(name, started, release), client, priority, queue.Queue(), scheduler.cond)
+
+def _finish(job):
+    assert job.events.get(timeout=10) is None
+    return job.status
+
+def test_message_round_trip():
+    a, b = socket.socketpair()
+    try:
+        values = np.arange(12, dtype=np.float32).reshape(4, 3)
+        _sendMessage(a, {'event': 'x'}, {'values': values, 'empty': np.zeros(0, np.int32)})
+        header, arrays = _recvMessage(b.makefile('rb'))
+    finally:
+        a.close()
+        b.close()
+
+    assert header == {'event': 'x'}
+    assert np.array_equal(arrays['values'], values)
+    assert arrays['values'].dtype == np.float32
+    assert arrays['empty'].shape == (0,)
+
+def test_scheduler_runs_higher_priority_first():
+    scheduler = _Scheduler(1, None)
+    started, release = [], threading.Event()
+    blocker = _job(scheduler, 'blocker', started, release=release)
+    scheduler.submit(blocker)
+    assert blocker.invoke.running.wait(10)
+    low = _job(scheduler, 'low', started, priority=0)
+    high = _job(scheduler, 'high', started, priority=5)
+    scheduler.submit(low)
+    scheduler.submit(high)
+    release.set()
+
+    assert [_finish(job) for job in (blocker, low, high)] == [Invoke.EXIT_STATUS_ALL_OK] * 3
+    assert started == ['blocker', 'high', 'low']
+    scheduler.stop()
+
+def test_scheduler_respects_client_quota():
+    scheduler = _Scheduler(2, 1)
+    started, release = [], threading.Event()
+    first = _job(scheduler, 'a1', started, client='a', release=release)
+    second = _job(scheduler, 'a2', started, client='a')
+    other = _job(scheduler, 'b1', started, client='b')
+    for job in (first, second, other):
+        scheduler.submit(job)
+
+    assert first.invoke.running.wait(10)
+    _finish(other)
+    assert started == ['a1', 'b1']
+    assert scheduler.getStats() == {'pending': 1, 'running': 1}
+    release.set()
+    _finish(first)
+    _finish(second)
+    assert started == ['a1', 'b1', 'a2']
+    scheduler.stop()
+
+def test_job_cancelled_while_queued_never_starts():
+    scheduler = _Scheduler(1, None)
+    started, release = [], threading.Event()
+    blocker = _job(scheduler, 'blocker', started, release=release)
+    job = _job(scheduler, 'job', started)
+    scheduler.submit(blocker)
+    assert blocker.invoke.running.wait(10)
+    scheduler.submit(job)
+
+    job.cancel()
+    release.set()
+    assert _finish(blocker) == Invoke.EXIT_STATUS_ALL_OK
+    assert _finish(job) == Invoke.EXIT_STATUS_INTERRUPTED
+    assert not job.started
+    assert started == ['blocker']
+    scheduler.stop()
+
+def test_remote_invoke_matches_local(vqmt, stub_env):
+    stub_env(frames=30)
+    local = vqmt.invoke(makeConfig(metrics=('psnr', 'ssim')))
+    local.start()
+
+    with MeasureServer(('127.0.0.1', 0), vqmt=vqmt).start() as server:
+        client = MeasureClient(server.address)
+        events, values = [], []
+        invoke = client.invoke(makeConfig(metrics=('psnr', 'ssim')), lambda e: events.append(e['event']),
+                               lambda invoke_id, frame, col, value: values.append((frame, col)))
+        assert invoke
+        assert invoke.start() == Invoke.EXIT_STATUS_ALL_OK
+
+        assert events == ['PrepareStart', 'PrepareComplete', 'MeasureComplete']
+        assert len(values) == 60
+        assert np.array_equal(invoke.getValuesAsArray(), local.getValuesAsArray())
+        assert np.array_equal(invoke.getFrameNumbersAsArray(), local.getFrameNumbersAsArray())
+        assert len(invoke.getColumns()) == 2
+        assert client.getMetrics() == vqmt.getMetrics()
+
+def test_remote_invoke_reports_init_error(vqmt, stub_env):
+    with MeasureServer(('127.0.0.1', 0), vqmt=vqmt).start() as server:
+        invoke = MeasureClient(server.address).invoke(makeConfig(files=()))
+        assert not invoke
+        assert invoke.getInitError()
+
+def test_remote_cancel_of_running_invoke(vqmt, stub_env):
+    stub_env(frames=100000, latency_us=1000)
+    with MeasureServer(('127.0.0.1', 0), vqmt=vqmt).start() as server:
+        invoke = MeasureClient(server.address).invoke(makeConfig())
+        invoke.startAsynch()
+        assert invoke.waitPrepareComplete(10)
+        invoke.cancel()
+
+        assert invoke.wait(10) == Invoke.EXIT_STATUS_INTERRUPTED
+        invoke.thread.join(10)
@@ -0,0 +1,140 @@
+# This is a part of MSU VQMT Python Interface
+# https://github.com/msu-video-group/vqmt_python
+#
+# Copyright MSU Video Group, compression.ru TEAM
+
+import ctypes
+
+import numpy as np
+import pytest
+
+import msu_vqmt
+from msu_vqmt import Invoke
+
+PROPS = {'frames': 100, 'fmt': 'yuv420p', 'w': 16, 'h': 8}
+
+def _frames(n):
+    return np.random.RandomState(0).randint(0, 255, (n, 16 * 8 * 3 // 2)).astype(np.uint8)
+
+def _run(vqmt, sources, end=None):
+    config = msu_vqmt.Config()
+    config.addMetric('psnr', component='Y')
+    for name in sources:
+        config.addFile(name, endFrame=end, mode='callback', props=PROPS)
+    invoke = vqmt.invoke(config)
+    invoke.setInputSources(sources)
+    return invoke, invoke.start()
+
+def test_batch_source_matches_array_source(vqmt):
+    data = _frames(100)
+    reference, _ = _run(vqmt, {'orig': msu_vqmt.ArraySource(data, PROPS), 'dist': msu_vqmt.ArraySource(data, PROPS)})
+    expected = reference.getValuesAsArray()
+
+    producer = lambda first, count: data[first:first + count]
+    invoke, status = _run(vqmt, {'orig': msu_vqmt.BatchSource(producer, PROPS, 16, prefetch=2),
+                                 'dist': msu_vqmt.BatchSource(producer, PROPS, 16)})
+    assert status == Invoke.EXIT_STATUS_ALL_OK
+    assert np.array_equal(invoke.getValuesAsArray(), expected, equal_nan=True)
+
+def test_prefetch_thread_stops_when_invoke_completes(vqmt):
+    # the producer has more frames than measured, prefetching fills its queue
+    data = _frames(100)
+    sources = dict((name, msu_vqmt.BatchSource(lambda first, count: data[first:first + count], PROPS, 4, prefetch=2))
+                   for name in ('orig', 'dist'))
+    invoke, status = _run(vqmt, sources, end=10)
+
+    assert status == Invoke.EXIT_STATUS_ALL_OK
+    assert all(source.thread is None for source in sources.values())
+
+def test_prefetch_thread_stops_at_end_of_video(vqmt):
+    data = _frames(30)
+    source = msu_vqmt.BatchSource(lambda first, count: data[first:first + count], PROPS, 8, prefetch=2)
+    out = np.zeros(data.shape[1], dtype=np.uint8)
+    for frame in range(30):
+        assert source.readFrame(frame, out.ctypes.data, 0) == Invoke.INPUT_CB_OK
+    assert source.readFrame(30, out.ctypes.data, 0) == Invoke.INPUT_CB_EOF
+    assert source.thread is None
+
+def test_array_source_frame_counts(vqmt):
+    data = _frames(40)
+    props = dict(PROPS, frames=40)
+    invoke, status = _run(vqmt, {'orig': msu_vqmt.ArraySource(data, props), 'dist': msu_vqmt.ArraySource(data, props)})
+    assert status == Invoke.EXIT_STATUS_ALL_OK
+    assert invoke.getRowCount() == 40
+
+    # iterator ends before the number of frames in props
+    frames = lambda: (frame.tobytes() for frame in data[:25])
+    invoke, status = _run(vqmt, {'orig': msu_vqmt.ArraySource(frames(), PROPS),
+                                 'dist': msu_vqmt.ArraySource(frames(), PROPS)})
+    assert status == Invoke.EXIT_STATUS_ALL_OK
+    assert invoke.getRowCount() == 25
+
+    with pytest.raises(ValueError):
+        msu_vqmt.ArraySource(data, PROPS)
+    with pytest.raises(ValueError):
+        msu_vqmt.ArraySource(data[:, 1:], props)
+
+class _Recorder:
+    # keeps bytes of frames passed to VQMT
+    def __init__(self, source, frame_size):
+        self.source = source
+        self.frame_size = frame_size
+        self.frames = {}
+
+    def readFrame(self, frame, data, chan_mask):
+        res = self.source.readFrame(frame, data, chan_mask)
+        if res == Invoke.INPUT_CB_OK:
+            self.frames[frame] = ctypes.string_at(data, self.frame_size)
+        return res
+
+def test_raw_file_source_frame_counts(vqmt, tmp_path):
+    data = _frames(25)
+    yuv = tmp_path / 'dist.yuv'
+    # trailing incomplete frame is ignored
+    yuv.write_bytes(data.tobytes() + b'\0' * 10)
+    y4m = tmp_path / 'orig.y4m'
+    y4m.write_bytes(b'YUV4MPEG2 W16 H8 F25:1 C420\n' + b''.join(b'FRAME\n' + f.tobytes() for f in data[:12]))
+
+    with msu_vqmt.RawFileSource(str(y4m)) as orig, msu_vqmt.RawFileSource(str(yuv), PROPS) as dist:
+        assert (orig.count, dist.count) == (12, 25)
+        assert orig.props == {'fmt': 'yuv420p', 'w': 16, 'h': 8, 'frames': 12}
+
+        config = msu_vqmt.Config()
+        config.addMetric('psnr', component='Y')
+        orig.addToConfig(config, 'orig')
+        dist.addToConfig(config, 'dist', startFrame=2)
+        sources = {'orig': _Recorder(orig, data.shape[1]), 'dist': _Recorder(dist, data.shape[1])}
+        invoke = vqmt.invoke(config)
+        invoke.setInputSources(sources)
+
+        assert invoke.start() == Invoke.EXIT_STATUS_ALL_OK
+        assert invoke.getRowCount() == 12
+        assert sources['orig'].frames[5] == data[5].tobytes()
+        assert sources['dist'].frames[7] == data[7].tobytes()
+
+def test_shared_reference_feeds_every_invoke(vqmt):
+    data = _frames(30)
+    decoded = []
+
+    def decode():
+        for frame in data:
+            decoded.append(len(decoded))
+            yield frame
+
+    props = dict(PROPS)
+    del props['frames']
+    shared = msu_vqmt.SharedReference(decode(), props, window=4)
+    configs = []
+    for metric in ('psnr', 'ssim', 'psnr'):
+        config = msu_vqmt.Config()
+        config.addMetric(metric, component='Y')
+        shared.addToConfig(config, 'orig')
+        config.addFile('dist', mode='callback', props=PROPS)
+        configs.append(config)
+    sources = [{'dist': msu_vqmt.ArraySource(_frames(100), PROPS)} for _ in configs]
+    invokes = msu_vqmt.runWithSharedReference(vqmt, shared, configs, 'orig', sources)
+
+    assert [invoke.getExitStatus() for invoke in invokes] == [Invoke.EXIT_STATUS_ALL_OK] * 3
+    assert [invoke.getRowCount() for invoke in invokes] == [30] * 3
+    # reference is decoded once
+    assert decoded == list(range(30))
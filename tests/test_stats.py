@@ -0,0 +1,67 @@
+# This is a part of MSU VQMT Python Interface
+# https://github.com/msu-video-group/vqmt_python
+#
+# Copyright MSU Video Group, compression.ru TEAM
+
+import warnings
+
+import numpy as np
+import pytest
+
+from msu_vqmt import FrameStats, Invoke
+from conftest import makeConfig
+
+def _values(rows=300, cols=3):
+    rng = np.random.RandomState(1)
+    values = rng.uniform(20, 50, (rows, cols))
+    values[rng.rand(rows, cols) < 0.1] = np.nan
+    values[40:60, 1] = np.nan
+    return values
+
+def test_group_by_matches_numpy():
+    values = _values()
+    # shuffled rows with a gap of frames
+    frames = np.concatenate([np.arange(100), np.arange(150, 350)])
+    order = np.random.RandomState(2).permutation(len(frames))
+    stats = FrameStats(values[order], frames[order])
+    bounds = [0, 50, 100, 150, 200, 400]
+    res = stats.groupBy(bounds, percentiles=[10, 50])
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        for g, (a, b) in enumerate(zip(bounds[:-1], bounds[1:])):
+            part = values[(frames >= a) & (frames < b)]
+            assert list(res['count'][g]) == list((~np.isnan(part)).sum(axis=0))
+            if not len(part): continue
+            for name, func in (('mean', np.nanmean), ('min', np.nanmin), ('max', np.nanmax), ('std dev', np.nanstd)):
+                assert np.allclose(res[name][g], func(part, axis=0), equal_nan=True)
+            for p in (10, 50):
+                assert np.allclose(res['percentile %g' % p][g], np.nanpercentile(part, p, axis=0), equal_nan=True)
+    # no frames in [100, 150)
+    for name in ('mean', 'min', 'max', 'percentile 50'):
+        assert np.isnan(res[name][2]).all()
+
+@pytest.mark.parametrize('stat, func', [('mean', np.nanmean), ('std dev', np.nanstd),
+                                        ('min', np.nanmin), ('max', np.nanmax)])
+def test_rolling_matches_numpy(stat, func):
+    values = _values(100)
+    res = FrameStats(values).rolling(7, stat)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        expected = np.array([func(values[i:i + 7], axis=0) for i in range(94)])
+    assert res.shape == (94, 3)
+    # windows are made of cumulative sums, deviation of one value isn't exactly 0
+    assert np.allclose(res, expected, atol=1e-6, equal_nan=True)
+
+def test_stats_of_result(vqmt, stub_env):
+    stub_env(frames=100)
+    invoke = vqmt.invoke(makeConfig(metrics=('psnr', 'ssim')))
+    assert invoke.start() == Invoke.EXIT_STATUS_ALL_OK
+    stats = FrameStats.fromResult(invoke)
+
+    assert stats.accumulators()['mean'] == pytest.approx(invoke.getAccumulators()['mean'])
+    frames, values = stats.worst('psnr', k=3)
+    psnr = invoke.getValuesAsArray()[:, 0]
+    assert list(values) == sorted(psnr)[:3]
+    assert list(psnr[frames]) == list(values)
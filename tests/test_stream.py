@@ -0,0 +1,100 @@
+# This is a part of MSU VQMT Python Interface
+# https://github.com/msu-video-group/vqmt_python
+#
+# Copyright MSU Video Group, compression.ru TEAM
+
+import time
+import warnings
+
+import numpy as np
+import pytest
+
+from msu_vqmt import ValueStream
+from conftest import makeConfig
+
+def _stream(batch_size, capacity=4):
+    stream = ValueStream(batch_size=batch_size, capacity=capacity)
+    stream._setColumns(2)
+    return stream
+
+def _push(stream, frames):
+    for frame in frames:
+        for col in range(2):
+            stream._push(0, frame, col, frame * 10.0 + col)
+
+def _collect(stream):
+    stream._finish()
+    batches = list(stream.batches(timeout=1))
+    return np.concatenate([b[0] for b in batches]), np.concatenate([b[1] for b in batches])
+
+def test_earlier_frames_before_first_batch_are_kept():
+    stream = _stream(batch_size=8)
+    _push(stream, [3, 4, 0, 2, 1, 5, 9, 6, 8, 7])
+    frames, values = _collect(stream)
+
+    assert list(frames) == list(range(10))
+    assert np.array_equal(values[:, 0], np.arange(10) * 10.0)
+    assert stream.getDroppedCount() == 0
+
+def test_shift_grows_ring():
+    stream = _stream(batch_size=16, capacity=4)
+    _push(stream, [10, 11, 12, 13, 0])
+    _push(stream, range(1, 10))
+    frames, values = _collect(stream)
+
+    assert list(frames) == list(range(14))
+    assert np.array_equal(values[:, 1], np.arange(14) * 10.0 + 1)
+
+def test_frames_after_handed_out_batch_are_counted():
+    stream = _stream(batch_size=2)
+    _push(stream, [1, 2])
+    _push(stream, [0])
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        frames, _ = _collect(stream)
+
+    assert list(frames) == [1, 2]
+    assert stream.getDroppedCount() == 2
+    assert any('dropped 2 values' in str(w.message) for w in caught)
+
+def test_value_stream_delivers_all_frames(vqmt, stub_env):
+    stub_env(frames=100)
+    stream = ValueStream(batch_size=16)
+    invoke = vqmt.invoke(makeConfig(metrics=('psnr', 'ssim')), value_stream=stream)
+    invoke.startAsynch()
+
+    batches = list(stream.batches(timeout=10))
+    invoke.wait()
+    frames = np.concatenate([b[0] for b in batches])
+    values = np.concatenate([b[1] for b in batches])
+
+    assert list(frames) == list(range(100))
+    assert np.allclose(values, invoke.getValuesAsArray())
+    assert max(len(b[0]) for b in batches) == 16
+
+def test_partial_results_delta_covers_every_row(vqmt, stub_env):
+    stub_env(frames=200, latency_us=200)
+    invoke = vqmt.invoke(makeConfig(metrics=('psnr', 'ssim')), partial_results=True)
+    partial = invoke.getPartialResults()
+    invoke.startAsynch()
+
+    chunks, cursor = [], 0
+    while True:
+        finished = partial.isFinished()
+        frames, values, cursor = partial.delta(cursor)
+        if len(frames): chunks.append((frames, values))
+        if finished: break
+        time.sleep(0.005)
+    invoke.wait()
+
+    assert len(chunks) > 1
+    assert cursor == partial.getRowCount() == 200
+    assert list(np.concatenate([c[0] for c in chunks])) == list(range(200))
+    assert np.array_equal(np.concatenate([c[1] for c in chunks]), invoke.getValuesAsArray())
+    assert len(partial.delta(cursor)[0]) == 0
+
+    expected = invoke.getAccumulators()
+    acc = partial.getAccumulators()
+    for name in ('mean', 'min. val', 'max. val', 'min. frame', 'max. frame'):
+        for letter, value in expected[name].items():
+            assert acc[name][letter] == pytest.approx(value, rel=1e-6)
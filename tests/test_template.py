@@ -0,0 +1,47 @@
+# This is a part of MSU VQMT Python Interface
+# https://github.com/msu-video-group/vqmt_python
+#
+# Copyright MSU Video Group, compression.ru TEAM
+
+import itertools
+
+import numpy as np
+
+from msu_vqmt import Config, ConfigTemplate, FileEntry, Invoke, sweepConfigs
+from msu_vqmt.vqmt_shared_lib import _configToDict
+from conftest import makeConfig
+
+PROPS = {'fmt': 'yuv420p', 'w': 16, 'h': 8}
+
+def _config():
+    config = makeConfig(metrics=('psnr', 'ssim'), files=())
+    config.addFile('orig.mp4')
+    config.addFile('dist.mp4', 10, 40)
+    config.addFile('raw.yuv', props=PROPS)
+    return config
+
+def test_compiled_config_matches_config(vqmt, stub_env):
+    stub_env(frames=60)
+    config = _config()
+    compiled = ConfigTemplate(makeConfig(metrics=('psnr', 'ssim'), files=('ignored',))).compile(
+        [FileEntry('orig.mp4'), ('dist.mp4', 10, 40), ['raw.yuv', {'props': PROPS}]])
+    assert compiled.getConfig() == _configToDict(config)
+
+    expected = vqmt.invoke(config)
+    invoke = vqmt.invoke(compiled)
+    assert expected.start() == invoke.start() == Invoke.EXIT_STATUS_ALL_OK
+    assert np.array_equal(invoke.getValuesAsArray(), expected.getValuesAsArray())
+
+def test_sweep_covers_every_combination():
+    metric_sets = [makeConfig(metrics=('psnr',), files=()), makeConfig(metrics=('ssim',), files=())]
+    file_sets = [['orig.mp4', 'dist1.mp4'], ['orig.mp4', 'dist2.mp4']]
+    ranges = [(0, 10), (10, 20)]
+    configs = [c.getConfig() for c in sweepConfigs(metric_sets, file_sets, ranges)]
+
+    expected = []
+    for metrics, files, (start, end) in itertools.product(metric_sets, file_sets, ranges):
+        config = Config(_configToDict(metrics))
+        for path in files:
+            config.addFile(path, start, end)
+        expected.append(_configToDict(config))
+    assert configs == expected
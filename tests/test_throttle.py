@@ -0,0 +1,55 @@
+# This is a part of MSU VQMT Python Interface
+# https://github.com/msu-video-group/vqmt_python
+#
+# Copyright MSU Video Group, compression.ru TEAM
+
+import time
+
+from msu_vqmt import Invoke, ThrottleController
+from conftest import makeConfig
+
+def _runThrottled(vqmt, throttle, count):
+    invokes = [vqmt.invoke(makeConfig()) for _ in range(count)]
+    for invoke in invokes:
+        throttle.attach(invoke)
+        invoke.startAsynch()
+    samples = []
+    while not all(invoke.evtTotalComplete.is_set() for invoke in invokes):
+        samples.append(throttle.getStats())
+        time.sleep(0.005)
+    return [invoke.wait() for invoke in invokes], samples
+
+def test_max_measuring_limits_running_invokes(vqmt, stub_env):
+    stub_env(frames=200, latency_us=1000)
+    with ThrottleController(max_measuring=2, interval=0.01) as throttle:
+        statuses, samples = _runThrottled(vqmt, throttle, 4)
+        stats = throttle.getStats()
+
+    assert statuses == [Invoke.EXIT_STATUS_ALL_OK] * 4
+    assert max(s['measuring'] for s in samples) == 2
+    assert max(s['paused'] for s in samples) >= 1
+    assert stats['pauses'] >= 2 and stats['resumes'] == stats['pauses']
+    assert stats['attached'] == 0
+
+def test_high_load_keeps_min_active(vqmt, stub_env):
+    stub_env(frames=300, latency_us=1000)
+    with ThrottleController(max_load=0.5, load_func=lambda: 2.0, interval=0.01, cooldown=0.02) as throttle:
+        statuses, samples = _runThrottled(vqmt, throttle, 3)
+
+    assert statuses == [Invoke.EXIT_STATUS_ALL_OK] * 3
+    # one invoke is paused every cooldown until only min_active measure
+    assert max(s['measuring'] for s in samples[len(samples) // 2:]) == 1
+    assert any(s['measuring'] == 1 and s['paused'] == 2 for s in samples)
+    assert samples[-1]['load'] == 2.0
+
+def test_load_is_checked_after_cooldown(vqmt, stub_env):
+    stub_env(frames=600, latency_us=1000)
+    calls = []
+    def load():
+        calls.append(time.time())
+        return 0.0
+    start = time.time()
+    with ThrottleController(max_load=0.5, load_func=load, interval=0.01, cooldown=0.3) as throttle:
+        _runThrottled(vqmt, throttle, 1)
+
+    assert calls and calls[0] - start >= 0.3